@@ -0,0 +1,117 @@
+"""
+Compare encode/decode cost and stored size of cache payloads per codec.
+
+Usage:
+    PYTHONPATH=src python benchmarks/cache_codec_bench.py
+
+Payloads mimic what multi_level_cached stores: small user settings rows,
+workflow JSON and a full ComfyUI object_info.
+"""
+import json
+import random
+import string
+import time
+from datetime import datetime
+
+from api.utils.cache_codec import CacheSerializer
+
+random.seed(0)
+
+
+def _word(n=8):
+    return "".join(random.choices(string.ascii_lowercase, k=n))
+
+
+def user_settings_payload():
+    return {
+        "user_id": f"user_{_word(24)}",
+        "org_id": f"org_{_word(24)}",
+        "api_version": "v2",
+        "spend_limit": 500,
+        "output_visibility": "private",
+        "custom_output_bucket": True,
+        "s3_bucket_name": _word(12),
+        "s3_region": "us-east-1",
+        "max_gpu": 4,
+        "credit": 12.5,
+    }
+
+
+def workflow_payload(nodes=120):
+    return {
+        "last_node_id": nodes,
+        "nodes": [
+            {
+                "id": i,
+                "type": random.choice(["KSampler", "CLIPTextEncode", "VAEDecode", "LoadImage"]),
+                "pos": [random.random() * 2000, random.random() * 2000],
+                "size": {"0": 315, "1": 262},
+                "inputs": [{"name": _word(), "type": "MODEL", "link": random.randint(0, 400)}],
+                "outputs": [{"name": _word(), "type": "LATENT", "links": [random.randint(0, 400)]}],
+                "widgets_values": [random.randint(0, 2**32), "randomize", 20, 8, "euler", "normal", 1],
+            }
+            for i in range(nodes)
+        ],
+        "links": [[i, i, 0, i + 1, 0, "MODEL"] for i in range(nodes * 2)],
+    }
+
+
+def object_info_payload(node_types=900):
+    return {
+        f"{_word(10)}Node": {
+            "input": {
+                "required": {
+                    _word(6): [[_word(12) + ".safetensors" for _ in range(20)]],
+                    "seed": ["INT", {"default": 0, "min": 0, "max": 2**64 - 1}],
+                    "steps": ["INT", {"default": 20, "min": 1, "max": 10000}],
+                },
+                "optional": {"mask": ["MASK"]},
+            },
+            "output": ["MODEL", "CLIP", "VAE"],
+            "output_is_list": [False, False, False],
+            "name": _word(10),
+            "display_name": _word(10),
+            "category": "loaders",
+            "output_node": False,
+        }
+        for _ in range(node_types)
+    }
+
+
+def cache_wrapped(data):
+    return {"data": data, "timestamp": int(datetime.now().timestamp()), "version": "1.0"}
+
+
+def bench(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1e6, result
+
+
+def main():
+    payloads = {
+        "user_settings": (cache_wrapped(user_settings_payload()), 20000),
+        "workflow": (cache_wrapped(workflow_payload()), 500),
+        "object_info": (cache_wrapped(object_info_payload()), 20),
+    }
+    serializers = {
+        "json (baseline)": None,
+        "json+zlib": CacheSerializer(0),
+        "default (threshold)": CacheSerializer(),
+    }
+
+    print(f"{'payload':<14} {'codec':<20} {'bytes':>10} {'encode us':>11} {'decode us':>11}")
+    for name, (payload, repeat) in payloads.items():
+        for codec_name, serializer in serializers.items():
+            if serializer is None:
+                enc_us, encoded = bench(lambda: json.dumps(payload), repeat)
+                dec_us, _ = bench(lambda: json.loads(encoded), repeat)
+            else:
+                enc_us, encoded = bench(lambda: serializer.encode(payload), repeat)
+                dec_us, _ = bench(lambda: serializer.decode(encoded), repeat)
+            print(f"{name:<14} {codec_name:<20} {len(encoded):>10} {enc_us:>11.1f} {dec_us:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
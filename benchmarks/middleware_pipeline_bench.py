@@ -0,0 +1,217 @@
+"""
+Load test: four BaseHTTPMiddleware layers vs one RequestPipeline with four stages.
+
+Usage:
+    PYTHONPATH=src python benchmarks/middleware_pipeline_bench.py [--requests 5000] [--concurrency 64]
+
+Requests are driven straight into the ASGI app (no sockets) so the numbers
+isolate middleware overhead. Both stacks do the same per-request work: set
+a user on request.state, read it back for a plan, run a guard lookup and
+normalize a path. Two endpoints are measured: a small JSON response and an
+SSE-style stream of 50 chunks, like the log/progress streams.
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import statistics
+import time
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# Load the module by path so importing it does not initialise the whole api package
+_spec = importlib.util.spec_from_file_location(
+    "pipeline",
+    os.path.join(os.path.dirname(__file__), "..", "src", "api", "middleware", "pipeline.py"),
+)
+pipeline = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(pipeline)
+
+STREAM_CHUNKS = 50
+
+
+async def json_endpoint(request):
+    return JSONResponse({"user": request.state.current_user["user_id"], "ok": True})
+
+
+async def stream_endpoint(request):
+    async def events():
+        for i in range(STREAM_CHUNKS):
+            yield f"data: {{\"progress\": {i}}}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+ROUTES = [Route("/api/run", json_endpoint), Route("/api/stream", stream_endpoint)]
+
+
+def _auth(request):
+    request.state.current_user = {"user_id": "user_1", "org_id": None}
+
+
+def _plan(request):
+    request.state.current_user["plan"] = "pro"
+
+
+def _guard(request):
+    return request.method == "POST" and request.url.path.startswith("/api/session")
+
+
+def _normalize(request):
+    if request.scope["path"].startswith("/api/autumn/") and not request.scope["path"].endswith("/"):
+        request.scope["path"] += "/"
+
+
+# --- before: one BaseHTTPMiddleware per concern ---------------------------------
+
+class AuthHTTP(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        _auth(request)
+        return await call_next(request)
+
+
+class PlanHTTP(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        _plan(request)
+        return await call_next(request)
+
+
+class GuardHTTP(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if _guard(request):
+            return JSONResponse({"detail": "blocked"}, status_code=403)
+        return await call_next(request)
+
+
+class SlashHTTP(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        _normalize(request)
+        return await call_next(request)
+
+
+# --- after: the same work as pipeline stages ---------------------------------------
+
+class AuthStage(pipeline.PipelineStage):
+    async def on_request(self, request):
+        _auth(request)
+
+
+class PlanStage(pipeline.PipelineStage):
+    async def on_request(self, request):
+        _plan(request)
+
+
+class GuardStage(pipeline.PipelineStage):
+    async def on_request(self, request):
+        if _guard(request):
+            return JSONResponse({"detail": "blocked"}, status_code=403)
+
+
+class SlashStage(pipeline.PipelineStage):
+    async def on_request(self, request):
+        _normalize(request)
+
+
+def build_apps():
+    # Listed outermost first, matching the production order
+    before = Starlette(
+        routes=ROUTES,
+        middleware=[Middleware(AuthHTTP), Middleware(PlanHTTP), Middleware(GuardHTTP), Middleware(SlashHTTP)],
+    )
+    after = Starlette(
+        routes=ROUTES,
+        middleware=[
+            Middleware(
+                pipeline.RequestPipeline,
+                stages=[AuthStage(), PlanStage(), GuardStage(), SlashStage()],
+            )
+        ],
+    )
+    return before, after
+
+
+async def one_request(app, path):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+    request_sent = False
+    finished = asyncio.Event()
+    status = None
+    chunks = 0
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, chunks
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            if message.get("body"):
+                chunks += 1
+            if not message.get("more_body", False):
+                finished.set()
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    finished.set()
+    assert status == 200, status
+    return (time.perf_counter() - start) * 1000
+
+
+async def load(app, path, total, concurrency):
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            latencies.append(await one_request(app, path))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "rps": total / elapsed,
+    }
+
+
+async def main(total, concurrency):
+    before, after = build_apps()
+    print(f"requests: {total}, concurrency: {concurrency}")
+    print(f"{'endpoint':<10} {'stack':<28} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>9}")
+    for name, path in [("json", "/api/run"), ("stream", "/api/stream")]:
+        for label, app in [("4x BaseHTTPMiddleware", before), ("RequestPipeline (4 stages)", after)]:
+            await load(app, path, min(total, 500), concurrency)  # warm up
+            result = await load(app, path, total, concurrency)
+            print(f"{name:<10} {label:<28} {result['p50']:>8.2f} {result['p99']:>8.2f} {result['rps']:>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
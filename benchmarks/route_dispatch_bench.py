@@ -0,0 +1,162 @@
+"""
+Per-request overhead of route matching and path rules in the auth/feature-gate middlewares.
+
+Usage:
+    PYTHONPATH=src python benchmarks/route_dispatch_bench.py
+
+"before" replays what AuthMiddleware and AutumnAccessMiddleware did on every
+request: walk app.routes for a full match, then fnmatch the path against the
+optional-auth, ignored and guard rule globs. "after" is one RouteIndex.resolve.
+The app is synthetic (~400 routes shaped like this API's) so the benchmark only
+needs starlette, not the full service configuration.
+"""
+import importlib.util
+import os
+import random
+import time
+from fnmatch import fnmatch
+
+from starlette.routing import Match, Route, Router
+
+# Load the module by path so importing it does not initialise the whole api package
+_spec = importlib.util.spec_from_file_location(
+    "route_index",
+    os.path.join(os.path.dirname(__file__), "..", "src", "api", "middleware", "route_index.py"),
+)
+route_index = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(route_index)
+
+random.seed(0)
+
+IGNORED_ROUTES = [
+    "/api/gpu_event",
+    "/api/machine-built",
+    "/api/fal-webhook",
+    "/api/models",
+    "/api/clerk/webhook",
+    "/api/user/*",
+    "/api/platform/stripe/webhook",
+    "/api/webhooks/autumn",
+    "/api/platform/comfyui/auth-response",
+    "/api/deployments/community",
+    "/api/platform/gpu-pricing",
+    "/api/platform/gpu-credit-schema",
+]
+OPTIONAL_AUTH_ROUTES = ["/api/share/*", "/api/shared-workflows", "/api/shared-workflows/*", "/api/optimize/*"]
+GUARD_RULES = [
+    {"pattern": "/api/workflow/*", "methods": ["POST"], "checks": [{"feature_id": "workflow_limit"}]},
+    {"pattern": "/api/machine/custom", "methods": ["POST"], "checks": [{"feature_id": "self_hosted_machines"}]},
+    {"pattern": "/api/machine/custom/*", "methods": ["PATCH"], "checks": [{"feature_id": "self_hosted_machines"}]},
+    {"pattern": "/api/machine/serverless", "methods": ["POST"], "checks": [{"feature_id": "machine_limit"}]},
+    {"pattern": "/api/session", "methods": ["POST"], "checks": [{"feature_id": "gpu-credit-topup"}]},
+]
+
+RESOURCES = [
+    "workflow", "workflows", "machine", "machines", "deployment", "deployments", "run", "runs",
+    "session", "sessions", "volume", "file", "files", "model", "models", "share", "platform",
+    "user", "org", "api-key", "secret", "comfy-node", "log", "image", "asset", "assets",
+    "output", "outputs", "search", "queue", "gpu", "template", "form", "webhook", "billing",
+    "usage", "invoice", "team", "member", "settings",
+]
+
+
+async def _endpoint(request):
+    return None
+
+
+def build_app() -> Router:
+    routes = []
+    for resource in RESOURCES:
+        base = f"/api/{resource}"
+        for path, methods in [
+            (base, ["GET", "POST"]),
+            (f"{base}/{{item_id}}", ["GET", "PATCH", "DELETE"]),
+            (f"{base}/{{item_id}}/versions", ["GET"]),
+            (f"{base}/{{item_id}}/versions/{{version}}", ["GET"]),
+            (f"{base}/{{item_id}}/runs", ["GET"]),
+            (f"{base}/{{item_id}}/stats", ["GET"]),
+            (f"{base}/{{item_id}}/clone", ["POST"]),
+            (f"{base}/search", ["GET"]),
+            (f"{base}/{{item_id}}/files/{{file_path:path}}", ["GET"]),
+            (f"{base}/bulk", ["POST"]),
+        ]:
+            routes.append(Route(path, _endpoint, methods=methods, name=f"{resource}_{len(routes)}"))
+    return Router(routes=routes)
+
+
+def sample_requests(n=2000):
+    requests = []
+    for _ in range(n):
+        resource = random.choice(RESOURCES)
+        item = f"{random.getrandbits(64):016x}"
+        path, method = random.choice([
+            (f"/api/{resource}", "GET"),
+            (f"/api/{resource}", "POST"),
+            (f"/api/{resource}/{item}", "GET"),
+            (f"/api/{resource}/{item}/runs", "GET"),
+            (f"/api/{resource}/{item}/versions/3", "GET"),
+            (f"/api/{resource}/{item}/files/a/b/c.png", "GET"),
+            (f"/api/{resource}/search", "GET"),
+            ("/api/unknown/route", "GET"),
+        ])
+        requests.append({"type": "http", "path": path, "method": method, "root_path": ""})
+    return requests
+
+
+def legacy_dispatch(app, scope):
+    route_path = function_name = None
+    for route in app.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            route_path = route.path
+            function_name = route.endpoint.__name__
+            break
+
+    path = scope["path"]
+    optional_auth = any(fnmatch(path, route) for route in OPTIONAL_AUTH_ROUTES)
+    should_authenticate = not any(fnmatch(path, route) for route in IGNORED_ROUTES) and path.startswith("/api")
+
+    method = scope["method"].upper()
+    rules = []
+    for rule in GUARD_RULES:
+        if method not in {m.upper() for m in rule.get("methods", [])}:
+            continue
+        if not fnmatch(path, rule["pattern"]):
+            continue
+        if any(fnmatch(path, ex) for ex in rule.get("exclude", []) or []):
+            break
+        rules.append(rule)
+    return route_path, function_name, optional_auth, should_authenticate, rules
+
+
+def bench(fn, scopes, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for scope in scopes:
+            fn(scope)
+        best = min(best, time.perf_counter() - start)
+    return best / len(scopes) * 1e6
+
+
+def main():
+    app = build_app()
+    index = route_index.RouteIndex(app, IGNORED_ROUTES, OPTIONAL_AUTH_ROUTES, GUARD_RULES)
+    scopes = sample_requests()
+
+    # Both implementations must agree before timing them
+    for scope in scopes:
+        route_path, function_name, _, _, rules = legacy_dispatch(app, scope)
+        info = index.resolve(scope)
+        assert (info.route_path, info.function_name, list(info.guard_rules)) == (route_path, function_name, rules), scope
+
+    before = bench(lambda scope: legacy_dispatch(app, scope), scopes)
+    after = bench(index.resolve, scopes)
+    print(f"routes: {len(app.routes)}, requests: {len(scopes)}")
+    print(f"{'before (walk + fnmatch)':<26} {before:>8.2f} us/request")
+    print(f"{'after (RouteIndex)':<26} {after:>8.2f} us/request")
+    print(f"{'speedup':<26} {before / after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
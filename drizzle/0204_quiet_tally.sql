@@ -0,0 +1,150 @@
+CREATE TABLE "comfyui_deploy"."workflow_run_rollups_hourly" (
+	"bucket" timestamp NOT NULL,
+	"org_id" text DEFAULT '' NOT NULL,
+	"user_id" text DEFAULT '' NOT NULL,
+	"workflow_id" text DEFAULT '' NOT NULL,
+	"deployment_id" text DEFAULT '' NOT NULL,
+	"machine_id" text DEFAULT '' NOT NULL,
+	"gpu" text DEFAULT '' NOT NULL,
+	"origin" text DEFAULT '' NOT NULL,
+	"status" text DEFAULT '' NOT NULL,
+	"count" bigint DEFAULT 0 NOT NULL
+);
+--> statement-breakpoint
+CREATE UNIQUE INDEX "workflow_run_rollups_hourly_key" ON "comfyui_deploy"."workflow_run_rollups_hourly" USING btree ("org_id","user_id","bucket","workflow_id","deployment_id","machine_id","gpu","origin","status");--> statement-breakpoint
+CREATE INDEX "idx_workflow_run_org_user_created_at" ON "comfyui_deploy"."workflow_runs" USING btree ("org_id","user_id","created_at");--> statement-breakpoint
+CREATE TABLE "comfyui_deploy"."rollup_backfills" (
+	"name" text PRIMARY KEY NOT NULL,
+	"cutoff" timestamp DEFAULT now() NOT NULL,
+	"watermark" uuid,
+	"completed_at" timestamp
+);
+--> statement-breakpoint
+-- Runs created at or after the cutoff are always counted by the triggers. Older runs are
+-- counted by the batched backfill (in primary key order), and by the triggers only once the
+-- backfill has passed them. The share lock waits out a backfill step touching the same state,
+-- so every run is counted exactly once.
+CREATE OR REPLACE FUNCTION "comfyui_deploy"."rollup_backfill_covers"(backfill text, run_created_at timestamp, run_id uuid) RETURNS boolean AS $$
+DECLARE
+	state "comfyui_deploy"."rollup_backfills"%ROWTYPE;
+BEGIN
+	SELECT * INTO state FROM "comfyui_deploy"."rollup_backfills" WHERE "name" = backfill;
+	IF NOT FOUND OR state."completed_at" IS NOT NULL OR run_created_at >= state."cutoff" THEN
+		RETURN true;
+	END IF;
+	SELECT * INTO state FROM "comfyui_deploy"."rollup_backfills" WHERE "name" = backfill FOR SHARE;
+	RETURN state."completed_at" IS NOT NULL OR COALESCE(run_id <= state."watermark", false);
+END;
+$$ LANGUAGE plpgsql;--> statement-breakpoint
+CREATE OR REPLACE FUNCTION "comfyui_deploy"."workflow_run_rollups_hourly_apply"() RETURNS trigger AS $$
+BEGIN
+	IF TG_OP IN ('UPDATE', 'DELETE')
+		AND "comfyui_deploy"."rollup_backfill_covers"('workflow_run_rollups_hourly', OLD."created_at", OLD."id") THEN
+		UPDATE "comfyui_deploy"."workflow_run_rollups_hourly" SET "count" = "count" - 1
+		WHERE "org_id" = COALESCE(OLD."org_id", '')
+			AND "user_id" = COALESCE(OLD."user_id", '')
+			AND "bucket" = date_trunc('hour', OLD."created_at")
+			AND "workflow_id" = COALESCE(OLD."workflow_id"::text, '')
+			AND "deployment_id" = COALESCE(OLD."deployment_id"::text, '')
+			AND "machine_id" = COALESCE(OLD."machine_id"::text, '')
+			AND "gpu" = COALESCE(OLD."gpu"::text, '')
+			AND "origin" = COALESCE(OLD."origin"::text, '')
+			AND "status" = COALESCE(OLD."status"::text, '');
+	END IF;
+	IF TG_OP IN ('INSERT', 'UPDATE')
+		AND "comfyui_deploy"."rollup_backfill_covers"('workflow_run_rollups_hourly', NEW."created_at", NEW."id") THEN
+		INSERT INTO "comfyui_deploy"."workflow_run_rollups_hourly"
+			("org_id", "user_id", "bucket", "workflow_id", "deployment_id", "machine_id", "gpu", "origin", "status", "count")
+		VALUES (
+			COALESCE(NEW."org_id", ''),
+			COALESCE(NEW."user_id", ''),
+			date_trunc('hour', NEW."created_at"),
+			COALESCE(NEW."workflow_id"::text, ''),
+			COALESCE(NEW."deployment_id"::text, ''),
+			COALESCE(NEW."machine_id"::text, ''),
+			COALESCE(NEW."gpu"::text, ''),
+			COALESCE(NEW."origin"::text, ''),
+			COALESCE(NEW."status"::text, ''),
+			1
+		)
+		ON CONFLICT ("org_id", "user_id", "bucket", "workflow_id", "deployment_id", "machine_id", "gpu", "origin", "status")
+		DO UPDATE SET "count" = "workflow_run_rollups_hourly"."count" + 1;
+	END IF;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;--> statement-breakpoint
+-- One backfill batch of runs created before the cutoff, in its own short transaction (run by
+-- the API's rollup backfill task). Returns false once the backfill is complete.
+CREATE OR REPLACE FUNCTION "comfyui_deploy"."workflow_run_rollups_hourly_backfill_step"(batch_size integer) RETURNS boolean AS $$
+DECLARE
+	state "comfyui_deploy"."rollup_backfills"%ROWTYPE;
+	batch_end uuid;
+BEGIN
+	SELECT * INTO state FROM "comfyui_deploy"."rollup_backfills"
+	WHERE "name" = 'workflow_run_rollups_hourly' FOR UPDATE SKIP LOCKED;
+	IF NOT FOUND THEN
+		-- Another step (or a trigger reading the state) holds the row; try again later
+		RETURN NOT EXISTS (
+			SELECT 1 FROM "comfyui_deploy"."rollup_backfills"
+			WHERE "name" = 'workflow_run_rollups_hourly' AND "completed_at" IS NOT NULL
+		);
+	END IF;
+	IF state."completed_at" IS NOT NULL THEN
+		RETURN false;
+	END IF;
+
+	SELECT max("id") INTO batch_end FROM (
+		SELECT "id" FROM "comfyui_deploy"."workflow_runs"
+		WHERE "id" > COALESCE(state."watermark", '00000000-0000-0000-0000-000000000000')
+		ORDER BY "id"
+		LIMIT batch_size
+	) AS "batch";
+	IF batch_end IS NULL THEN
+		UPDATE "comfyui_deploy"."rollup_backfills" SET "completed_at" = now()
+		WHERE "name" = 'workflow_run_rollups_hourly';
+		RETURN false;
+	END IF;
+
+	INSERT INTO "comfyui_deploy"."workflow_run_rollups_hourly"
+		("org_id", "user_id", "bucket", "workflow_id", "deployment_id", "machine_id", "gpu", "origin", "status", "count")
+	SELECT
+		COALESCE("org_id", ''),
+		COALESCE("user_id", ''),
+		date_trunc('hour', "created_at"),
+		COALESCE("workflow_id"::text, ''),
+		COALESCE("deployment_id"::text, ''),
+		COALESCE("machine_id"::text, ''),
+		COALESCE("gpu"::text, ''),
+		COALESCE("origin"::text, ''),
+		COALESCE("status"::text, ''),
+		count(*)
+	FROM "comfyui_deploy"."workflow_runs"
+	WHERE "id" > COALESCE(state."watermark", '00000000-0000-0000-0000-000000000000')
+		AND "id" <= batch_end
+		AND "created_at" < state."cutoff"
+	GROUP BY 1, 2, 3, 4, 5, 6, 7, 8, 9
+	ON CONFLICT ("org_id", "user_id", "bucket", "workflow_id", "deployment_id", "machine_id", "gpu", "origin", "status")
+	DO UPDATE SET "count" = "workflow_run_rollups_hourly"."count" + EXCLUDED."count";
+
+	UPDATE "comfyui_deploy"."rollup_backfills" SET "watermark" = batch_end
+	WHERE "name" = 'workflow_run_rollups_hourly';
+	RETURN true;
+END;
+$$ LANGUAGE plpgsql;--> statement-breakpoint
+CREATE TRIGGER "workflow_run_rollups_hourly_insert_delete" AFTER INSERT OR DELETE ON "comfyui_deploy"."workflow_runs"
+FOR EACH ROW EXECUTE FUNCTION "comfyui_deploy"."workflow_run_rollups_hourly_apply"();--> statement-breakpoint
+CREATE TRIGGER "workflow_run_rollups_hourly_update" AFTER UPDATE OF "status", "org_id", "user_id", "created_at", "workflow_id", "deployment_id", "machine_id", "gpu", "origin" ON "comfyui_deploy"."workflow_runs"
+FOR EACH ROW WHEN (
+	OLD."status" IS DISTINCT FROM NEW."status"
+	OR OLD."org_id" IS DISTINCT FROM NEW."org_id"
+	OR OLD."user_id" IS DISTINCT FROM NEW."user_id"
+	OR OLD."created_at" IS DISTINCT FROM NEW."created_at"
+	OR OLD."workflow_id" IS DISTINCT FROM NEW."workflow_id"
+	OR OLD."deployment_id" IS DISTINCT FROM NEW."deployment_id"
+	OR OLD."machine_id" IS DISTINCT FROM NEW."machine_id"
+	OR OLD."gpu" IS DISTINCT FROM NEW."gpu"
+	OR OLD."origin" IS DISTINCT FROM NEW."origin"
+)
+EXECUTE FUNCTION "comfyui_deploy"."workflow_run_rollups_hourly_apply"();--> statement-breakpoint
+-- Taken after the triggers' table lock: every earlier write has committed, every later one fires them
+INSERT INTO "comfyui_deploy"."rollup_backfills" ("name", "cutoff") VALUES ('workflow_run_rollups_hourly', clock_timestamp());
@@ -0,0 +1,156 @@
+CREATE TABLE "comfyui_deploy"."workflow_run_durations_hourly" (
+	"bucket" timestamp NOT NULL,
+	"org_id" text DEFAULT '' NOT NULL,
+	"user_id" text DEFAULT '' NOT NULL,
+	"workflow_id" text DEFAULT '' NOT NULL,
+	"deployment_id" text DEFAULT '' NOT NULL,
+	"metric" text NOT NULL,
+	"bin" integer NOT NULL,
+	"count" bigint DEFAULT 0 NOT NULL
+);
+--> statement-breakpoint
+CREATE UNIQUE INDEX "workflow_run_durations_hourly_key" ON "comfyui_deploy"."workflow_run_durations_hourly" USING btree ("org_id","user_id","bucket","workflow_id","deployment_id","metric","bin");--> statement-breakpoint
+CREATE INDEX "idx_workflow_run_durations_hourly_workflow" ON "comfyui_deploy"."workflow_run_durations_hourly" USING btree ("workflow_id","bucket");--> statement-breakpoint
+CREATE INDEX "idx_workflow_run_durations_hourly_deployment" ON "comfyui_deploy"."workflow_run_durations_hourly" USING btree ("deployment_id","bucket");--> statement-breakpoint
+CREATE INDEX "idx_workflow_run_rollups_hourly_workflow" ON "comfyui_deploy"."workflow_run_rollups_hourly" USING btree ("workflow_id","bucket");--> statement-breakpoint
+CREATE INDEX "idx_workflow_run_rollups_hourly_deployment" ON "comfyui_deploy"."workflow_run_rollups_hourly" USING btree ("deployment_id","bucket");--> statement-breakpoint
+-- Log-spaced histogram bins: bin b covers [1.1^b, 1.1^(b+1)) milliseconds, so percentiles are within ~5%
+CREATE OR REPLACE FUNCTION "comfyui_deploy"."workflow_run_duration_bin"(duration interval) RETURNS integer AS $$
+	SELECT floor(ln(greatest(extract(epoch from duration) * 1000, 1)) / ln(1.1))::integer;
+$$ LANGUAGE sql IMMUTABLE;--> statement-breakpoint
+CREATE OR REPLACE FUNCTION "comfyui_deploy"."workflow_run_durations_hourly_add"(r "comfyui_deploy"."workflow_runs", delta bigint) RETURNS void AS $$
+BEGIN
+	IF r."started_at" IS NOT NULL AND r."ended_at" IS NOT NULL THEN
+		INSERT INTO "comfyui_deploy"."workflow_run_durations_hourly"
+			("org_id", "user_id", "bucket", "workflow_id", "deployment_id", "metric", "bin", "count")
+		VALUES (
+			COALESCE(r."org_id", ''),
+			COALESCE(r."user_id", ''),
+			date_trunc('hour', r."created_at"),
+			COALESCE(r."workflow_id"::text, ''),
+			COALESCE(r."deployment_id"::text, ''),
+			'run',
+			"comfyui_deploy"."workflow_run_duration_bin"(r."ended_at" - r."started_at"),
+			delta
+		)
+		ON CONFLICT ("org_id", "user_id", "bucket", "workflow_id", "deployment_id", "metric", "bin")
+		DO UPDATE SET "count" = "workflow_run_durations_hourly"."count" + EXCLUDED."count";
+	END IF;
+	IF r."queued_at" IS NOT NULL AND r."started_at" IS NOT NULL THEN
+		INSERT INTO "comfyui_deploy"."workflow_run_durations_hourly"
+			("org_id", "user_id", "bucket", "workflow_id", "deployment_id", "metric", "bin", "count")
+		VALUES (
+			COALESCE(r."org_id", ''),
+			COALESCE(r."user_id", ''),
+			date_trunc('hour', r."created_at"),
+			COALESCE(r."workflow_id"::text, ''),
+			COALESCE(r."deployment_id"::text, ''),
+			'cold_start',
+			"comfyui_deploy"."workflow_run_duration_bin"(r."started_at" - r."queued_at"),
+			delta
+		)
+		ON CONFLICT ("org_id", "user_id", "bucket", "workflow_id", "deployment_id", "metric", "bin")
+		DO UPDATE SET "count" = "workflow_run_durations_hourly"."count" + EXCLUDED."count";
+	END IF;
+END;
+$$ LANGUAGE plpgsql;--> statement-breakpoint
+CREATE OR REPLACE FUNCTION "comfyui_deploy"."workflow_run_durations_hourly_apply"() RETURNS trigger AS $$
+BEGIN
+	IF TG_OP IN ('UPDATE', 'DELETE')
+		AND "comfyui_deploy"."rollup_backfill_covers"('workflow_run_durations_hourly', OLD."created_at", OLD."id") THEN
+		PERFORM "comfyui_deploy"."workflow_run_durations_hourly_add"(OLD, -1);
+	END IF;
+	IF TG_OP IN ('INSERT', 'UPDATE')
+		AND "comfyui_deploy"."rollup_backfill_covers"('workflow_run_durations_hourly', NEW."created_at", NEW."id") THEN
+		PERFORM "comfyui_deploy"."workflow_run_durations_hourly_add"(NEW, 1);
+	END IF;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;--> statement-breakpoint
+-- One backfill batch of runs created before the cutoff, as in 0204
+CREATE OR REPLACE FUNCTION "comfyui_deploy"."workflow_run_durations_hourly_backfill_step"(batch_size integer) RETURNS boolean AS $$
+DECLARE
+	state "comfyui_deploy"."rollup_backfills"%ROWTYPE;
+	batch_end uuid;
+BEGIN
+	SELECT * INTO state FROM "comfyui_deploy"."rollup_backfills"
+	WHERE "name" = 'workflow_run_durations_hourly' FOR UPDATE SKIP LOCKED;
+	IF NOT FOUND THEN
+		RETURN NOT EXISTS (
+			SELECT 1 FROM "comfyui_deploy"."rollup_backfills"
+			WHERE "name" = 'workflow_run_durations_hourly' AND "completed_at" IS NOT NULL
+		);
+	END IF;
+	IF state."completed_at" IS NOT NULL THEN
+		RETURN false;
+	END IF;
+
+	SELECT max("id") INTO batch_end FROM (
+		SELECT "id" FROM "comfyui_deploy"."workflow_runs"
+		WHERE "id" > COALESCE(state."watermark", '00000000-0000-0000-0000-000000000000')
+		ORDER BY "id"
+		LIMIT batch_size
+	) AS "batch";
+	IF batch_end IS NULL THEN
+		UPDATE "comfyui_deploy"."rollup_backfills" SET "completed_at" = now()
+		WHERE "name" = 'workflow_run_durations_hourly';
+		RETURN false;
+	END IF;
+
+	INSERT INTO "comfyui_deploy"."workflow_run_durations_hourly"
+		("org_id", "user_id", "bucket", "workflow_id", "deployment_id", "metric", "bin", "count")
+	SELECT "org_id", "user_id", "bucket", "workflow_id", "deployment_id", "metric", "bin", count(*)
+	FROM (
+		SELECT
+			COALESCE("org_id", '') AS "org_id",
+			COALESCE("user_id", '') AS "user_id",
+			date_trunc('hour', "created_at") AS "bucket",
+			COALESCE("workflow_id"::text, '') AS "workflow_id",
+			COALESCE("deployment_id"::text, '') AS "deployment_id",
+			'run' AS "metric",
+			"comfyui_deploy"."workflow_run_duration_bin"("ended_at" - "started_at") AS "bin"
+		FROM "comfyui_deploy"."workflow_runs"
+		WHERE "id" > COALESCE(state."watermark", '00000000-0000-0000-0000-000000000000')
+			AND "id" <= batch_end
+			AND "created_at" < state."cutoff"
+			AND "started_at" IS NOT NULL AND "ended_at" IS NOT NULL
+		UNION ALL
+		SELECT
+			COALESCE("org_id", ''),
+			COALESCE("user_id", ''),
+			date_trunc('hour', "created_at"),
+			COALESCE("workflow_id"::text, ''),
+			COALESCE("deployment_id"::text, ''),
+			'cold_start',
+			"comfyui_deploy"."workflow_run_duration_bin"("started_at" - "queued_at")
+		FROM "comfyui_deploy"."workflow_runs"
+		WHERE "id" > COALESCE(state."watermark", '00000000-0000-0000-0000-000000000000')
+			AND "id" <= batch_end
+			AND "created_at" < state."cutoff"
+			AND "queued_at" IS NOT NULL AND "started_at" IS NOT NULL
+	) AS "durations"
+	GROUP BY 1, 2, 3, 4, 5, 6, 7
+	ON CONFLICT ("org_id", "user_id", "bucket", "workflow_id", "deployment_id", "metric", "bin")
+	DO UPDATE SET "count" = "workflow_run_durations_hourly"."count" + EXCLUDED."count";
+
+	UPDATE "comfyui_deploy"."rollup_backfills" SET "watermark" = batch_end
+	WHERE "name" = 'workflow_run_durations_hourly';
+	RETURN true;
+END;
+$$ LANGUAGE plpgsql;--> statement-breakpoint
+CREATE TRIGGER "workflow_run_durations_hourly_insert_delete" AFTER INSERT OR DELETE ON "comfyui_deploy"."workflow_runs"
+FOR EACH ROW EXECUTE FUNCTION "comfyui_deploy"."workflow_run_durations_hourly_apply"();--> statement-breakpoint
+CREATE TRIGGER "workflow_run_durations_hourly_update" AFTER UPDATE OF "queued_at", "started_at", "ended_at", "org_id", "user_id", "created_at", "workflow_id", "deployment_id" ON "comfyui_deploy"."workflow_runs"
+FOR EACH ROW WHEN (
+	OLD."queued_at" IS DISTINCT FROM NEW."queued_at"
+	OR OLD."started_at" IS DISTINCT FROM NEW."started_at"
+	OR OLD."ended_at" IS DISTINCT FROM NEW."ended_at"
+	OR OLD."org_id" IS DISTINCT FROM NEW."org_id"
+	OR OLD."user_id" IS DISTINCT FROM NEW."user_id"
+	OR OLD."created_at" IS DISTINCT FROM NEW."created_at"
+	OR OLD."workflow_id" IS DISTINCT FROM NEW."workflow_id"
+	OR OLD."deployment_id" IS DISTINCT FROM NEW."deployment_id"
+)
+EXECUTE FUNCTION "comfyui_deploy"."workflow_run_durations_hourly_apply"();--> statement-breakpoint
+-- Taken after the triggers' table lock, as in 0204
+INSERT INTO "comfyui_deploy"."rollup_backfills" ("name", "cutoff") VALUES ('workflow_run_durations_hourly', clock_timestamp());
@@ -0,0 +1,15 @@
+ALTER TABLE "comfyui_deploy"."api_keys" ADD COLUMN "revoked_at" timestamp;--> statement-breakpoint
+CREATE INDEX "api_keys_revoked_at_index" ON "comfyui_deploy"."api_keys" USING btree ("revoked_at");--> statement-breakpoint
+-- Stamped by the database so a revocation from any writer is picked up by the incremental revocation resync
+CREATE OR REPLACE FUNCTION "comfyui_deploy"."api_keys_stamp_revoked_at"() RETURNS trigger AS $$
+BEGIN
+	NEW."revoked_at" := clock_timestamp();
+	RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;--> statement-breakpoint
+CREATE TRIGGER "api_keys_stamp_revoked_at_insert" BEFORE INSERT ON "comfyui_deploy"."api_keys"
+FOR EACH ROW WHEN (NEW."revoked")
+EXECUTE FUNCTION "comfyui_deploy"."api_keys_stamp_revoked_at"();--> statement-breakpoint
+CREATE TRIGGER "api_keys_stamp_revoked_at_update" BEFORE UPDATE OF "revoked" ON "comfyui_deploy"."api_keys"
+FOR EACH ROW WHEN (NEW."revoked" AND NOT OLD."revoked")
+EXECUTE FUNCTION "comfyui_deploy"."api_keys_stamp_revoked_at"();
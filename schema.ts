@@ -354,6 +354,13 @@ export const workflowRunsTable = dbSchema.table(
                 desc(table.created_at)
             ),
 
+            // Index for exact counts over the partial edge hours of a range
+            idx_workflow_run_org_user_created_at: index("idx_workflow_run_org_user_created_at").on(
+                table.org_id,
+                table.user_id,
+                table.created_at
+            ),
+
             // Index for optimizing gpu_event_id queries
             // idx_workflow_run_gpu_event: index("idx_workflow_run_gpu_event").on(
             //     table.gpu_event_id,
@@ -381,6 +388,93 @@ export const workflowRunRelations = relations(
     }),
 );
 
+// Hourly run counts, maintained by a trigger on workflow_runs (see 0204 migration).
+// Nullable dimensions are stored as '' so they can be part of the unique key.
+export const workflowRunRollupsHourlyTable = dbSchema.table(
+    "workflow_run_rollups_hourly",
+    {
+        bucket: timestamp("bucket").notNull(),
+        org_id: text("org_id").notNull().default(""),
+        user_id: text("user_id").notNull().default(""),
+        workflow_id: text("workflow_id").notNull().default(""),
+        deployment_id: text("deployment_id").notNull().default(""),
+        machine_id: text("machine_id").notNull().default(""),
+        gpu: text("gpu").notNull().default(""),
+        origin: text("origin").notNull().default(""),
+        status: text("status").notNull().default(""),
+        count: bigint("count", { mode: "number" }).notNull().default(0),
+    },
+    (table) => {
+        return {
+            workflow_run_rollups_hourly_key: uniqueIndex("workflow_run_rollups_hourly_key").on(
+                table.org_id,
+                table.user_id,
+                table.bucket,
+                table.workflow_id,
+                table.deployment_id,
+                table.machine_id,
+                table.gpu,
+                table.origin,
+                table.status,
+            ),
+            idx_workflow_run_rollups_hourly_workflow: index("idx_workflow_run_rollups_hourly_workflow").on(
+                table.workflow_id,
+                table.bucket,
+            ),
+            idx_workflow_run_rollups_hourly_deployment: index("idx_workflow_run_rollups_hourly_deployment").on(
+                table.deployment_id,
+                table.bucket,
+            ),
+        };
+    },
+);
+
+// Hourly log-spaced duration histograms ("run" and "cold_start"), maintained by a
+// trigger on workflow_runs (see 0205 migration). Bin b covers [1.1^b, 1.1^(b+1)) ms.
+export const workflowRunDurationsHourlyTable = dbSchema.table(
+    "workflow_run_durations_hourly",
+    {
+        bucket: timestamp("bucket").notNull(),
+        org_id: text("org_id").notNull().default(""),
+        user_id: text("user_id").notNull().default(""),
+        workflow_id: text("workflow_id").notNull().default(""),
+        deployment_id: text("deployment_id").notNull().default(""),
+        metric: text("metric").notNull(),
+        bin: integer("bin").notNull(),
+        count: bigint("count", { mode: "number" }).notNull().default(0),
+    },
+    (table) => {
+        return {
+            workflow_run_durations_hourly_key: uniqueIndex("workflow_run_durations_hourly_key").on(
+                table.org_id,
+                table.user_id,
+                table.bucket,
+                table.workflow_id,
+                table.deployment_id,
+                table.metric,
+                table.bin,
+            ),
+            idx_workflow_run_durations_hourly_workflow: index("idx_workflow_run_durations_hourly_workflow").on(
+                table.workflow_id,
+                table.bucket,
+            ),
+            idx_workflow_run_durations_hourly_deployment: index("idx_workflow_run_durations_hourly_deployment").on(
+                table.deployment_id,
+                table.bucket,
+            ),
+        };
+    },
+);
+
+// Progress of the batched rollup backfills (see 0204 migration). Triggers count runs
+// created from `cutoff` on; older runs are backfilled in id order up to `watermark`.
+export const rollupBackfillsTable = dbSchema.table("rollup_backfills", {
+    name: text("name").primaryKey().notNull(),
+    cutoff: timestamp("cutoff").notNull().defaultNow(),
+    watermark: uuid("watermark"),
+    completed_at: timestamp("completed_at"),
+});
+
 // We still want to keep the workflow run record.
 export const workflowRunOutputs = dbSchema.table(
     "workflow_run_outputs",
@@ -824,11 +918,19 @@ export const apiKeyTable = dbSchema.table("api_keys", {
         .notNull(),
     org_id: text("org_id"),
     revoked: boolean("revoked").default(false).notNull(),
+    // Set by a trigger when the key is revoked (see 0206 migration)
+    revoked_at: timestamp("revoked_at"),
     created_at: timestamp("created_at").defaultNow().notNull(),
     updated_at: timestamp("updated_at").defaultNow().notNull(),
     scopes: jsonb("scopes").$type<z.infer<typeof scopes>>(),
     token_type: apiKeyTokenType("token_type").default("user").notNull(),
-});
+},
+    (table) => {
+        return {
+            revokedAtIndex: index("api_keys_revoked_at_index").on(table.revoked_at),
+        };
+    },
+);
 
 export const userUsageTable = dbSchema.table("user_usage", {
     id: uuid("id").primaryKey().defaultRandom().notNull(),
@@ -47,11 +47,12 @@ import logging
 # import all you need from fastapi-pagination
 # from fastapi_pagination import Page, add_pagination, paginate
 from api.middleware.authMiddleware import AuthMiddleware
+from api.middleware.pipeline import RequestPipeline
 
 
 # from logtail import LogtailHandler
 import logging
-from api.router import app, public_api_router, api_router
+from api.router import app, public_api_router, api_router, TrailingSlashMiddleware
 
 
 logger = logfire
@@ -156,9 +157,17 @@ app.include_router(api_router, prefix="/api")  # Add the prefix here instead
 
 # Add CORS middleware
 # app.add_middleware(SpendLimitMiddleware)
-app.add_middleware(AutumnAccessMiddleware)
-app.add_middleware(SubscriptionMiddleware)
-app.add_middleware(AuthMiddleware)
+# Auth, plan resolution, feature gates and Autumn path normalization run as
+# ordered stages of one pure-ASGI middleware so streamed responses pass straight through
+app.add_middleware(
+    RequestPipeline,
+    stages=[
+        AuthMiddleware(),
+        SubscriptionMiddleware(),
+        AutumnAccessMiddleware(),
+        TrailingSlashMiddleware(),
+    ],
+)
 
 # Get frontend URL from environment variable, default to localhost:3000 for development
 
@@ -200,6 +209,7 @@ app.add_middleware(
     allow_credentials=True,  # Allow credentials (cookies)
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination cursor for run listings
 )
 
 logfire.instrument_fastapi(
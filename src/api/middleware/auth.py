@@ -1,17 +1,20 @@
 from datetime import datetime, timezone, timedelta
 from uuid import uuid4
 from api.routes.utils import select
-from api.utils.multi_level_cache import multi_level_cached
+from api.utils.multi_level_cache import LRUMemoryCache, multi_cache, multi_level_cached
+from api.utils.cache_metrics import cache_metrics
+from api.utils.key_revocations import key_revocations
 from fastapi import Request, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 import os
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from fastapi.responses import JSONResponse
 from sqlalchemy import and_
 from api.models import APIKey
 from api.database import get_db_context
 from hashlib import sha256
+import time
 
 JWT_SECRET = os.getenv("JWT_SECRET")
 ALGORITHM = "HS256"
@@ -41,6 +44,80 @@ async def parse_clerk_jwt(token: str) -> Optional[dict]:
 def hash_api_key(key: str) -> str:
     return sha256(key.encode()).hexdigest()
 
+
+# Verified claims keyed by token digest, so repeated requests with the same
+# token skip the HS256/RS256 signature check. Entries never outlive the
+# token's own `exp`. Revocation is still checked on every request, against
+# the in-memory revocation set.
+VERIFIED_TOKEN_TTL = 300
+
+verified_token_cache = LRUMemoryCache(maxsize=10000, default_ttl=VERIFIED_TOKEN_TTL)
+_verify_stats = {"verifications": 0, "verify_cpu_ms": 0.0, "verify_cpu_ms_saved": 0.0}
+
+
+def _verified_token_stats() -> dict:
+    return {
+        **verified_token_cache.stats(),
+        "verifications": _verify_stats["verifications"],
+        "verify_cpu_ms": round(_verify_stats["verify_cpu_ms"], 3),
+        "verify_cpu_ms_saved": round(_verify_stats["verify_cpu_ms_saved"], 3),
+    }
+
+
+cache_metrics.register_size_source("verified_tokens", _verified_token_stats)
+
+
+async def verify_token(token: str) -> Optional[Tuple[dict, bool]]:
+    """Verified claims for a token and whether it is a Clerk token, or None if invalid."""
+    digest = hash_api_key(token)
+    entry = verified_token_cache.get_entry(digest)
+    if entry is not None:
+        claims, is_clerk_token, verify_cpu_ms = entry[0]
+        cache_metrics.record("verified_tokens", "l1_hits")
+        _verify_stats["verify_cpu_ms_saved"] += verify_cpu_ms
+        # Callers add request-scoped fields (e.g. plan) to the returned dict
+        return dict(claims), is_clerk_token
+    cache_metrics.record("verified_tokens", "misses")
+
+    start = time.thread_time()
+    is_clerk_token = False
+    user_data = await parse_jwt(token)
+
+    # Check Clerk auth
+    if not user_data:
+        user_data = await parse_clerk_jwt(token)
+        # backward compatibility for old clerk tokens
+        if user_data is not None:
+            user_data["user_id"] = user_data["sub"]
+            is_clerk_token = True
+
+            # Handle Clerk's new organization structure (o object) vs old org_id
+            if "org_id" not in user_data and "o" in user_data and user_data["o"]:
+                user_data["org_id"] = user_data["o"].get("id")
+
+    verify_cpu_ms = (time.thread_time() - start) * 1000
+    _verify_stats["verifications"] += 1
+    _verify_stats["verify_cpu_ms"] += verify_cpu_ms
+
+    if not user_data:
+        # Invalid tokens are not cached
+        return None
+
+    ttl = VERIFIED_TOKEN_TTL
+    if user_data.get("exp") is not None:
+        ttl = min(ttl, float(user_data["exp"]) - time.time())
+    if ttl > 0:
+        verified_token_cache.put(digest, (dict(user_data), is_clerk_token, verify_cpu_ms), ttl=ttl)
+    return user_data, is_clerk_token
+
+
+async def invalidate_token(token: str) -> None:
+    """Forget a token's verified claims and cached revocation status."""
+    digest = hash_api_key(token)
+    verified_token_cache.pop(digest)
+    # Also broadcast to the other workers' is_key_revoked L1 tier
+    await multi_cache.invalidate(f"api_key:{digest}")
+
 # Function to check if key is revoked
 @multi_level_cached(
     key_prefix="api_key",
@@ -108,6 +185,8 @@ async def delete_api_key(request: Request, db: AsyncSession):
 
     fetchedKey.revoked = True
     await db.commit()
+    await key_revocations.revoke(hash_api_key(fetchedKey.key))
+    await invalidate_token(fetchedKey.key)
     return fetchedKey
 
 def generate_jwt_token(user_id: str, org_id: Optional[str] = None, expires_in: Optional[int] = None) -> str:
@@ -200,29 +279,19 @@ async def get_current_user(request: Request):
     else:
         raise HTTPException(status_code=401, detail="Invalid or missing token")
 
-    # Check API auth
-    user_data = await parse_jwt(token)
-
-    is_clerk_token = False
-
-    # Check Clerk auth
-    if not user_data:
-        user_data = await parse_clerk_jwt(token)
-        # backward compatibility for old clerk tokens
-        if user_data is not None:
-            user_data["user_id"] = user_data["sub"]
-            is_clerk_token = True
-            
-            # Handle Clerk's new organization structure (o object) vs old org_id
-            if "org_id" not in user_data and "o" in user_data and user_data["o"]:
-                user_data["org_id"] = user_data["o"].get("id")
-
-    if not user_data:
+    # Check API auth, then Clerk auth
+    verified = await verify_token(token)
+    if verified is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    user_data, is_clerk_token = verified
 
     # If the key has no expiration, it's not a temporary key, so we check if it's revoked
     if "exp" not in user_data and not is_clerk_token:
-        if await is_key_revoked(token):
+        revoked = key_revocations.is_revoked(hash_api_key(token))
+        if revoked is None:
+            # Revocation set not loaded or too stale, ask the database
+            revoked = await is_key_revoked(token)
+        if revoked:
             raise HTTPException(status_code=401, detail="Revoked token")
     
     return user_data
@@ -1,24 +1,23 @@
 import logging
-from starlette.routing import Match  
 from api.routes.platform import get_clerk_user
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
 from api.database import AsyncSessionLocal
 from .auth import get_current_user
 from cachetools import TTLCache
-from typing import Dict
-from fnmatch import fnmatch
+from typing import Dict, Optional
 import logfire
-import time  # Ensure this import is present at the top
 from api.router import app
+from api.utils.feature_gate import AUTUMN_GUARD_RULES
+from starlette.responses import Response
+from .pipeline import PipelineStage
+from .route_index import AUTH_NONE, AUTH_OPTIONAL, AUTH_REQUIRED, RouteIndex, compiled_scopes
 import traceback  # Ensure this import is present at the top
 
 logger = logging.getLogger(__name__)
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
+class AuthMiddleware(PipelineStage):
+    def __init__(self):
         self._banned_cache: Dict[str, bool] = TTLCache(maxsize=100, ttl=60)
         self.ignored_routes = [
             "/api/gpu_event",
@@ -40,6 +39,12 @@ class AuthMiddleware(BaseHTTPMiddleware):
             "/api/shared-workflows/*",
             "/api/optimize/*",
         ]
+        self.route_index = RouteIndex(
+            app,
+            ignored_routes=self.ignored_routes,
+            optional_auth_routes=self.optional_auth_routes,
+            guard_rules=AUTUMN_GUARD_RULES,
+        )
         # print("AuthMiddleware initialized")  # Test print
 
     async def get_banned_status(self, user_id: str) -> bool:
@@ -58,27 +63,17 @@ class AuthMiddleware(BaseHTTPMiddleware):
             logger.error(f"Error checking banned status: {e}")
             return False
 
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()  # Start timing here
-        
-        route_path = None
+    async def on_request(self, request: Request) -> Optional[Response]:
         full_path = request.url.path
-        function_name = None
-
-        try:
-            for route in app.routes:
-                match, _ = route.matches(request.scope)
-                if match == Match.FULL:
-                    route_path = route.path
-                    function_name = route.endpoint.__name__
-                    break
-        except Exception as e:
-            logger.error(f"Error matching route: {e}")
-
+        route_info = self.route_index.resolve(request.scope)
+        route_path = route_info.route_path
+        function_name = route_info.function_name
+        # Reused by AutumnAccessMiddleware so guard rules are matched once
+        request.state.route_info = route_info
 
-        optional_auth = any(fnmatch(full_path, route) for route in self.optional_auth_routes)
+        optional_auth = route_info.auth_mode == AUTH_OPTIONAL
 
-        if self.should_authenticate(request) and not optional_auth:
+        if route_info.auth_mode == AUTH_REQUIRED:
             # print("Authentication required")  # Test print
             try:
                 await self.authenticate(request)
@@ -124,62 +119,42 @@ class AuthMiddleware(BaseHTTPMiddleware):
             # print("Skipping authentication")  # Test print
             logger.info("Skipping auth check for non-API route or ignored route")
 
-        current_user = getattr(request.state, 'current_user', None)
-        user_id = current_user.get('user_id', 'unknown') if isinstance(current_user, dict) else 'unknown'
-        org_id = current_user.get('org_id', 'unknown') if isinstance(current_user, dict) else 'unknown'
-        
-        try:
-            # # Skip logfire logging for update-run
-            # if request.url.path != "/api/update-run":
-            #     if org_id != "unknown":
-            #         logfire.info("Organization", user_id=user_id, org_id=org_id)
-            #     elif user_id != "unknown":
-            #         logfire.info("User", user_id=user_id)
-                
-            response = await call_next(request)
-            
-            latency_ms = (time.time() - start_time) * 1000  # Convert latency to milliseconds
-
-            logger.info(f"{request.method} {route_path} {response.status_code}", extra={
-                "status_code": response.status_code,
-                "route": route_path,  # Use low-cardinality route path
-                "full_route": full_path,
-                "function_name": function_name,
-                "method": request.method,
-                "user_id": user_id,
-                "org_id": org_id,
-                "latency_ms": latency_ms
-            })
-            return response
-        except Exception as e:
-            latency_ms = (time.time() - start_time) * 1000  # Convert latency to milliseconds even on error
-
-            error_trace = traceback.format_exc()  # Capture traceback explicitly
+        return None
 
-            logger.error(str(e), extra={
-                "route": route_path,  # Use low-cardinality route path
-                "full_route": full_path,
-                "function_name": function_name,
-                "method": request.method,
-                "status_code": 500,
-                "user_id": user_id,
-                "org_id": org_id,
-                "latency_ms": latency_ms,
-                "traceback": error_trace  # Include traceback explicitly in extra
-            })
-            raise e
+    def _log_context(self, request: Request) -> dict:
+        route_info = getattr(request.state, "route_info", None)
+        current_user = getattr(request.state, 'current_user', None)
+        return {
+            "route": route_info.route_path if route_info else None,  # Use low-cardinality route path
+            "full_route": request.url.path,
+            "function_name": route_info.function_name if route_info else None,
+            "method": request.method,
+            "user_id": current_user.get('user_id', 'unknown') if isinstance(current_user, dict) else 'unknown',
+            "org_id": current_user.get('org_id', 'unknown') if isinstance(current_user, dict) else 'unknown',
+        }
+
+    def on_response(self, request: Request, status_code: int, latency_ms: float) -> None:
+        context = self._log_context(request)
+        logger.info(f"{request.method} {context['route']} {status_code}", extra={
+            "status_code": status_code,
+            **context,
+            "latency_ms": latency_ms
+        })
+
+    def on_error(self, request: Request, exc: Exception, latency_ms: float) -> None:
+        error_trace = traceback.format_exc()  # Capture traceback explicitly
+
+        logger.error(str(exc), extra={
+            **self._log_context(request),
+            "status_code": 500,
+            "latency_ms": latency_ms,
+            "traceback": error_trace  # Include traceback explicitly in extra
+        })
 
 
     def should_authenticate(self, request: Request) -> bool:
-        path = request.url.path
-
-        # Check if path matches any of the ignored routes (including wildcards)
-        for route in self.ignored_routes:
-            if fnmatch(path, route):
-                return False
-
-        # Require authentication for all other /api routes
-        return path.startswith("/api")
+        # Ignored routes (including wildcards) and non-API routes skip authentication
+        return self.route_index.auth_mode(request.url.path) != AUTH_NONE
 
     async def authenticate(self, request: Request):
         request.state.current_user = await get_current_user(request)
@@ -208,9 +183,9 @@ class AuthMiddleware(BaseHTTPMiddleware):
             return
         
         # Check if the current path matches any of the allowed scope patterns
-        for scope in scopes:
-            if fnmatch(path, scope):
-                return
+        allowed = compiled_scopes(tuple(scopes))
+        if allowed is not None and allowed.match(path):
+            return
         
         raise HTTPException(
             status_code=403, 
@@ -1,35 +1,29 @@
 import logging
-from fnmatch import fnmatch
 from typing import Dict, Any, Optional
 
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
 
 from api.utils.autumn import autumn_client
 from api.utils.feature_gate import AUTUMN_GUARD_RULES
 from api.routes.platform import get_customer_plan_cached
+from .pipeline import PipelineStage
+from .route_index import GuardRuleIndex
 
 
 logger = logging.getLogger(__name__)
 
+_guard_index = GuardRuleIndex(AUTUMN_GUARD_RULES)
 
-class AutumnAccessMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
 
-    async def dispatch(self, request: Request, call_next):
-        try:
-            if await self._should_block(request):
-                # If blocked, _should_block already returns a JSONResponse; but
-                # to keep the interface clear, we return from here.
-                # However, the method returns bool, so we construct the response here.
-                return JSONResponse(status_code=403, content={"detail": "Access denied for requested operation"})
-
-            response = await call_next(request)
-            return response
-        except HTTPException as exc:
-            return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+class AutumnAccessMiddleware(PipelineStage):
+    async def on_request(self, request: Request) -> Optional[Response]:
+        # _should_block raises HTTPException with a specific message, which the
+        # pipeline turns into a JSON response
+        if await self._should_block(request):
+            return JSONResponse(status_code=403, content={"detail": "Access denied for requested operation"})
+        return None
 
     async def _should_block(self, request: Request) -> bool:
         path = request.url.path
@@ -48,19 +42,14 @@ class AutumnAccessMiddleware(BaseHTTPMiddleware):
         plan = current_user.get("plan")
         # logger.info(f"AutumnAccessMiddleware: {plan}")
 
-        # Try each rule until one applies
-        for rule in AUTUMN_GUARD_RULES:
-            if method not in {m.upper() for m in rule.get("methods", [])}:
-                continue
+        # Rules matching the method and path (excluded paths already dropped),
+        # resolved once per request by AuthMiddleware's route index
+        route_info = getattr(request.state, "route_info", None)
+        rules = route_info.guard_rules if route_info is not None else _guard_index.match(path, method)
 
+        # Try each rule until one applies
+        for rule in rules:
             pattern = rule.get("pattern")
-            if not pattern or not fnmatch(path, pattern):
-                continue
-
-            # Skip excluded paths
-            for ex in rule.get("exclude", []) or []:
-                if fnmatch(path, ex):
-                    return False
 
             # Only apply for free plan if configured
             only_free = rule.get("only_free", True)
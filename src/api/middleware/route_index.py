@@ -0,0 +1,184 @@
+"""
+Precompiled per-request dispatch lookups for the auth and feature-gate middlewares.
+
+Matching a request used to walk every route in `app.routes` and run `fnmatch`
+against each ignored, optional-auth and guard pattern. Here the glob lists are
+compiled once into a single regex each, guard rules are grouped by HTTP method,
+and routes are bucketed by their exact path (static routes) or their leading
+literal segments (parameterised routes). A lookup then only tries the handful
+of routes that can possibly match, in their original order, and returns the
+route template, auth mode and applicable guard rules together.
+"""
+import logging
+import re
+from fnmatch import translate
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from starlette.routing import Match, Mount
+
+logger = logging.getLogger(__name__)
+
+# Leading literal segments used to bucket parameterised routes
+PREFIX_DEPTH = 2
+
+AUTH_REQUIRED = "required"
+AUTH_OPTIONAL = "optional"
+AUTH_NONE = "none"
+
+
+def compile_globs(patterns: Iterable[str]) -> Optional["re.Pattern[str]"]:
+    """Compile fnmatch-style globs into one regex; None when there are no patterns."""
+    patterns = [p for p in patterns if p]
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{translate(p)})" for p in patterns))
+
+
+@lru_cache(maxsize=1024)
+def compiled_scopes(scopes: Tuple[str, ...]) -> Optional["re.Pattern[str]"]:
+    """Compiled form of a token's scope globs, shared across requests with the same token."""
+    return compile_globs(scopes)
+
+
+class _GuardRule(NamedTuple):
+    rule: Dict[str, Any]
+    pattern: "re.Pattern[str]"
+    exclude: Optional["re.Pattern[str]"]
+
+
+class GuardRuleIndex:
+    """AUTUMN_GUARD_RULES grouped by method, with one prefilter regex per method."""
+
+    def __init__(self, rules: Sequence[Dict[str, Any]]):
+        by_method: Dict[str, List[_GuardRule]] = {}
+        for rule in rules:
+            pattern = rule.get("pattern")
+            if not pattern:
+                continue
+            compiled = _GuardRule(rule, compile_globs([pattern]), compile_globs(rule.get("exclude") or []))
+            for method in {m.upper() for m in rule.get("methods", [])}:
+                by_method.setdefault(method, []).append(compiled)
+        self._by_method = {
+            method: (compile_globs(r.rule["pattern"] for r in compiled), tuple(compiled))
+            for method, compiled in by_method.items()
+        }
+
+    def match(self, path: str, method: str) -> Tuple[Dict[str, Any], ...]:
+        """Rules that apply to the request, in order.
+
+        Like the original rule walk, a matching rule whose exclude list also
+        matches ends the walk: it and every later rule are skipped.
+        """
+        entry = self._by_method.get(method.upper())
+        if entry is None:
+            return ()
+        prefilter, rules = entry
+        if not prefilter.match(path):
+            return ()
+        matched = []
+        for guard in rules:
+            if not guard.pattern.match(path):
+                continue
+            if guard.exclude is not None and guard.exclude.match(path):
+                break
+            matched.append(guard.rule)
+        return tuple(matched)
+
+
+class RouteInfo(NamedTuple):
+    route_path: Optional[str]
+    function_name: Optional[str]
+    auth_mode: str
+    guard_rules: Tuple[Dict[str, Any], ...]
+
+
+def _literal_prefix(path: str) -> Tuple[str, ...]:
+    prefix = []
+    for segment in path.strip("/").split("/")[:PREFIX_DEPTH]:
+        if "{" in segment:
+            break
+        prefix.append(segment)
+    return tuple(prefix)
+
+
+class RouteIndex:
+    """Resolves route template, auth mode and guard rules for a request in one lookup.
+
+    The route table is built lazily from `app.routes` on first use (routers are
+    still being included when middlewares are constructed) and rebuilt if the
+    number of routes changes.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        ignored_routes: Sequence[str],
+        optional_auth_routes: Sequence[str],
+        guard_rules: Sequence[Dict[str, Any]] = (),
+    ):
+        self.app = app
+        self._ignored = compile_globs(ignored_routes)
+        self._optional = compile_globs(optional_auth_routes)
+        self.guards = GuardRuleIndex(guard_rules)
+        self._route_count = -1
+        self._static: Dict[str, List[Tuple[int, Any]]] = {}
+        self._dynamic: Dict[Tuple[str, ...], List[Tuple[int, Any]]] = {}
+        self._fallback: List[Tuple[int, Any]] = []
+
+    def auth_mode(self, path: str) -> str:
+        if self._optional is not None and self._optional.match(path):
+            return AUTH_OPTIONAL
+        if not path.startswith("/api") or (self._ignored is not None and self._ignored.match(path)):
+            return AUTH_NONE
+        return AUTH_REQUIRED
+
+    def match_route(self, scope: Dict[str, Any]) -> Optional[Any]:
+        """First route that fully matches the scope, as a walk over app.routes would find it."""
+        routes = self.app.routes
+        if len(routes) != self._route_count:
+            self._build(routes)
+
+        path = scope["path"]
+        segments = path.strip("/").split("/")
+        candidates = list(self._static.get(path, ()))
+        for depth in range(PREFIX_DEPTH + 1):
+            candidates.extend(self._dynamic.get(tuple(segments[:depth]), ()))
+        candidates.extend(self._fallback)
+        candidates.sort(key=lambda item: item[0])
+
+        for _, route in candidates:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route
+        return None
+
+    def resolve(self, scope: Dict[str, Any]) -> RouteInfo:
+        path = scope["path"]
+        try:
+            route = self.match_route(scope)
+        except Exception as e:
+            logger.error(f"Error matching route: {e}")
+            route = None
+        return RouteInfo(
+            route_path=getattr(route, "path", None),
+            function_name=getattr(getattr(route, "endpoint", None), "__name__", None),
+            auth_mode=self.auth_mode(path),
+            guard_rules=self.guards.match(path, scope.get("method", "GET")),
+        )
+
+    def _build(self, routes: Sequence[Any]) -> None:
+        static: Dict[str, List[Tuple[int, Any]]] = {}
+        dynamic: Dict[Tuple[str, ...], List[Tuple[int, Any]]] = {}
+        fallback: List[Tuple[int, Any]] = []
+        for position, route in enumerate(routes):
+            path = getattr(route, "path", None)
+            if path is None or isinstance(route, Mount):
+                # Mounts match whole subtrees; always try them
+                fallback.append((position, route))
+            elif "{" not in path:
+                static.setdefault(path, []).append((position, route))
+            else:
+                dynamic.setdefault(_literal_prefix(path), []).append((position, route))
+        self._static, self._dynamic, self._fallback = static, dynamic, fallback
+        self._route_count = len(routes)
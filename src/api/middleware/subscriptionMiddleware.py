@@ -1,32 +1,25 @@
 import json
 import logging
 from api.routes.platform import get_customer_plan_cached
-from fastapi import Request, HTTPException
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Optional
+from fastapi import Request
+from starlette.responses import Response
 import logfire
+from .pipeline import PipelineStage
 
 logger = logging.getLogger(__name__)
 
-class SubscriptionMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-
-    async def dispatch(self, request: Request, call_next):
-        try:
-            if request.url.path.startswith("/api"):
-                # Skip logging for update-run
-                # if request.url.path == "/api/update-run":
-                #     await self.check_subscription_access(request)
-                # else:
-                    # with logfire.span("Check subscription access"):
-                await self.check_subscription_access(request)
-            response = await call_next(request)
-            return response
-        except HTTPException as exc:
-            return JSONResponse(
-                status_code=exc.status_code, content={"detail": exc.detail}
-            )
+class SubscriptionMiddleware(PipelineStage):
+    async def on_request(self, request: Request) -> Optional[Response]:
+        # HTTPException raised here is turned into a JSON response by the pipeline
+        if request.url.path.startswith("/api"):
+            # Skip logging for update-run
+            # if request.url.path == "/api/update-run":
+            #     await self.check_subscription_access(request)
+            # else:
+                # with logfire.span("Check subscription access"):
+            await self.check_subscription_access(request)
+        return None
 
     async def check_subscription_access(self, request: Request):
         # Check if request.state exists and has current_user attribute
@@ -265,6 +265,64 @@ WorkflowRunWithExtra.run_duration = column_property(
 )
 
 
+class WorkflowRunRollupHourly(SerializableMixin, Base):
+    """Hourly run counts per dimension, maintained by a trigger on workflow_runs.
+
+    Missing dimensions are stored as '' so they can be part of the unique key.
+    """
+
+    __tablename__ = "workflow_run_rollups_hourly"
+    metadata = metadata
+
+    org_id = Column(String, primary_key=True, default="")
+    user_id = Column(String, primary_key=True, default="")
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    workflow_id = Column(String, primary_key=True, default="")
+    deployment_id = Column(String, primary_key=True, default="")
+    machine_id = Column(String, primary_key=True, default="")
+    gpu = Column(String, primary_key=True, default="")
+    origin = Column(String, primary_key=True, default="")
+    status = Column(String, primary_key=True, default="")
+    count = Column(BigInteger, nullable=False, default=0)
+
+
+class WorkflowRunDurationHourly(SerializableMixin, Base):
+    """Hourly log-spaced duration histograms, maintained by a trigger on workflow_runs.
+
+    `metric` is "run" (ended_at - started_at) or "cold_start" (started_at - queued_at);
+    bin b counts durations in [1.1^b, 1.1^(b+1)) milliseconds.
+    """
+
+    __tablename__ = "workflow_run_durations_hourly"
+    metadata = metadata
+
+    org_id = Column(String, primary_key=True, default="")
+    user_id = Column(String, primary_key=True, default="")
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    workflow_id = Column(String, primary_key=True, default="")
+    deployment_id = Column(String, primary_key=True, default="")
+    metric = Column(String, primary_key=True)
+    bin = Column(Integer, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+
+class RollupBackfill(SerializableMixin, Base):
+    """Progress of a batched rollup backfill (see api.utils.rollup_backfill).
+
+    Triggers count runs created from `cutoff` on; runs created before it are
+    backfilled in id order up to `watermark`. Until `completed_at` is set the
+    rollup is incomplete and readers must count workflow_runs directly.
+    """
+
+    __tablename__ = "rollup_backfills"
+    metadata = metadata
+
+    name = Column(String, primary_key=True)
+    cutoff = Column(DateTime(timezone=True), nullable=False)
+    watermark = Column(UUID(as_uuid=True))
+    completed_at = Column(DateTime(timezone=True))
+
+
 class WorkflowRunOutput(SerializableMixin, Base):
     __tablename__ = "workflow_run_outputs"
     metadata = metadata
@@ -293,6 +351,7 @@ class APIKey(SerializableMixin, Base):
     user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     org_id = Column(String)
     revoked = Column(Boolean, nullable=False, default=False)
+    revoked_at = Column(DateTime(timezone=True))  # Set by a database trigger on revocation
     scopes = Column(JSON, nullable=True)  # New field for storing endpoint permissions
     token_type = Column(
         Enum("user", "machine", "scoped", name="api_key_token_type"),
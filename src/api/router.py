@@ -4,55 +4,52 @@ from fastapi import APIRouter
 from pydantic import BaseModel
 from scalar_fastapi import get_scalar_api_reference
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 import os
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 from contextlib import asynccontextmanager
 import re
 
 from api.autumn_mount import autumn_app
+from api.middleware.pipeline import PipelineStage
+from api.utils.multi_level_cache import multi_cache
+from api.utils.run_progress_writer import run_progress_writer
+from api.utils.webhook_dispatcher import webhook_dispatcher
+from api.utils.s3_client import S3ClientManager
+from api.utils.loop_monitor import loop_lag_monitor
+from api.utils.key_revocations import key_revocations
+from api.utils.autumn import autumn_client
+from api.utils.autumn_usage import autumn_usage
+from api.utils.rollup_backfill import rollup_backfill
 
 if TYPE_CHECKING:
     pass
 
 
-class TrailingSlashMiddleware(BaseHTTPMiddleware):
+# Autumn ASGI routes that specifically DON'T need trailing slashes
+AUTUMN_ROUTE_EXCEPTIONS = re.compile(
+    r"^/api/autumn/customers/[^/]+/entities/[^/]+$"  # DELETE route doesn't use trailing slash
+    r"|^/api/autumn/webhook$"  # DELETE route doesn't use trailing slash
+)
+
+
+class TrailingSlashMiddleware(PipelineStage):
     """
-    Middleware to handle trailing slash normalization for Autumn ASGI routes.
+    Pipeline stage to handle trailing slash normalization for Autumn ASGI routes.
     This prevents 307 redirects by ensuring trailing slashes are properly handled.
     """
-    async def dispatch(self, request: Request, call_next):
+    async def on_request(self, request: Request) -> Optional[Response]:
         # Only handle requests to /api/autumn/*
-        if request.url.path.startswith("/api/autumn/"):
-            path = request.url.path
-            
+        path = request.scope["path"]
+        if path.startswith("/api/autumn/"):
             # Since ALL Autumn ASGI routes start with /api/autumn/ and most need trailing slashes,
             # we'll add trailing slashes to all routes except specific exceptions
-            autumn_route_exceptions = [
-                # Add any routes that specifically DON'T need trailing slashes
-                r"^/api/autumn/customers/[^/]+/entities/[^/]+$",  # DELETE route doesn't use trailing slash
-                r"^/api/autumn/webhook$",  # DELETE route doesn't use trailing slash
-            ]
-            
-            # Check if this path needs a trailing slash
-            if not path.endswith("/"):
-                # Check if it's in the exception list
-                is_exception = any(
-                    re.match(pattern, path) for pattern in autumn_route_exceptions
-                )
-                
-                if not is_exception:
-                    # Add trailing slash to ALL /api/autumn/* routes by default
-                    expected_path = f"{path}/"
-                    scope = request.scope.copy()
-                    scope["path"] = expected_path
-                    scope["raw_path"] = expected_path.encode()
-                    request._url = None  # Force URL rebuild
-                    request.scope.update(scope)
-        
-        response = await call_next(request)
-        return response
+            if not path.endswith("/") and not AUTUMN_ROUTE_EXCEPTIONS.match(path):
+                # Add trailing slash to ALL /api/autumn/* routes by default
+                expected_path = f"{path}/"
+                request.scope["path"] = expected_path
+                request.scope["raw_path"] = expected_path.encode()
+        return None
 
 
 @asynccontextmanager
@@ -61,9 +58,27 @@ async def lifespan(app: FastAPI):
     Lifespan context manager for FastAPI app startup and shutdown events.
     """
     # Startup
+    await multi_cache.invalidation_bus.start()
+    await webhook_dispatcher.start()
+    await loop_lag_monitor.start()
+    await key_revocations.start()
+    await autumn_usage.start()
+    await rollup_backfill.start()
     yield
     
     # Shutdown - Clean shutdown handler for Autumn ASGI app
+    await multi_cache.invalidation_bus.stop()
+    # Imported here: api.routes pulls in the middlewares, which import this module
+    from api.routes.log import progress_multiplexer
+    await progress_multiplexer.close()
+    await run_progress_writer.stop()
+    await webhook_dispatcher.stop()
+    await S3ClientManager.close_all()
+    await loop_lag_monitor.stop()
+    await key_revocations.stop()
+    await autumn_usage.stop()
+    await rollup_backfill.stop()
+    await autumn_client.close()
     await autumn_app.close()
 
 
@@ -79,9 +94,6 @@ app = FastAPI(
     ]
 )
 
-# Add trailing slash middleware to handle Autumn ASGI routing
-app.add_middleware(TrailingSlashMiddleware)
-
 api_router = APIRouter()  # Remove the prefix here
 public_api_router = APIRouter()  # Remove the prefix here
 basic_public_api_router = APIRouter()  # Remove the prefix here
@@ -8,6 +8,8 @@ from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.database import get_db
+from api.utils.cache_metrics import cache_metrics
+from api.utils.multi_level_cache import multi_cache
 from api.models import Deployment, WorkflowRun
 from api.routes.deployments import (
     DeploymentModel,
@@ -208,4 +210,33 @@ async def scan_legacy_deployments(
 
     except Exception as e:
         logger.error(f"Error scanning legacy deployments: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+class CacheStatsResponse(BaseModel):
+    multi_level: dict
+    prefixes: dict
+    l2_latency: dict
+    sizes: dict
+
+@router.get(
+    "/cache/stats",
+    response_model=CacheStatsResponse,
+    openapi_extra={
+        "x-speakeasy-name-override": "cacheStats",
+    },
+)
+async def get_cache_stats(request: Request):
+    """
+    Read-only view of this worker's cache counters: per-prefix hit/miss ratios,
+    L1 vs L2 hits, refresh tasks, L2 latency histograms and current L1 size.
+    Counters are per process and reset on restart; logfire has the fleet view.
+    """
+    check_admin_org(request)
+
+    snapshot = cache_metrics.snapshot()
+    return CacheStatsResponse(
+        multi_level=multi_cache.stats(),
+        prefixes=snapshot["prefixes"],
+        l2_latency=snapshot["l2_latency"],
+        sizes=snapshot["sizes"],
+    )
@@ -19,6 +19,7 @@ from typing import Optional
 from botocore.config import Config
 import random
 import aioboto3
+from api.utils.s3_client import S3ClientManager
 import mimetypes
 from sqlalchemy import and_, func
 from datetime import datetime
@@ -179,66 +180,59 @@ async def upload_file(
     # else:
     file_path = f"inputs/{file_id}{file_extension}"
 
-    async with aioboto3.Session().client(
-        "s3",
-        region_name=region,
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        aws_session_token=session_token,
-        config=Config(signature_version="s3v4"),
-    ) as s3_client:
-        try:
-            file_content = await file.read()
-            await s3_client.put_object(
-                Bucket=bucket,
-                Key=file_path,
-                Body=file_content,
-                ACL="public-read" if public else "private",
-                ContentType=file_type,
-            )
+    s3_client = await S3ClientManager.get_async_client(region, access_key, secret_key, session_token)
+    try:
+        file_content = await file.read()
+        await s3_client.put_object(
+            Bucket=bucket,
+            Key=file_path,
+            Body=file_content,
+            ACL="public-read" if public else "private",
+            ContentType=file_type,
+        )
 
-            file_url = f"https://{bucket}.s3.{region}.amazonaws.com/{file_path}"
+        file_url = f"https://{bucket}.s3.{region}.amazonaws.com/{file_path}"
 
-            if not public:
-                file_url = get_temporary_download_url(
-                    file_url,
-                    region,
-                    access_key,
-                    secret_key,
-                    session_token,
-                    expiration=3600,  # Set expiration to 1 hour
-                )
+        if not public:
+            file_url = get_temporary_download_url(
+                file_url,
+                region,
+                access_key,
+                secret_key,
+                session_token,
+                expiration=3600,  # Set expiration to 1 hour
+            )
 
-            # TODO: Implement PostHog event capture here if needed
-            
-            return {
-                "message": "File uploaded successfully",
-                "file_id": file_id,
-                "file_name": file.filename,
-                "file_url": file_url,
-            }
+        # TODO: Implement PostHog event capture here if needed
+        
+        return {
+            "message": "File uploaded successfully",
+            "file_id": file_id,
+            "file_name": file.filename,
+            "file_url": file_url,
+        }
 
-            # # After successful upload, create asset record
-            # new_asset = Asset(
-            #     id=file_id,
-            #     name=file.filename,
-            #     is_folder=False,
-            #     path=file_path,
-            #     url=file_url,
-            #     mime_type=file_type,
-            #     created_at=datetime.utcnow(),
-            #     updated_at=datetime.utcnow(),
-            #     file_size=file.size
-            # )
-            
-            # db.add(new_asset)
-            # await db.commit()
-            # await db.refresh(new_asset)
-            
-            # return new_asset
-        except Exception as e:
-            logger.error(f"Error uploading file: {str(e)}")
-            raise HTTPException(status_code=500, detail="Error uploading file")
+        # # After successful upload, create asset record
+        # new_asset = Asset(
+        #     id=file_id,
+        #     name=file.filename,
+        #     is_folder=False,
+        #     path=file_path,
+        #     url=file_url,
+        #     mime_type=file_type,
+        #     created_at=datetime.utcnow(),
+        #     updated_at=datetime.utcnow(),
+        #     file_size=file.size
+        # )
+        
+        # db.add(new_asset)
+        # await db.commit()
+        # await db.refresh(new_asset)
+        
+        # return new_asset
+    except Exception as e:
+        logger.error(f"Error uploading file: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error uploading file")
 
 
 @router.post("/assets/folder", response_model=AssetResponse)
@@ -369,14 +363,8 @@ async def delete_asset(
         # Prefix the path with 'assets/' for S3 operations
         s3_path = f"assets/{asset.path}"
 
-        async with aioboto3.Session().client(
-            "s3",
-            region_name=region,
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            aws_session_token=session_token,
-        ) as s3_client:
-            await s3_client.delete_object(Bucket=bucket, Key=s3_path)
+        s3_client = await S3ClientManager.get_async_client(region, access_key, secret_key, session_token)
+        await s3_client.delete_object(Bucket=bucket, Key=s3_path)
 
     await db.delete(asset)
     await db.commit()
@@ -437,61 +425,54 @@ async def upload_asset_file(
     # Create the database path without 'assets' prefix
     db_file_path = os.path.join(parent_path.lstrip("/"), f"{file_id}{file_extension}").replace("\\", "/")
 
-    async with aioboto3.Session().client(
-        "s3",
-        region_name=region,
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        aws_session_token=session_token,
-        config=Config(signature_version="s3v4"),
-    ) as s3_client:
-        try:
-            file_content = await file.read()
-            await s3_client.put_object(
-                Bucket=bucket,
-                Key=s3_file_path,  # Use S3 path with assets prefix
-                Body=file_content,
-                ACL="public-read" if public else "private",
-                ContentType=file_type,
-            )
+    s3_client = await S3ClientManager.get_async_client(region, access_key, secret_key, session_token)
+    try:
+        file_content = await file.read()
+        await s3_client.put_object(
+            Bucket=bucket,
+            Key=s3_file_path,  # Use S3 path with assets prefix
+            Body=file_content,
+            ACL="public-read" if public else "private",
+            ContentType=file_type,
+        )
 
-            file_url = f"https://{bucket}.s3.{region}.amazonaws.com/{s3_file_path}"  # Use S3 path
-            
-            # Store the original URL without generating temporary URL
-            new_asset = Asset(
-                user_id=user_id,
-                org_id=org_id,
-                id=file_id,
-                name=file.filename,
-                is_folder=False,
-                path=db_file_path,  # Use DB path without assets prefix
-                url=file_url,
-                mime_type=file_type,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow(),
-                file_size=file.size
+        file_url = f"https://{bucket}.s3.{region}.amazonaws.com/{s3_file_path}"  # Use S3 path
+        
+        # Store the original URL without generating temporary URL
+        new_asset = Asset(
+            user_id=user_id,
+            org_id=org_id,
+            id=file_id,
+            name=file.filename,
+            is_folder=False,
+            path=db_file_path,  # Use DB path without assets prefix
+            url=file_url,
+            mime_type=file_type,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+            file_size=file.size
+        )
+        
+        db.add(new_asset)
+        await db.commit()
+        await db.refresh(new_asset)
+        
+        # Generate temporary URL only for the response if needed
+        if not public:
+            new_asset.file_url = get_temporary_download_url(
+                file_url,
+                region,
+                access_key,
+                secret_key,
+                session_token,
+                expiration=3600,
             )
-            
-            db.add(new_asset)
-            await db.commit()
-            await db.refresh(new_asset)
-            
-            # Generate temporary URL only for the response if needed
-            if not public:
-                new_asset.file_url = get_temporary_download_url(
-                    file_url,
-                    region,
-                    access_key,
-                    secret_key,
-                    session_token,
-                    expiration=3600,
-                )
-            
-            return new_asset
+        
+        return new_asset
 
-        except Exception as e:
-            logger.error(f"Error uploading file: {str(e)}")
-            raise HTTPException(status_code=500, detail="Error uploading file")
+    except Exception as e:
+        logger.error(f"Error uploading file: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error uploading file")
 
 
 @router.get("/assets/presigned-url")
@@ -310,9 +310,9 @@ async def check_s3_object_exists(s3_config: S3Config, s3_key: str) -> bool:
     
     # with logfire.span("check_s3_object_exists", extra={"s3_key": s3_key}):
     try:
-        async with await S3ClientManager.get_s3_client(s3_config) as s3:
-            await s3.head_object(Bucket=s3_config.bucket, Key=s3_key)
-            return True
+        s3 = await S3ClientManager.get_s3_client(s3_config)
+        await s3.head_object(Bucket=s3_config.bucket, Key=s3_key)
+        return True
     except ClientError as e:
         if e.response['Error']['Code'] == '404':
             return False
@@ -327,28 +327,20 @@ async def check_s3_object_exists(s3_config: S3Config, s3_key: str) -> bool:
 )
 async def check_s3_object_public(s3_config: S3Config, s3_key: str) -> bool:
     """Check if S3 object is publicly accessible"""
-    import aioboto3
     from botocore.exceptions import ClientError
     
     # with logfire.span("check_s3_object_public", extra={"s3_key": s3_key}):
     try:
-        session = aioboto3.Session()
-        async with session.client(
-            's3',
-            region_name=s3_config.region,
-            aws_access_key_id=s3_config.access_key,
-            aws_secret_access_key=s3_config.secret_key,
-            aws_session_token=s3_config.session_token
-        ) as s3:
-            # Get object ACL
-            acl = await s3.get_object_acl(Bucket=s3_config.bucket, Key=s3_key)
-            
-            # Check if there's a public read grant
-            for grant in acl.get('Grants', []):
-                grantee = grant.get('Grantee', {})
-                if grantee.get('URI') == 'http://acs.amazonaws.com/groups/global/AllUsers' and grant.get('Permission') in ['READ', 'READ_ACP']:
-                    return True
-            return False
+        s3 = await S3ClientManager.get_s3_client(s3_config)
+        # Get object ACL
+        acl = await s3.get_object_acl(Bucket=s3_config.bucket, Key=s3_key)
+        
+        # Check if there's a public read grant
+        for grant in acl.get('Grants', []):
+            grantee = grant.get('Grantee', {})
+            if grantee.get('URI') == 'http://acs.amazonaws.com/groups/global/AllUsers' and grant.get('Permission') in ['READ', 'READ_ACP']:
+                return True
+        return False
     except ClientError as e:
         logfire.error("Failed to check object ACL", extra={
             "s3_key": s3_key,
@@ -19,7 +19,7 @@ from uuid import uuid4
 from datetime import datetime, timezone
 from fastapi.responses import RedirectResponse
 from pydantic import UUID4, BaseModel, Field
-from typing import Optional, Any, cast
+from typing import NamedTuple, Optional, Any, cast
 from datetime import datetime
 from enum import Enum
 import boto3
@@ -32,14 +32,16 @@ from pprint import pprint
 import logfire
 from sqlalchemy.orm import defer
 from api.utils.constants import blocking_log_streaming_user_id
+from api.utils.run_progress_writer import PROGRESS_WRITE_BEHIND, run_progress_writer
+from api.utils.webhook_dispatcher import WebhookDelivery, webhook_dispatcher
+from api.utils.multi_level_cache import LRUMemoryCache, SingleFlight
+from api.utils.cache_metrics import cache_metrics
 
 from .utils import (
-    async_lru_cache,
     clean_up_outputs,
     generate_presigned_url,
     get_user_settings,
     post_process_outputs,
-    retry_fetch,
     select,
 )
 from sqlalchemy import update, case, and_
@@ -58,7 +60,7 @@ from datetime import datetime, timezone
 import datetime as dt
 
 from fastapi import Depends
-from api.utils.autumn import send_autumn_usage_event, autumn_client
+from api.utils.autumn_usage import autumn_usage
 
 from upstash_redis.asyncio import Redis
 from .log import cancel_active_streams, delayed_archive_logs_for_run, is_terminal_status, signal_stream_end
@@ -68,7 +70,7 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-async def track_gpu_concurrency_change(
+def track_gpu_concurrency_change(
     customer_id: str,
     increment: int,
     gpu_event_id: str
@@ -76,6 +78,9 @@ async def track_gpu_concurrency_change(
     """
     Track GPU concurrency change by increment (+1 for start, -1 for end).
     
+    The change is queued on the Autumn usage pipeline, so the GPU event
+    callback does not wait on the Autumn API.
+    
     Args:
         customer_id: The customer ID (org_id or user_id)
         increment: +1 for gpu_start, -1 for gpu_end
@@ -87,15 +92,15 @@ async def track_gpu_concurrency_change(
         idempotency_key = f"{prefix}{gpu_event_id}"
         
         # Track feature usage increment/decrement in Autumn
-        await autumn_client.track_feature_usage(
+        autumn_usage.track_feature_usage(
             customer_id=customer_id,
             feature_id="gpu_concurrency_limit",
             value=increment,
             idempotency_key=idempotency_key
         )
         
-        action = "incremented" if increment > 0 else "decremented"
-        logger.info(f"GPU concurrency count {action} by {abs(increment)} for customer {customer_id} (event: {gpu_event_id})")
+        action = "increment" if increment > 0 else "decrement"
+        logger.info(f"GPU concurrency count {action} by {abs(increment)} for customer {customer_id} queued (event: {gpu_event_id})")
         
     except Exception as e:
         logger.error(f"Failed to track GPU concurrency change for customer {customer_id}: {str(e)}")
@@ -113,9 +118,8 @@ async def send_webhook(
     run_id: str,
     type: str = "run.updated",
 ):
-    # try:
+    """Queue a webhook on the dispatcher; delivery and retries happen in the background."""
     url = workflow_run["webhook"]
-    extra_headers = {}  # You may want to define this based on your requirements
 
     payload = {
         "event_type": type,
@@ -130,81 +134,75 @@ async def send_webhook(
 
     logging.info("Webhook going to be sent to: " + url)
 
-    headers = {"Content-Type": "application/json", **extra_headers}
+    webhook_dispatcher.enqueue(
+        WebhookDelivery(
+            url=url,
+            payload=payload,
+            run_id=str(workflow_run["id"]),
+            event_type=type,
+        )
+    )
+    return {"status": "success", "message": "Webhook queued"}
 
-    options = {"method": "POST", "headers": headers, "json": payload}
 
-    start_time = time.time()
-    response = await retry_fetch(url, options)
-    latency_ms = (time.time() - start_time) * 1000
+async def log_webhook_result(
+    delivery: WebhookDelivery,
+    status: Optional[int],
+    latency_ms: float,
+    error: Optional[str],
+):
+    ok = status is not None and 200 <= status < 300
 
     # Prepare webhook log entry for Redis
     webhook_log_entry = {
-        "timestamp": start_time,
+        "timestamp": time.time() - latency_ms / 1000,
         "level": "webhook",  # Set webhook level for proper filtering
         "logs": json.dumps({
             "type": "webhook",
-            "status": json_safe_value(response.status),
+            "status": json_safe_value(status),
             "latency_ms": latency_ms,
-            "url": url,
-            "message": json_safe_value(response.text) if not response.ok else None,
-            "payload": json.dumps(payload),
+            "url": delivery.url,
+            "message": json_safe_value(error) if not ok else None,
+            "payload": json.dumps(delivery.payload),
+            "attempt": delivery.attempt + 1,
         })
     }
+    await insert_log_entry_to_redis(delivery.run_id, [webhook_log_entry])
 
-    asyncio.create_task(
-        insert_log_entry_to_redis(workflow_run["id"], [webhook_log_entry])
-    )
-
-    if response.ok:
-        # logfire.info(
-        #     "Webhook sent successfully",
-        #     workflow_run_id=workflow_run["id"],
-        #     workflow_id=workflow_run["workflow_id"],
-        #     url=url,
-        # )
+    if ok:
         logger.info(
-            f"POST webhook {response.status}",
+            f"POST webhook {status}",
             extra={
-                "status_code": response.status,
+                "status_code": status,
                 "route": "webhook",  # Use low-cardinality route path
                 "full_route": "webhook",
                 "function_name": "send_webhook",
                 "method": "POST",
-                # "user_id": workflow_run["user_id"],
-                # "org_id": workflow_run["org_id"],
                 "latency_ms": latency_ms,
             },
         )
-        return {"status": "success", "message": "Webhook sent successfully"}
     else:
         logfire.error(
-            f"Webhook failed with status {response.status}",
-            workflow_run_id=workflow_run["id"],
-            workflow_id=workflow_run["workflow_id"],
-            url=url,
+            f"Webhook failed with status {status}",
+            workflow_run_id=delivery.run_id,
+            url=delivery.url,
+            attempt=delivery.attempt + 1,
+            error=error,
         )
         logger.error(
-            f"POST webhook {response.status}",
+            f"POST webhook {status}",
             extra={
-                "status_code": response.status,
+                "status_code": status,
                 "route": "webhook",  # Use low-cardinality route path
                 "full_route": "webhook",
                 "function_name": "send_webhook",
                 "method": "POST",
-                # "user_id": workflow_run["user_id"],
-                # "org_id": workflow_run["org_id"],
                 "latency_ms": latency_ms,
             },
         )
-        return {
-            "status": "error",
-            "message": f"Webhook failed with status {response.status}",
-        }
-    # except Exception as error:
-    #     logging.info("Webhook failed with error: " + str(error))
-    #     raise error
-    #     return {"status": "error", "message": str(error)}
+
+
+webhook_dispatcher.on_result = log_webhook_result
 
 
 class UpdateRunBody(BaseModel):
@@ -353,9 +351,57 @@ async def publish_progress_update(
 endStatuses = ["success", "failed", "timeout", "cancelled"]
 
 
-@async_lru_cache(maxsize=1000)
-async def get_cached_workflow_run(run_id: str, db: AsyncSession):
-    return await get_workflow_run(run_id, db)
+class RunMetadata(NamedTuple):
+    """The immutable slice of a run that /update-run needs on every call."""
+
+    id: Any
+    user_id: Optional[str]
+    org_id: Optional[str]
+    workflow_id: Any
+    machine_id: Any
+    webhook: Optional[str]
+    webhook_intermediate_status: bool
+
+
+RUN_METADATA_TTL = 300
+
+run_metadata_cache = LRUMemoryCache(maxsize=10000, default_ttl=RUN_METADATA_TTL)
+cache_metrics.register_size_source("run_metadata", run_metadata_cache.stats)
+_run_metadata_flight = SingleFlight()
+
+_run_metadata_columns = (
+    WorkflowRun.id,
+    WorkflowRun.user_id,
+    WorkflowRun.org_id,
+    WorkflowRun.workflow_id,
+    WorkflowRun.machine_id,
+    WorkflowRun.webhook,
+    WorkflowRun.webhook_intermediate_status,
+)
+
+
+async def _load_run_metadata(run_id: str) -> Optional[RunMetadata]:
+    # The load is shared by every waiting request, so it must not borrow any
+    # one request's session: that session may close while others still wait
+    async with get_db_context() as db:
+        result = await db.execute(select(*_run_metadata_columns).where(WorkflowRun.id == run_id))
+        row = result.first()
+    if row is None:
+        return None
+    metadata = RunMetadata(*row)
+    run_metadata_cache.put(str(run_id), metadata)
+    return metadata
+
+
+async def get_cached_workflow_run(run_id: str) -> Optional[RunMetadata]:
+    """Run metadata keyed by run_id; concurrent misses for one run share a single query."""
+    entry = run_metadata_cache.get_entry(str(run_id))
+    if entry is not None:
+        cache_metrics.record("run_metadata", "l1_hits")
+        return entry[0]
+    cache_metrics.record("run_metadata", "misses")
+    # Unknown runs are not cached, the row may be inserted right after
+    return await _run_metadata_flight.run(str(run_id), _load_run_metadata, run_id)
 
 async def get_workflow_run(run_id: str, db: AsyncSession):
     existing_run = await db.execute(select(WorkflowRun)
@@ -365,6 +411,41 @@ async def get_workflow_run(run_id: str, db: AsyncSession):
     workflow_run = cast(WorkflowRun, workflow_run)
     return workflow_run
 
+async def send_status_webhook(request: Request, run_id: str, updated_at: datetime):
+    """Post-commit stage of a status update: load outputs and deliver the webhook."""
+    try:
+        async with get_db_context() as db:
+            existing_run = await db.execute(
+                select(WorkflowRun).where(WorkflowRun.id == run_id)
+            )
+            workflow_run = existing_run.scalar_one_or_none()
+            if workflow_run is None or workflow_run.webhook is None:
+                return
+
+            outputs_result = await db.execute(
+                select(WorkflowRunOutput).where(WorkflowRunOutput.run_id == run_id)
+            )
+            outputs = outputs_result.scalars().all()
+
+            user_settings = await get_user_settings(request, db)
+
+        if outputs:
+            await post_process_outputs(outputs, user_settings)
+        clean_up_outputs(outputs)
+        # Instead of setting outputs directly, create a new dictionary with all the data
+        workflow_run_data = workflow_run.to_dict()
+        workflow_run_data["outputs"] = [output.to_dict() for output in outputs]
+    except Exception as e:
+        logfire.error("Error preparing status webhook", run_id=str(run_id), error=str(e))
+        return
+
+    await send_webhook(
+        workflow_run=workflow_run_data,
+        updated_at=updated_at,
+        run_id=workflow_run.id,
+    )
+
+
 @router.post("/update-run", include_in_schema=False)
 async def update_run(
     request: Request,
@@ -384,7 +465,7 @@ async def update_run(
             # fixed_time = request.time.replace(tzinfo=timezone.utc) if request.time and request.time.tzinfo is None else request.time
             fixed_time = updated_at
 
-            workflow_run = await get_cached_workflow_run(body.run_id, db)
+            workflow_run = await get_cached_workflow_run(body.run_id)
             
             if workflow_run is not None and workflow_run.user_id in blocking_log_streaming_user_id:
                 is_blocking_log_update = True
@@ -448,6 +529,22 @@ async def update_run(
 
             # Updating the progress
             if body.live_status is not None and body.progress is not None:
+                # Runs with intermediate webhooks need the fresh row, so only
+                # the rest go through the write-behind buffer
+                if (
+                    PROGRESS_WRITE_BEHIND
+                    and workflow_run is not None
+                    and not (workflow_run.webhook is not None and workflow_run.webhook_intermediate_status)
+                ):
+                    run_progress_writer.enqueue(
+                        body.run_id,
+                        live_status=body.live_status,
+                        progress=body.progress,
+                        updated_at=updated_at,
+                        gpu_event_id=body.gpu_event_id,
+                    )
+                    return {"status": "success"}
+
                 # Updating the workflow run table with live_status, progress, and updated_at
                 update_stmt = (
                     update(WorkflowRun)
@@ -481,12 +578,10 @@ async def update_run(
                     workflow_run.webhook is not None
                     and workflow_run.webhook_intermediate_status
                 ):
-                    asyncio.create_task(
-                        send_webhook(
-                            workflow_run=workflow_run.to_dict(),
-                            updated_at=updated_at,
-                            run_id=workflow_run.id,
-                        )
+                    await send_webhook(
+                        workflow_run=workflow_run.to_dict(),
+                        updated_at=updated_at,
+                        run_id=workflow_run.id,
                     )
 
                 return {"status": "success"}
@@ -564,14 +659,11 @@ async def update_run(
                             outputs = clean_up_outputs([newOutput])
                             if len(outputs) > 0:
                                 workflow_run_data["outputs"] = [output.to_dict() for output in outputs]
-                                asyncio.create_task(
-                                    send_webhook(
-                                        workflow_run=workflow_run_data,
-                                        updated_at=updated_at,
-                                        run_id=workflow_run.id,
-                                        type="run.output",
-                                        # client=client,
-                                    )
+                                await send_webhook(
+                                    workflow_run=workflow_run_data,
+                                    updated_at=updated_at,
+                                    run_id=workflow_run.id,
+                                    type="run.output",
                                 )
                                 # logfire.info("No outputs to send", workflow_run_id=workflow_run.id)
                     except Exception as e:
@@ -603,33 +695,6 @@ async def update_run(
                     )
 
             elif body.status is not None:
-                # Get existing run
-                
-                # if body.status is not None:
-                    # print("update_run", body.status, body.run_id)
-                
-                existing_run = await db.execute(
-                    select(WorkflowRun).where(WorkflowRun.id == body.run_id)
-                )
-                workflow_run = existing_run.scalar_one_or_none()
-                workflow_run = cast(WorkflowRun, workflow_run)
-
-                if not workflow_run:
-                    raise HTTPException(status_code=404, detail="WorkflowRun not found")
-
-                # If the run is already cancelled, don't update it
-                if workflow_run.status == "cancelled":
-                    return {"status": "success"}
-
-                # If the run is already timed out, don't update it
-                if workflow_run.status == "timeout":
-                    return {"status": "success"}
-
-                # Update the run status
-                update_data = {"status": body.status, "updated_at": updated_at}
-                if ended and fixed_time is not None:
-                    update_data["ended_at"] = fixed_time
-
                 update_values = {
                     "status": body.status,
                     "ended_at": updated_at if ended else None,
@@ -640,6 +705,37 @@ async def update_run(
                 if body.modal_function_call_id:
                     update_values["modal_function_call_id"] = body.modal_function_call_id
 
+                # Buffered progress must not land after the final status
+                if ended:
+                    run_progress_writer.discard(body.run_id)
+
+                # One round-trip: runs already in a terminal state (including
+                # cancelled / timed out ones) are left untouched
+                update_stmt = (
+                    update(WorkflowRun)
+                    .where(
+                        and_(
+                            WorkflowRun.id == body.run_id, ~WorkflowRun.status.in_(endStatuses)
+                        )
+                    )
+                    .values(**update_values)
+                    .returning(*_run_metadata_columns)
+                )
+                result = await db.execute(update_stmt)
+                workflow_run = result.first()
+                await db.commit()
+
+                if workflow_run is None:
+                    existing_status = await db.execute(
+                        select(WorkflowRun.status).where(WorkflowRun.id == body.run_id)
+                    )
+                    if existing_status.scalar_one_or_none() is None:
+                        raise HTTPException(status_code=404, detail="WorkflowRun not found")
+                    return {"status": "success"}
+
+                workflow_run = RunMetadata(*workflow_run)
+                run_metadata_cache.put(str(body.run_id), workflow_run)
+
                 if body.status == "success":
                     # logfire.info(
                     #     "Workflow run success",
@@ -719,26 +815,6 @@ async def update_run(
                         },
                     )
 
-                update_stmt = (
-                    update(WorkflowRun)
-                    .where(
-                        and_(
-                            WorkflowRun.id == body.run_id, ~WorkflowRun.status.in_(endStatuses)
-                        )
-                    )
-                    .values(**update_values)
-                )
-                await db.execute(update_stmt)
-                await db.commit()
-                await db.refresh(workflow_run)
-
-                # Get the updated workflow run
-                existing_run = await db.execute(
-                    select(WorkflowRun).where(WorkflowRun.id == body.run_id)
-                )
-                workflow_run = existing_run.scalar_one_or_none()
-                workflow_run = cast(WorkflowRun, workflow_run)
-
                 # Sending to clickhouse
                 # progress_data = [
                 #     (
@@ -787,34 +863,11 @@ async def update_run(
                     # Add delay before archiving to allow final logs to arrive
                     background_tasks.add_task(delayed_archive_logs_for_run, body.run_id)
 
-                # Get all outputs for the workflow run
-                outputs_query = select(WorkflowRunOutput).where(
-                    WorkflowRunOutput.run_id == body.run_id
-                )
-                outputs_result = await db.execute(outputs_query)
-                outputs = outputs_result.scalars().all()
-
-                user_settings = await get_user_settings(request, db)
-                if outputs:
-                    await post_process_outputs(outputs, user_settings)
-                clean_up_outputs(outputs)
-                # Instead of setting outputs directly, create a new dictionary with all the data
-                workflow_run_data = workflow_run.to_dict()
-                workflow_run_data["outputs"] = [output.to_dict() for output in outputs]
-                # workflow_run_data["status"] = request.status.value
-
+                # Outputs and the webhook payload are built after the response
                 if workflow_run.webhook is not None:
-                    asyncio.create_task(
-                        send_webhook(
-                            workflow_run=workflow_run_data,
-                            updated_at=updated_at,
-                            run_id=workflow_run.id,
-                            # client=client,
-                        )
+                    background_tasks.add_task(
+                        send_status_webhook, request, body.run_id, updated_at
                     )
-                    # background_tasks.add_task(
-                    #     send_webhook, workflow_run, updated_at, workflow_run.id
-                    # )
 
                 return {"status": "success"}
 
@@ -879,7 +932,7 @@ async def create_gpu_event(
                     await db.commit()
                     
                     # Track GPU concurrency change (+1 for gpu_start)
-                    await track_gpu_concurrency_change(
+                    track_gpu_concurrency_change(
                         customer_id=gpu_event.org_id or gpu_event.user_id,
                         increment=1,
                         gpu_event_id=str(gpu_event.id)
@@ -913,7 +966,7 @@ async def create_gpu_event(
                 await db.commit()
                 
                 # Track GPU concurrency change (+1 for gpu_start)
-                await track_gpu_concurrency_change(
+                track_gpu_concurrency_change(
                     customer_id=final_org_id or final_user_id,
                     increment=1,
                     gpu_event_id=str(gpu_event.id)
@@ -939,14 +992,14 @@ async def create_gpu_event(
             await db.commit()
             
             # Track GPU concurrency change (-1 for gpu_end)
-            await track_gpu_concurrency_change(
+            track_gpu_concurrency_change(
                 customer_id=event.org_id or event.user_id,
                 increment=-1,
                 gpu_event_id=str(event.id)
             )
 
-            # Send usage data to Autumn API
-            await send_autumn_usage_event(
+            # Queue usage data for the Autumn API
+            autumn_usage.send_gpu_usage_event(
                 customer_id=event.org_id or event.user_id,
                 gpu_type=event.gpu,
                 start_time=event.start_time,
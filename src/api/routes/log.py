@@ -27,6 +27,8 @@ import uuid
 from upstash_redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 import redis.asyncio as redis_asyncio
+from api.utils.stream_fanout import StreamFanoutHub, END_OF_STREAM
+from api.utils.pubsub_multiplexer import PubSubMultiplexer
 
 logger = logging.getLogger(__name__)
 
@@ -56,6 +58,43 @@ redis_stream_client = (
     redis_asyncio.from_url(_redis_tcp_url_log) if _redis_tcp_url_log else None
 )
 
+# One XREAD loop per run per worker, shared by every viewer of that run
+log_stream_hub = (
+    StreamFanoutHub(redis_stream_client, batch_size=200, replay_size=1000)
+    if redis_stream_client is not None
+    else None
+)
+LOG_STREAM_FANOUT = os.getenv("LOG_STREAM_FANOUT", "true").lower() != "false"
+
+
+def parse_progress_message(raw: Any) -> Optional[dict]:
+    """
+    Parse a progress pub/sub payload once for every subscriber on this worker.
+    Returns the normalized fields and the pre-rendered SSE frame.
+    """
+    try:
+        message_data = json.loads(raw)
+    except (json.JSONDecodeError, TypeError) as e:
+        logger.error(f"Error parsing Redis message: {e}")
+        return None
+
+    # Support compact short-key payloads as well as legacy payloads
+    # r=run_id, w=workflow_id, m=machine_id, s=status, p=progress, t=timestamp, n=node/log
+    progress_data = {
+        "run_id": message_data.get("run_id") or message_data.get("r"),
+        "workflow_id": message_data.get("workflow_id") or message_data.get("w"),
+        "machine_id": message_data.get("machine_id") or message_data.get("m"),
+        "progress": message_data.get("progress") if message_data.get("progress") is not None else message_data.get("p", 0),
+        "status": message_data.get("status") or message_data.get("s"),
+        "node_class": message_data.get("log") or message_data.get("n", ""),
+        "timestamp": message_data.get("timestamp") or message_data.get("t"),
+    }
+    return {"data": progress_data, "sse": f"data: {json.dumps(progress_data)}\n\n"}
+
+
+# One pub/sub connection per worker shared by every progress stream
+progress_multiplexer = PubSubMultiplexer(get_redis_pubsub_client, parse_progress_message)
+
 # Sentinel helper to end a stream immediately
 async def signal_stream_end(run_id: str):
     try:
@@ -142,6 +181,7 @@ async def stream_logs_endpoint_smart(
     session_id: Optional[str] = None,
     log_level: Optional[str] = None,
     client_id: Optional[str] = None,
+    batch: bool = False,
     db: AsyncSession = Depends(get_db),
 ):
     target_id = run_id or machine_id_version or session_id
@@ -211,16 +251,46 @@ async def stream_logs_endpoint_smart(
         )
     else:
         # Stream live logs using blocking reads over TCP Redis
-        return StreamingResponse(
-            stream_logs_blocking(target_id, log_level, client_id),
-            media_type="text/event-stream",
-        )
+        if LOG_STREAM_FANOUT and log_stream_hub is not None:
+            stream = stream_logs_shared(target_id, log_level, client_id, as_array=batch)
+        else:
+            stream = stream_logs_blocking(target_id, log_level, client_id, as_array=batch)
+        return StreamingResponse(stream, media_type="text/event-stream")
+
+
+# Batched tailing: entries per XREAD and the adaptive flush window for SSE chunks
+LOG_TAIL_BATCH_SIZE = 200
+LOG_TAIL_MIN_FLUSH_INTERVAL = 0.0
+LOG_TAIL_MAX_FLUSH_INTERVAL = 0.25
+LOG_TAIL_MAX_FRAME_ENTRIES = 500
+
+
+def _format_log_chunk(log_entries: list, as_array: bool = False) -> str:
+    """
+    Render buffered log entries as one chunk. By default this is several SSE events
+    written at once (compatible with per-line clients); with as_array a single
+    `log_batch` event carries all entries.
+    """
+    if as_array:
+        return f"data: {json.dumps({'type': 'log_batch', 'logs': log_entries})}\n\n"
+    return "".join(f"data: {json.dumps(log_entry)}\n\n" for log_entry in log_entries)
 
 
-async def stream_logs_blocking(run_id: str, log_level: Optional[str] = None, client_id: str = "default"):
+async def stream_logs_blocking(
+    run_id: str,
+    log_level: Optional[str] = None,
+    client_id: str = "default",
+    batch_size: int = LOG_TAIL_BATCH_SIZE,
+    as_array: bool = False,
+):
     """
     Stream logs using TCP Redis with blocking XREAD. No polling loop, minimal idle commands.
     Each client tails the stream independently (broadcast semantics).
+
+    Reads up to `batch_size` entries per XREAD and writes them as one chunk. While
+    the stream is busy (reads come back full) the flush window grows up to
+    LOG_TAIL_MAX_FLUSH_INTERVAL so more lines share a write; once it quiets down
+    the window shrinks back and lines are flushed as soon as they are read.
     """
     # await register_active_stream(run_id, client_id)
 
@@ -232,26 +302,35 @@ async def stream_logs_blocking(run_id: str, log_level: Optional[str] = None, cli
     stream_name = run_id
     # Start from the beginning of the stream
     last_id = "0"
+    loop = asyncio.get_running_loop()
+
+    buffer: list = []
+    flush_interval = LOG_TAIL_MIN_FLUSH_INTERVAL
+    flush_deadline: Optional[float] = None
 
     try:
         while True:
+            # Block indefinitely while idle; only until the flush deadline while buffering
+            if buffer and flush_deadline is not None:
+                block_ms = max(1, int((flush_deadline - loop.time()) * 1000))
+            else:
+                block_ms = 0
+
             try:
-                # Block indefinitely until new entries arrive, one at a time
                 entries = await redis_stream_client.xread(
                     streams={stream_name: last_id},
-                    count=1,
-                    block=0,
+                    count=batch_size,
+                    block=block_ms,
                 )
             except Exception as e:
                 logger.warning(f"xread error for {run_id}: {e}")
                 await asyncio.sleep(1)
                 continue
 
-            if not entries:
-                continue
-
-            for stream, items in entries:
+            read_count = 0
+            for stream, items in entries or []:
                 for message_id, fields in items:
+                    read_count += 1
                     try:
                         # redis-py returns dict of field->value
                         if isinstance(fields, dict):
@@ -260,6 +339,9 @@ async def stream_logs_blocking(run_id: str, log_level: Optional[str] = None, cli
                             # Defensive: support tuple/list format [key, value]
                             value = fields[1] if len(fields) >= 2 else None
 
+                        # Advance tail position
+                        last_id = message_id
+
                         if value is None:
                             continue
 
@@ -268,6 +350,8 @@ async def stream_logs_blocking(run_id: str, log_level: Optional[str] = None, cli
 
                         # End-of-stream sentinel
                         if value == "__END__":
+                            if buffer:
+                                yield _format_log_chunk(buffer, as_array)
                             yield f"data: {json.dumps({'type': 'stream_complete', 'source': 'sentinel'})}\n\n"
                             return
 
@@ -276,14 +360,34 @@ async def stream_logs_blocking(run_id: str, log_level: Optional[str] = None, cli
                         except json.JSONDecodeError:
                             log_data = value
 
-                        for log_entry in normalize_log_data(log_data, log_level):
-                            yield f"data: {json.dumps(log_entry)}\n\n"
-
-                        # Advance tail position
-                        last_id = message_id
+                        buffer.extend(normalize_log_data(log_data, log_level))
                     except Exception as e:
                         logger.error(f"Error processing Redis stream entry: {e}")
                         continue
+
+            # A full read means more is waiting: widen the window, otherwise shrink it
+            if read_count >= batch_size:
+                flush_interval = min(
+                    max(flush_interval * 2, 0.01), LOG_TAIL_MAX_FLUSH_INTERVAL
+                )
+            else:
+                flush_interval = max(flush_interval / 2, LOG_TAIL_MIN_FLUSH_INTERVAL)
+                if flush_interval < 0.01:
+                    flush_interval = LOG_TAIL_MIN_FLUSH_INTERVAL
+
+            if not buffer:
+                flush_deadline = None
+                continue
+            if flush_deadline is None:
+                flush_deadline = loop.time() + flush_interval
+
+            if (
+                len(buffer) >= LOG_TAIL_MAX_FRAME_ENTRIES
+                or loop.time() >= flush_deadline
+            ):
+                yield _format_log_chunk(buffer, as_array)
+                buffer = []
+                flush_deadline = None
     except asyncio.CancelledError:
         logger.info(f"Client {client_id} stream cancelled for run {run_id}")
         raise
@@ -295,6 +399,46 @@ async def stream_logs_blocking(run_id: str, log_level: Optional[str] = None, cli
         # await unregister_active_stream(run_id)
 
 
+async def stream_logs_shared(
+    run_id: str,
+    log_level: Optional[str] = None,
+    client_id: str = "default",
+    as_array: bool = False,
+):
+    """
+    Stream logs through the per-worker fan-out hub. All viewers of a run share one
+    XREAD loop; late joiners replay the hub's ring buffer first.
+    """
+    try:
+        async with log_stream_hub.subscribe(run_id) as subscription:
+            async for batch in subscription:
+                log_entries = []
+                for value in batch:
+                    # End-of-stream sentinel
+                    if value == END_OF_STREAM:
+                        if log_entries:
+                            yield _format_log_chunk(log_entries, as_array)
+                        yield f"data: {json.dumps({'type': 'stream_complete', 'source': 'sentinel'})}\n\n"
+                        return
+
+                    try:
+                        log_data = json.loads(value)
+                    except json.JSONDecodeError:
+                        log_data = value
+                    log_entries.extend(normalize_log_data(log_data, log_level))
+
+                if subscription.dropped:
+                    # Tell slow viewers that lines were skipped to keep up
+                    yield f"data: {json.dumps({'type': 'logs_dropped', 'count': subscription.dropped})}\n\n"
+                    subscription.dropped = 0
+
+                if log_entries:
+                    yield _format_log_chunk(log_entries, as_array)
+    except asyncio.CancelledError:
+        logger.info(f"Client {client_id} stream cancelled for run {run_id}")
+        raise
+
+
 def normalize_log_data(log_data: Any, log_level_filter: Optional[str] = None) -> list:
     """
     Normalize different log data formats to the expected schema.
@@ -1022,6 +1166,101 @@ async def stream_progress_endpoint_v2(
     )
 
 
+# Window over which progress messages are coalesced before hydrating runs
+RUN_HYDRATION_WINDOW = 0.15
+
+
+async def debounced_batches(subscription, window: float):
+    """
+    Yield lists of messages: wait for one, then keep collecting whatever arrives
+    within `window` seconds so a burst becomes one batch.
+    """
+    loop = asyncio.get_running_loop()
+    async for first in subscription:
+        batch = [first]
+        deadline = loop.time() + window
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(anext(subscription), remaining))
+            except asyncio.TimeoutError:
+                break
+            except StopAsyncIteration:
+                # Subscription was dropped by the multiplexer
+                yield batch
+                return
+        yield batch
+
+
+class RunHydrator:
+    """
+    Loads full run objects for progress streams with return_run. Runs are loaded
+    in one IN (...) query per batch; user settings are fetched once per connection.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        id_type: str,
+        id_value: str,
+        status: Optional[str] = None,
+        deployment_id: Optional[str] = None,
+    ):
+        self.request = request
+        self.id_type = id_type
+        self.id_value = id_value
+        self.status = status
+        self.deployment_id = deployment_id
+        self.user_settings = None
+
+    async def load(self, run_ids: list) -> list:
+        if not run_ids:
+            return []
+
+        async with get_db_context() as db:
+            run_query = (
+                select(WorkflowRunWithExtra)
+                .options(joinedload(WorkflowRun.outputs))
+                .where(WorkflowRun.id.in_(run_ids))
+            )
+
+            # Apply additional filters based on the original request
+            if self.id_type == "workflow":
+                run_query = run_query.where(WorkflowRun.workflow_id == self.id_value)
+            elif self.id_type == "machine":
+                run_query = run_query.where(WorkflowRun.machine_id == self.id_value)
+
+            if self.status:
+                run_query = run_query.where(WorkflowRun.status == self.status)
+
+            if self.deployment_id:
+                run_query = run_query.where(WorkflowRun.deployment_id == self.deployment_id)
+
+            result = await db.execute(run_query)
+            runs = {str(run.id): run for run in result.unique().scalars().all()}
+
+            if runs and self.user_settings is None:
+                self.user_settings = await get_user_settings(self.request, db)
+
+        run_dicts = []
+        # Keep the order in which updates arrived
+        for run_id in run_ids:
+            run = runs.get(str(run_id))
+            if run is None:
+                logger.warning(f"Run {run_id} not found in database with query filters")
+                continue
+            run = cast(WorkflowRun, run)
+            ensure_run_timeout(run)
+            await post_process_outputs(run.outputs, self.user_settings)
+
+            run_dict = run.to_dict()
+            run_dict.pop("run_log", None)
+            run_dicts.append(run_dict)
+        return run_dicts
+
+
 async def stream_progress_v2(
     id_type: str,
     id_value: str,
@@ -1049,131 +1288,66 @@ async def stream_progress_v2(
         #     # you can also scope these similarly. For now, keep global.
         #     channels = ["workflow_events"]
         
-        # Subscribe to the Redis channels
-        redis_client = None
-        pubsub = None
+        channel = channels[0]
+
+        def accepts(message: dict) -> bool:
+            # Filter messages based on the request parameters
+            progress_data = message.get("data") or {}
+            if id_type == "workflow" and progress_data.get("workflow_id") != id_value:
+                return False
+            if id_type == "machine" and progress_data.get("machine_id") != id_value:
+                return False
+            # Apply status filter if specified
+            if status and progress_data.get("status") != status:
+                return False
+            return True
+
         try:
-            # Create Redis pub/sub client
-            redis_client = get_redis_pubsub_client()
-            pubsub = redis_client.pubsub()
-            
-            logger.info(f"Starting Redis pub/sub stream for {id_type} {id_value}, channels: {channels}")
-            
-            # Subscribe to the appropriate channels
-            for channel in channels:
-                await pubsub.subscribe(channel)
-                logger.info(f"Subscribed to Redis channel: {channel}")
-            
-            # Send initial connection confirmation
-            yield f"data: {json.dumps({'type': 'connection_established', 'channels': channels})}\n\n"
-            
-            # Listen for messages
-            async for message in pubsub.listen():
-                if message['type'] == 'message':
-                    try:
-                        # Parse the message data
-                        message_data = json.loads(message['data'])
-
-                        # Support compact short-key payloads as well as legacy payloads
-                        # r=run_id, w=workflow_id, m=machine_id, s=status, p=progress, t=timestamp, n=node/log
-                        run_id_msg = message_data.get("run_id") or message_data.get("r")
-                        workflow_id_msg = message_data.get("workflow_id") or message_data.get("w")
-                        machine_id_msg = message_data.get("machine_id") or message_data.get("m")
-                        status_msg = message_data.get("status") or message_data.get("s")
-                        progress_msg = message_data.get("progress") if message_data.get("progress") is not None else message_data.get("p", 0)
-                        timestamp_msg = message_data.get("timestamp") or message_data.get("t")
-                        node_msg = message_data.get("log") or message_data.get("n", "")
-                        
-                        # Filter messages based on the request parameters
-                        should_include = True
-                        
-                        if id_type == "workflow" and workflow_id_msg != id_value:
-                            should_include = False
-                        elif id_type == "machine" and machine_id_msg != id_value:
-                            should_include = False
-                        
-                        # Apply status filter if specified
-                        if status and status_msg != status:
-                            should_include = False
-                        
-                        if should_include:
-                            if return_run:
-                                # Fetch the full run data when requested
-                                try:
-                                    async with get_db_context() as db:
-                                        # Get the run_id from the message data
-                                        message_run_id = run_id_msg
-                                        if not message_run_id:
-                                            logger.warning("No run_id in message data for returnRun request")
-                                            continue
-                                        
-                                        run_query = (
-                                            select(WorkflowRunWithExtra)
-                                            .options(joinedload(WorkflowRun.outputs))
-                                            .where(WorkflowRun.id == message_run_id)
-                                        )
-                                        
-                                        # Apply additional filters based on the original request
-                                        if id_type == "workflow":
-                                            run_query = run_query.where(WorkflowRun.workflow_id == id_value)
-                                        elif id_type == "machine":
-                                            run_query = run_query.where(WorkflowRun.machine_id == id_value)
-                                        
-                                        if status:
-                                            run_query = run_query.where(WorkflowRun.status == status)
-                                        
-                                        if deployment_id:
-                                            run_query = run_query.where(WorkflowRun.deployment_id == deployment_id)
-                                        
-                                        result = await db.execute(run_query)
-                                        run = result.unique().scalar_one_or_none()
-                                        
-                                        if run:
-                                            run = cast(WorkflowRun, run)
-                                            ensure_run_timeout(run)
-                                            user_settings = await get_user_settings(request, db)
-                                            await post_process_outputs(run.outputs, user_settings)
-                                            
-                                            run_dict = run.to_dict()
-                                            run_dict.pop("run_log", None)
-                                            logger.debug(f"Sending full run object for run {message_run_id}, keys: {list(run_dict.keys())}")
-                                            yield f"data: {json.dumps(run_dict)}\n\n"
-                                        else:
-                                            logger.warning(f"Run {message_run_id} not found in database with query filters")
-                                except Exception as e:
-                                    logger.error(f"Error fetching run data: {e}")
+            # Share the worker's single pub/sub connection; messages arrive parsed
+            async with progress_multiplexer.subscribe(channel, accepts) as subscription:
+                logger.info(f"Starting Redis pub/sub stream for {id_type} {id_value}, channels: {channels}")
+
+                # Send initial connection confirmation
+                yield f"data: {json.dumps({'type': 'connection_established', 'channels': channels})}\n\n"
+                yield f"data: {json.dumps({'type': 'subscribed', 'channel': channel})}\n\n"
+
+                if return_run:
+                    # Coalesce bursts per run and load them with one query
+                    hydrator = RunHydrator(request, id_type, id_value, status, deployment_id)
+                    async for batch in debounced_batches(subscription, RUN_HYDRATION_WINDOW):
+                        try:
+                            latest_status = {}
+                            for message in batch:
+                                run_id_msg = message["data"]["run_id"]
+                                if not run_id_msg:
+                                    logger.warning("No run_id in message data for returnRun request")
                                     continue
-                            else:
-                                # Send the progress data directly (normalized fields)
-                                progress_data = {
-                                    "run_id": run_id_msg,
-                                    "workflow_id": workflow_id_msg,
-                                    "machine_id": machine_id_msg,
-                                    "progress": progress_msg,
-                                    "status": status_msg,
-                                    "node_class": node_msg,
-                                    "timestamp": timestamp_msg,
-                                }
-                                logger.debug(f"Sending progress data for run {message_data.get('run_id')}")
-                                yield f"data: {json.dumps(progress_data)}\n\n"
-                            
-                            # Check for terminal status - only break for run-specific streams
-                            if (id_type == "run" and 
-                                (status_msg) in ["success", "failed", "timeout", "cancelled"]):
-                                logger.info(f"Terminal status received for run stream: {message_data.get('status')}")
-                                break
-                                
-                    except json.JSONDecodeError as e:
-                        logger.error(f"Error parsing Redis message: {e}")
-                        continue
-                    except Exception as e:
-                        logger.error(f"Error processing Redis message: {e}")
-                        continue
-                
-                elif message['type'] == 'subscribe':
-                    logger.info(f"Successfully subscribed to channel: {message['channel']}")
-                    # Send confirmation that we're connected and listening
-                    yield f"data: {json.dumps({'type': 'subscribed', 'channel': message['channel'].decode()})}\n\n"
+                                latest_status[run_id_msg] = message["data"]["status"]
+
+                            for run_dict in await hydrator.load(list(latest_status)):
+                                logger.debug(f"Sending full run object for run {run_dict.get('id')}, keys: {list(run_dict.keys())}")
+                                yield f"data: {json.dumps(run_dict)}\n\n"
+                        except Exception as e:
+                            logger.error(f"Error fetching run data: {e}")
+                            continue
+
+                        # Check for terminal status - only break for run-specific streams
+                        if id_type == "run" and any(
+                            is_terminal_status(s) for s in latest_status.values()
+                        ):
+                            logger.info("Terminal status received for run stream")
+                            break
+                else:
+                    async for message in subscription:
+                        status_msg = message["data"]["status"]
+                        # Send the progress data directly (serialized once per message)
+                        logger.debug(f"Sending progress data for run {message['data']['run_id']}")
+                        yield message["sse"]
+
+                        # Check for terminal status - only break for run-specific streams
+                        if id_type == "run" and is_terminal_status(status_msg):
+                            logger.info(f"Terminal status received for run stream: {status_msg}")
+                            break
                     
         except asyncio.CancelledError:
             logger.info(f"Redis pub/sub stream cancelled for {id_type} {id_value}")
@@ -1181,21 +1355,6 @@ async def stream_progress_v2(
         except Exception as e:
             logger.error(f"Error in Redis pub/sub stream: {e}")
             yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-                    
-        finally:
-            # Clean up the pub/sub connection
-            if pubsub:
-                try:
-                    await pubsub.unsubscribe(*channels)
-                    await pubsub.close()
-                except Exception as e:
-                    logger.warning(f"Error cleaning up pub/sub connection: {e}")
-            
-            if redis_client:
-                try:
-                    await redis_client.close()
-                except Exception as e:
-                    logger.warning(f"Error closing Redis client: {e}")
             
     except Exception as e:
         logger.error(f"Error in stream_progress_v2: {e}")
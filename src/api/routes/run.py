@@ -50,6 +50,7 @@ from .utils import (
 from botocore.config import Config
 import random
 import aioboto3
+from api.utils.s3_client import S3ClientManager
 from sqlalchemy.orm import defer
 from api.utils.constants import blocking_log_streaming_user_id
 
@@ -643,13 +644,10 @@ async def cancel_run(
                 workflow_run_data["outputs"] = [output.to_dict() for output in outputs]
                 
                 if workflow_run.webhook is not None:
-                    asyncio.create_task(
-                        send_webhook(
-                            workflow_run=workflow_run_data,
-                            updated_at=now,
-                            run_id=workflow_run.id,
-                            # client=client,
-                        )
+                    await send_webhook(
+                        workflow_run=workflow_run_data,
+                        updated_at=now,
+                        run_id=workflow_run.id,
                     )
                     
                 status_event = {
@@ -1073,25 +1071,18 @@ async def _create_run(
             file_path = f"inputs/{file_id}.{image_format}"
             
             # Upload to S3
-            async with aioboto3.Session().client(
-                "s3",
-                region_name=s3_config.region,
-                aws_access_key_id=s3_config.access_key,
-                aws_secret_access_key=s3_config.secret_key,
-                aws_session_token=s3_config.session_token,
-                config=Config(signature_version="s3v4"),
-            ) as s3_client:
-                await s3_client.put_object(
-                    Bucket=s3_config.bucket,
-                    Key=file_path,
-                    Body=image_data,
-                    ACL="public-read" if s3_config.public else "private",
-                    ContentType=content_type,
-                )
-                
-                file_url = f"https://{s3_config.bucket}.s3.{s3_config.region}.amazonaws.com/{file_path}"
-                return file_url
-        
+            s3_client = await S3ClientManager.get_s3_client(s3_config)
+            await s3_client.put_object(
+                Bucket=s3_config.bucket,
+                Key=file_path,
+                Body=image_data,
+                ACL="public-read" if s3_config.public else "private",
+                ContentType=content_type,
+            )
+            
+            file_url = f"https://{s3_config.bucket}.s3.{s3_config.region}.amazonaws.com/{file_path}"
+            return file_url
+
         # OPTIMIZATION 4: Process all base64 items found in scan
         for item in base64_items:
             if item[0] == 'input':  # Direct input
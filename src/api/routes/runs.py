@@ -1,5 +1,5 @@
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, NamedTuple, Optional, Tuple
 from .types import (
     WorkflowRunModel, 
     MachineGPU,
@@ -9,11 +9,13 @@ from .types import (
 from fastapi import APIRouter, Request, Query
 from api.database import AsyncSessionLocal
 from .utils import select
-from api.models import WorkflowRun
+from api.models import WorkflowRun, WorkflowRunDurationHourly, WorkflowRunRollupHourly
+from api.utils.rollup_backfill import rollup_backfill
 from fastapi.responses import JSONResponse
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import func, case
+from sqlalchemy import func, case, literal_column, union_all
 from collections import defaultdict
+from enum import Enum
 import asyncio
 from pydantic import BaseModel, Field
 
@@ -310,16 +312,75 @@ VALID_FILTERS = {
 #         }
 #     )
     
+def _hour_floor(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _hour_ceil(value: datetime) -> datetime:
+    floor = _hour_floor(value)
+    return floor if floor == value else floor + timedelta(hours=1)
+
+
+class _CountRangeSplit(NamedTuple):
+    # The rollup counts [rollup_start, rollup_end); None leaves that side open
+    rollup_start: Optional[datetime]
+    rollup_end: Optional[datetime]
+    # Counted from workflow_runs: [start, rollup_start) and [rollup_end, end] inclusive
+    head: Optional[Tuple[datetime, datetime]]
+    tail: Optional[Tuple[datetime, datetime]]
+
+
+def _split_count_range(
+    start_time: Optional[datetime], end_time: Optional[datetime]
+) -> Optional[_CountRangeSplit]:
+    """Split [start_time, end_time] at whole hours; None if it contains no whole hour."""
+    rollup_start = _hour_ceil(start_time) if start_time else None
+    rollup_end = _hour_floor(end_time) if end_time else None
+    if rollup_start and rollup_end and rollup_start >= rollup_end:
+        return None
+    head = (start_time, rollup_start) if start_time and start_time < rollup_start else None
+    tail = (rollup_end, end_time) if end_time else None
+    return _CountRangeSplit(rollup_start, rollup_end, head, tail)
+
+
+def _typed_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    typed = {}
+    for key, value in (filters or {}).items():
+        # Apply only whitelisted filters
+        if key not in VALID_FILTERS or value is None:
+            continue
+        try:
+            # Compare enum filters by value, not by their "Enum.MEMBER" string
+            typed[key] = VALID_FILTERS[key](value.value if isinstance(value, Enum) else value)
+        except (ValueError, TypeError):
+            logger.warning(f"Invalid value for filter {key}: {value}")
+    return typed
+
+
+def _rollup_org_condition(request: Request, model=WorkflowRunRollupHourly):
+    # Rollups store a missing org_id as '' instead of NULL
+    current_user = request.state.current_user
+    org_id = current_user.get("org_id")
+    if org_id:
+        return model.org_id == org_id
+    return (model.user_id == current_user["user_id"]) & (model.org_id == "")
+
+
 async def get_runs_count(
+    request: Request,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
     filters: Optional[Dict[str, Any]] = None
 ) -> int:
     """
     Get the total number of runs within the specified time range and filters.
-    This is an optimized version that only returns the count without fetching full run data.
-    
+
+    Whole hours are summed from the hourly rollup table; only the partial
+    hours at either edge of the range are counted from workflow_runs. Until
+    the rollup backfill is complete, the whole range is counted exactly.
+
     Args:
+        request (Request): Request whose user/org the count is scoped to
         start_time (datetime, optional): Start time to filter runs
         end_time (datetime, optional): End time to filter runs
         filters (Dict, optional): Additional filters to apply. Valid filters are:
@@ -329,31 +390,48 @@ async def get_runs_count(
             - workflow_id (str): Workflow identifier
             - machine_id (str): Machine identifier
             - deployment_id (str): Deployment identifier
-    
+
     Returns:
         int: Total number of runs matching the criteria
     """
+    typed_filters = _typed_filters(filters)
+
+    def exact_count(lower: Optional[datetime], upper: Optional[datetime], upper_inclusive: bool):
+        query = select(func.count(WorkflowRun.id)).apply_org_check(request)
+        if lower:
+            query = query.filter(WorkflowRun.created_at >= lower)
+        if upper:
+            query = query.filter(
+                WorkflowRun.created_at <= upper if upper_inclusive else WorkflowRun.created_at < upper
+            )
+        for key, value in typed_filters.items():
+            query = query.filter(getattr(WorkflowRun, key) == value)
+        return query
+
+    split = _split_count_range(start_time, end_time)
+    rollup_ready = await rollup_backfill.is_complete("workflow_run_rollups_hourly")
+
     async with AsyncSessionLocal() as db:
-        query = select(func.count(WorkflowRun.id))
-        
-        if start_time:
-            query = query.filter(WorkflowRun.created_at >= start_time)
-        if end_time:
-            query = query.filter(WorkflowRun.created_at <= end_time)
-            
-        if filters:
-            # Apply only whitelisted filters
-            for key, value in filters.items():
-                if key in VALID_FILTERS:
-                    # Convert value to expected type
-                    try:
-                        typed_value = VALID_FILTERS[key](value)
-                        query = query.filter(getattr(WorkflowRun, key) == typed_value)
-                    except (ValueError, TypeError) as e:
-                        logger.warning(f"Invalid value for filter {key}: {value}")
-                        continue
-        
-        return await db.scalar(query)
+        if not rollup_ready or split is None:
+            # Older runs are not all in the rollup yet, or the range contains no whole hour
+            return await db.scalar(exact_count(start_time, end_time, upper_inclusive=True)) or 0
+
+        rollup_query = select(
+            func.coalesce(func.sum(WorkflowRunRollupHourly.count), 0)
+        ).where(_rollup_org_condition(request))
+        if split.rollup_start:
+            rollup_query = rollup_query.filter(WorkflowRunRollupHourly.bucket >= split.rollup_start)
+        if split.rollup_end:
+            rollup_query = rollup_query.filter(WorkflowRunRollupHourly.bucket < split.rollup_end)
+        for key, value in typed_filters.items():
+            rollup_query = rollup_query.filter(getattr(WorkflowRunRollupHourly, key) == value)
+
+        total = int(await db.scalar(rollup_query) or 0)
+        if split.head:
+            total += await db.scalar(exact_count(*split.head, upper_inclusive=False)) or 0
+        if split.tail:
+            total += await db.scalar(exact_count(*split.tail, upper_inclusive=True)) or 0
+        return total
 
 class RunFilter(BaseModel):
     """Filter model for run counts"""
@@ -469,6 +547,7 @@ async def count_runs(
                 filters[key] = value
             
         count = await get_runs_count(
+            request,
             start_time=start_time,
             end_time=end_time,
             filters=filters if filters else None
@@ -495,3 +574,214 @@ async def count_runs(
             status_code=500,
             content={"error": "Internal server error"}
         )
+
+
+# Bin b of the duration histograms covers [1.1^b, 1.1^(b+1)) milliseconds
+DURATION_BIN_BASE = 1.1
+TIMESERIES_PERCENTILES = (50, 95, 99)
+TIMESERIES_MAX_BUCKETS = 24 * 90
+
+
+class DurationPercentiles(BaseModel):
+    """Duration percentiles in seconds, estimated from log-spaced histograms (within ~5%)"""
+    count: int = Field(0, description="Number of runs with this duration recorded")
+    p50: Optional[float] = None
+    p95: Optional[float] = None
+    p99: Optional[float] = None
+
+
+class RunTimeseriesPoint(BaseModel):
+    bucket: str = Field(description="ISO formatted start of the bucket (UTC)")
+    total: int = Field(0, description="Runs created in the bucket")
+    counts: Dict[str, int] = Field(default_factory=dict, description="Runs created in the bucket by status")
+    run_duration: DurationPercentiles = Field(default_factory=DurationPercentiles)
+    cold_start_duration: DurationPercentiles = Field(default_factory=DurationPercentiles)
+
+
+class RunTimeseriesResponse(BaseModel):
+    interval: str
+    start_time: str
+    end_time: str
+    data: List[RunTimeseriesPoint]
+
+
+def _parse_utc(value: str) -> datetime:
+    return datetime.fromisoformat(value.rstrip('Z')).replace(tzinfo=timezone.utc)
+
+
+def _histogram_percentiles(bins: Dict[int, int]) -> DurationPercentiles:
+    total = sum(bins.values())
+    result = DurationPercentiles(count=total)
+    if total <= 0:
+        return result
+
+    sorted_bins = sorted(bins.items())
+    for percentile in TIMESERIES_PERCENTILES:
+        rank = percentile / 100 * total
+        seen = 0
+        for bin_index, count in sorted_bins:
+            seen += count
+            if seen >= rank:
+                # Geometric midpoint of the bin, in seconds
+                value = DURATION_BIN_BASE ** (bin_index + 0.5) / 1000
+                setattr(result, f"p{percentile}", round(value, 3))
+                break
+    return result
+
+
+@router.get("/runs/timeseries", response_model=RunTimeseriesResponse)
+async def get_runs_timeseries(
+    request: Request,
+    workflow_id: Optional[str] = Query(None, description="Workflow identifier"),
+    deployment_id: Optional[str] = Query(None, description="Deployment identifier"),
+    start_time: Optional[str] = Query(
+        None,
+        description="UTC ISO format datetime string, defaults to 24 hours (hour interval) or 30 days (day interval) ago",
+    ),
+    end_time: Optional[str] = Query(
+        None,
+        description="UTC ISO format datetime string, defaults to now",
+    ),
+    interval: Literal["hour", "day"] = Query("hour", description="Bucket size"),
+):
+    """
+    Bucketed run counts by status plus p50/p95/p99 run and cold start durations
+    for a workflow or deployment.
+
+    Served from the hourly rollups kept up to date by triggers on
+    workflow_runs; runs are bucketed by creation time. While a rollup's
+    backfill is still running, that part is computed from workflow_runs.
+
+    Examples
+    --------
+    ```
+    GET /runs/timeseries?workflow_id=123e4567-e89b-12d3-a456-426614174000
+    GET /runs/timeseries?deployment_id=456e7890-f12d-34e5-b678-426614174000&interval=day
+    ```
+    """
+    if not workflow_id and not deployment_id:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Either workflow_id or deployment_id is required"}
+        )
+
+    step = timedelta(hours=1) if interval == "hour" else timedelta(days=1)
+    try:
+        end = _parse_utc(end_time) if end_time else datetime.now(timezone.utc)
+        start = _parse_utc(start_time) if start_time else end - step * (24 if interval == "hour" else 30)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"Invalid time format. Please provide UTC time in ISO format (e.g. 2024-03-15T10:00:00Z): {str(e)}"}
+        )
+
+    if interval == "day":
+        first_bucket = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        first_bucket = _hour_floor(start)
+    if end <= first_bucket or (end - first_bucket) / step > TIMESERIES_MAX_BUCKETS:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"Time range must be positive and span at most {TIMESERIES_MAX_BUCKETS} buckets"}
+        )
+
+    def scoped(query, model):
+        query = query.where(_rollup_org_condition(request, model))
+        query = query.filter(model.bucket >= first_bucket, model.bucket < end)
+        if workflow_id:
+            query = query.filter(model.workflow_id == workflow_id)
+        if deployment_id:
+            query = query.filter(model.deployment_id == deployment_id)
+        return query
+
+    # interval is one of two literals, so it is safe to inline; a bound parameter
+    # would differ between SELECT and GROUP BY and Postgres would reject the query
+    counts_bucket = func.date_trunc(literal_column(f"'{interval}'"), WorkflowRunRollupHourly.bucket)
+    counts_query = scoped(
+        select(counts_bucket, WorkflowRunRollupHourly.status, func.sum(WorkflowRunRollupHourly.count)),
+        WorkflowRunRollupHourly,
+    ).group_by(counts_bucket, WorkflowRunRollupHourly.status)
+
+    durations_bucket = func.date_trunc(literal_column(f"'{interval}'"), WorkflowRunDurationHourly.bucket)
+    durations_query = scoped(
+        select(
+            durations_bucket,
+            WorkflowRunDurationHourly.metric,
+            WorkflowRunDurationHourly.bin,
+            func.sum(WorkflowRunDurationHourly.count),
+        ),
+        WorkflowRunDurationHourly,
+    ).group_by(durations_bucket, WorkflowRunDurationHourly.metric, WorkflowRunDurationHourly.bin)
+
+    def scoped_runs(query):
+        # Same runs as the rollup buckets in range: up to the end of the hour containing `end`
+        query = query.apply_org_check_by_type(WorkflowRun, request).filter(
+            WorkflowRun.created_at >= first_bucket, WorkflowRun.created_at < _hour_ceil(end)
+        )
+        if workflow_id:
+            query = query.filter(WorkflowRun.workflow_id == workflow_id)
+        if deployment_id:
+            query = query.filter(WorkflowRun.deployment_id == deployment_id)
+        return query
+
+    runs_bucket = func.date_trunc(literal_column(f"'{interval}'"), WorkflowRun.created_at)
+    if not await rollup_backfill.is_complete("workflow_run_rollups_hourly"):
+        counts_query = scoped_runs(
+            select(runs_bucket, WorkflowRun.status, func.count(WorkflowRun.id))
+        ).group_by(runs_bucket, WorkflowRun.status)
+    if not await rollup_backfill.is_complete("workflow_run_durations_hourly"):
+        duration_bin = func.comfyui_deploy.workflow_run_duration_bin
+        run_bin = duration_bin(WorkflowRun.ended_at - WorkflowRun.started_at)
+        cold_start_bin = duration_bin(WorkflowRun.started_at - WorkflowRun.queued_at)
+        durations_query = union_all(
+            scoped_runs(
+                select(runs_bucket, literal_column("'run'"), run_bin, func.count(WorkflowRun.id))
+            )
+            .filter(WorkflowRun.started_at.isnot(None), WorkflowRun.ended_at.isnot(None))
+            .group_by(runs_bucket, run_bin),
+            scoped_runs(
+                select(runs_bucket, literal_column("'cold_start'"), cold_start_bin, func.count(WorkflowRun.id))
+            )
+            .filter(WorkflowRun.queued_at.isnot(None), WorkflowRun.started_at.isnot(None))
+            .group_by(runs_bucket, cold_start_bin),
+        )
+
+    async with AsyncSessionLocal() as db:
+        counts_result = await db.execute(counts_query)
+        durations_result = await db.execute(durations_query)
+
+    def bucket_key(value: datetime) -> datetime:
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+    points: Dict[datetime, RunTimeseriesPoint] = {}
+    bucket = first_bucket
+    while bucket < end:
+        points[bucket] = RunTimeseriesPoint(bucket=bucket.isoformat())
+        bucket += step
+
+    for bucket, status, count in counts_result.all():
+        point = points.get(bucket_key(bucket))
+        if point is None or not count:
+            continue
+        point.counts[status] = int(count)
+        point.total += int(count)
+
+    histograms: Dict[tuple, Dict[int, int]] = defaultdict(dict)
+    for bucket, metric, bin_index, count in durations_result.all():
+        if count:
+            histograms[(bucket_key(bucket), metric)][bin_index] = int(count)
+    for (bucket, metric), bins in histograms.items():
+        point = points.get(bucket)
+        if point is None:
+            continue
+        if metric == "run":
+            point.run_duration = _histogram_percentiles(bins)
+        elif metric == "cold_start":
+            point.cold_start_duration = _histogram_percentiles(bins)
+
+    return RunTimeseriesResponse(
+        interval=interval,
+        start_time=first_bucket.isoformat(),
+        end_time=end.isoformat(),
+        data=list(points.values()),
+    )
@@ -47,7 +47,8 @@ import logging
 from typing import Optional
 from sqlalchemy import update, func
 from fastapi import BackgroundTasks
-from api.utils.autumn import send_autumn_usage_event, get_autumn_customer, autumn_client
+from api.utils.autumn import get_autumn_customer, autumn_client
+from api.utils.autumn_usage import autumn_usage
 
 class CustomOutputManager(OutputManager):
     _context_id = None
@@ -1720,7 +1721,7 @@ async def delete_session(
 
         # Send usage data to Autumn if its a sandbox, else will be handled in the lifecycle callback
         if gpuEvent.end_time is not None and gpuEvent.start_time is not None:
-            await send_autumn_usage_event(
+            autumn_usage.send_gpu_usage_event(
                 customer_id=gpuEvent.org_id or gpuEvent.user_id,
                 gpu_type=gpuEvent.gpu,
                 start_time=gpuEvent.start_time,
@@ -1,14 +1,17 @@
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 from api.utils.retrieve_s3_config_helper import retrieve_s3_config, S3Config
-from api.utils.multi_level_cache import multi_level_cached
+from api.utils.s3_client import S3ClientManager
+from api.utils.s3_presign import can_presign_locally, presign_get_url, presign_get_urls
+from api.utils.multi_level_cache import multi_level_cached, multi_cache
+from api.utils.cache_metrics import cache_metrics
 from upstash_redis.asyncio import Redis
 import logging
 from typing import Any, Literal, Self, TypeVar, Tuple, Union, Dict
 from api.routes.types import WorkflowRunOutputModel
 from fastapi import Request
 import logfire
-from sqlalchemy import GenerativeSelect, Select, text
+from sqlalchemy import GenerativeSelect, Select, text, tuple_
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.sql.selectable import _ColumnsClauseArgument
 import os
@@ -147,6 +150,8 @@ clerk_token = os.getenv("CLERK_SECRET_KEY")
 def async_lru_cache(maxsize=128, typed=False, expire_after=None, key_builder=None):
     def decorator(async_func):
         cache = {}
+        metric_prefix = f"async_lru:{async_func.__name__}"
+        cache_metrics.register_size_source(metric_prefix, lambda: {"entries": len(cache)})
 
         @wraps(async_func)
         async def wrapper(*args, **kwargs):
@@ -160,8 +165,10 @@ def async_lru_cache(maxsize=128, typed=False, expire_after=None, key_builder=Non
                 result, timestamp = cache[cache_key]
                 if expire_after is None or now - timestamp < expire_after:
                     # logfire.info(f"Cache hit for {cache_key}")
+                    cache_metrics.record(metric_prefix, "l1_hits")
                     return result
 
+            cache_metrics.record(metric_prefix, "misses")
             result = await async_func(*args, **kwargs)
             cache[cache_key] = (result, now)
             
@@ -264,8 +271,31 @@ class OrgAwareSelect(Select[Tuple[T]]):
 
     def paginate(self, limit: int, offset: int) -> Self:
         return self.limit(limit).offset(offset)
+
+    def paginate_after(self, created_at_column, id_column, cursor: Optional[str], limit: int) -> Self:
+        """Keyset pagination on (created_at, id), newest first."""
+        query = self.order_by(created_at_column.desc(), id_column.desc()).limit(limit)
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            query = query.where(tuple_(created_at_column, id_column) < tuple_(created_at, row_id))
+        return query
     
 
+def encode_cursor(created_at: datetime, row_id: Any) -> str:
+    """Opaque cursor pointing just after the given (created_at, id)."""
+    raw = json.dumps({"t": created_at.isoformat(), "id": str(row_id)})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["t"]), UUID(data["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 def apply_org_check_direct(object, request: Request):
     user_id = request.state.current_user["user_id"]
     org_id = request.state.current_user.get("org_id", None)
@@ -419,35 +449,39 @@ def clean_up_outputs(outputs: List):
 
 
 async def post_process_outputs(outputs, user_settings):
-    for output in outputs:
-        if output.data and isinstance(output.data, dict):
-            await post_process_output_data(output.data, user_settings)
+    data_items = [output.data for output in outputs if output.data and isinstance(output.data, dict)]
+    if data_items:
+        await _sign_private_output_urls(data_items, user_settings)
 
 
 async def post_process_output_data(data, user_settings):
-    s3_config = await retrieve_s3_config(user_settings)
+    await _sign_private_output_urls([data], user_settings)
+    return data
 
-    # public = s3_config.public
-    region = s3_config.region
-    access_key = s3_config.access_key
-    secret_key = s3_config.secret_key
-    session_token = s3_config.session_token
 
-    for upload_type in upload_types:
-        if upload_type in data:
-            for output_item in data[upload_type]:
-                if output_item.get("is_public") is False:
-                    # pprint(output_item)
-                    # Replace the output URL with a session key
-                    if "url" in output_item:
-                        output_item["url"] = get_temporary_download_url(
-                            output_item["url"],
-                            region,
-                            access_key,
-                            secret_key,
-                            session_token
-                        )
-    return data
+async def _sign_private_output_urls(data_items, user_settings):
+    # Replace private output URLs with session keys, signing all of them in one pass
+    private_items = []
+    for data in data_items:
+        for upload_type in upload_types:
+            if upload_type in data:
+                for output_item in data[upload_type]:
+                    if output_item.get("is_public") is False and "url" in output_item:
+                        private_items.append(output_item)
+
+    if not private_items:
+        return
+
+    s3_config = await retrieve_s3_config(user_settings)
+    urls = get_temporary_download_urls(
+        [item["url"] for item in private_items],
+        s3_config.region,
+        s3_config.access_key,
+        s3_config.secret_key,
+        s3_config.session_token,
+    )
+    for output_item, url in zip(private_items, urls):
+        output_item["url"] = url
 
 
 async def update_user_settings(request: Request, db: AsyncSession, body: any):
@@ -513,6 +547,10 @@ async def update_user_settings(request: Request, db: AsyncSession, body: any):
 
     await db.commit()
 
+    # Drop the cached settings (per org, or per user for personal accounts) on every
+    # worker so the change is visible immediately
+    await multi_cache.invalidate(user_settings_cache_key(request))
+
     # Update Redis with new spend limit if it was provided in the update
     if "spend_limit" in update_data:
         logging.info("Updating spend limit in Redis")
@@ -609,12 +647,23 @@ async def get_user_settings(request: Request, db: AsyncSession):
     return user_settings
 
 
+def user_settings_cache_key(req: Request) -> str:
+    # Org members share one settings row, so they share one cache entry; updating it
+    # through any member invalidates the settings for the whole org.
+    current_user = getattr(req.state, "current_user", None)
+    if not current_user:
+        return "user_settings:default"
+    if current_user.get("org_id"):
+        return f"user_settings:org:{current_user['org_id']}"
+    return f"user_settings:user:{current_user['user_id']}"
+
+
 @multi_level_cached(
     key_prefix="user_settings",
     ttl_seconds=60,  # Local memory cache
     redis_ttl_seconds=300,  # Redis cache
     version="1.0",
-    key_builder=lambda req: f"user_settings:{req.state.current_user['user_id'] if req.state.current_user else 'default'}:{req.state.current_user.get('org_id') if req.state.current_user else 'none'}"
+    key_builder=user_settings_cache_key,
 )
 async def get_user_settings_cached(request: Request):
     """
@@ -651,15 +700,36 @@ async def get_user_settings_cached_as_object(request: Request, db: AsyncSession)
     return cached_data
 
 
-def get_temporary_download_url(
-    url: str, region: str, access_key: str, secret_key: str, session_token: str, expiration: int = 3600
-) -> str:
+def _split_s3_url(url: str) -> Tuple[str, str]:
     # Parse the URL
     parsed_url = urlparse(url)
 
     # Extract bucket name and object key
     bucket = parsed_url.netloc.split(".")[0]
     object_key = unquote(parsed_url.path.lstrip("/"))
+    return bucket, object_key
+
+
+def get_temporary_download_urls(
+    urls: List[str], region: str, access_key: str, secret_key: str, session_token: str, expiration: int = 3600
+) -> List[str]:
+    """Presign many S3 URLs at once, deriving the SigV4 signing key a single time."""
+    objects = [_split_s3_url(url) for url in urls]
+    if all(can_presign_locally(bucket, region) for bucket, _ in objects):
+        return presign_get_urls(objects, region, access_key, secret_key, session_token, expiration)
+    return [
+        get_temporary_download_url(url, region, access_key, secret_key, session_token, expiration)
+        for url in urls
+    ]
+
+
+def get_temporary_download_url(
+    url: str, region: str, access_key: str, secret_key: str, session_token: str, expiration: int = 3600
+) -> str:
+    bucket, object_key = _split_s3_url(url)
+
+    if can_presign_locally(bucket, region):
+        return presign_get_url(bucket, object_key, region, access_key, secret_key, session_token, expiration)
 
     # Generate and return the presigned URL
     return generate_presigned_download_url(
@@ -682,14 +752,7 @@ def generate_presigned_download_url(
     session_token: str,
     expiration: int = 3600,
 ):
-    s3_client = boto3.client(
-        "s3",
-        region_name=region,
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        aws_session_token=session_token,
-        config=Config(signature_version="s3v4"),
-    )
+    s3_client = S3ClientManager.get_sync_client(region, access_key, secret_key, session_token)
 
     try:
         response = s3_client.generate_presigned_url(
@@ -719,14 +782,7 @@ def generate_presigned_url(
     content_type=None,
     public=False,
 ):
-    s3_client = boto3.client(
-        "s3",
-        region_name=region,
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        aws_session_token=session_token,
-        config=Config(signature_version="s3v4"),
-    )
+    s3_client = S3ClientManager.get_sync_client(region, access_key, secret_key, session_token)
     params = {
         "Bucket": bucket,
         "Key": object_key,
@@ -756,29 +812,16 @@ def generate_presigned_url(
 async def initiate_multipart_upload(request: Request, db: AsyncSession, key: str, content_type: str) -> str:
     user_settings = await get_user_settings_cached_as_object(request, db)
     s3_config = await retrieve_s3_config(user_settings)
-    s3 = boto3.client(
-        "s3",
-        region_name=s3_config.region,
-        aws_access_key_id=s3_config.access_key,
-        aws_secret_access_key=s3_config.secret_key,
-        aws_session_token=getattr(s3_config, "session_token", None),
-        config=Config(signature_version="s3v4"),
-    )
-    resp = s3.create_multipart_upload(Bucket=s3_config.bucket, Key=key, ContentType=content_type)
+    s3 = await S3ClientManager.get_s3_client(s3_config)
+    resp = await s3.create_multipart_upload(Bucket=s3_config.bucket, Key=key, ContentType=content_type)
     return resp["UploadId"]
 
 
 async def generate_part_upload_url(request: Request, db: AsyncSession, key: str, upload_id: str, part_number: int, expires: int = 3600) -> str:
     user_settings = await get_user_settings_cached_as_object(request, db)
     s3_config = await retrieve_s3_config(user_settings)
-    s3 = boto3.client(
-        "s3",
-        region_name=s3_config.region,
-        aws_access_key_id=s3_config.access_key,
-        aws_secret_access_key=s3_config.secret_key,
-        aws_session_token=getattr(s3_config, "session_token", None),
-        config=Config(signature_version="s3v4"),
-    )
+    # Presigning is local CPU work, the sync client is fine here
+    s3 = S3ClientManager.sync_client_for(s3_config)
     return s3.generate_presigned_url(
         "upload_part",
         Params={
@@ -795,19 +838,12 @@ async def generate_part_upload_url(request: Request, db: AsyncSession, key: str,
 async def complete_multipart_upload(request: Request, db: AsyncSession, key: str, upload_id: str, parts: List[Dict[str, Any]]):
     user_settings = await get_user_settings_cached_as_object(request, db)
     s3_config = await retrieve_s3_config(user_settings)
-    s3 = boto3.client(
-        "s3",
-        region_name=s3_config.region,
-        aws_access_key_id=s3_config.access_key,
-        aws_secret_access_key=s3_config.secret_key,
-        aws_session_token=getattr(s3_config, "session_token", None),
-        config=Config(signature_version="s3v4"),
-    )
+    s3 = await S3ClientManager.get_s3_client(s3_config)
     sorted_parts = sorted(
         [{"ETag": p["eTag"], "PartNumber": int(p["partNumber"])} for p in parts],
         key=lambda p: p["PartNumber"],
     )
-    return s3.complete_multipart_upload(
+    return await s3.complete_multipart_upload(
         Bucket=s3_config.bucket,
         Key=key,
         MultipartUpload={"Parts": sorted_parts},
@@ -818,15 +854,8 @@ async def complete_multipart_upload(request: Request, db: AsyncSession, key: str
 async def abort_multipart_upload(request: Request, db: AsyncSession, key: str, upload_id: str):
     user_settings = await get_user_settings_cached_as_object(request, db)
     s3_config = await retrieve_s3_config(user_settings)
-    s3 = boto3.client(
-        "s3",
-        region_name=s3_config.region,
-        aws_access_key_id=s3_config.access_key,
-        aws_secret_access_key=s3_config.secret_key,
-        aws_session_token=getattr(s3_config, "session_token", None),
-        config=Config(signature_version="s3v4"),
-    )
-    return s3.abort_multipart_upload(Bucket=s3_config.bucket, Key=key, UploadId=upload_id)
+    s3 = await S3ClientManager.get_s3_client(s3_config)
+    return await s3.abort_multipart_upload(Bucket=s3_config.bucket, Key=key, UploadId=upload_id)
 
 
 
@@ -852,14 +881,7 @@ def delete_s3_object(
         None
     """
     try:
-        s3_client = boto3.client(
-            "s3",
-            region_name=region,
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            aws_session_token=session_token,
-            config=Config(signature_version="s3v4"),
-        )
+        s3_client = S3ClientManager.get_sync_client(region, access_key, secret_key, session_token)
         
         s3_client.delete_object(
             Bucket=bucket,
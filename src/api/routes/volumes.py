@@ -49,6 +49,7 @@ from .utils import (
 from api.database import get_db
 from api.models import Model as ModelDB, UserVolume
 from api.utils.storage_helper import get_s3_config
+from api.utils.s3_client import run_blocking_s3
 
 logger = logging.getLogger(__name__)
 
@@ -598,7 +599,8 @@ async def handle_file_download(
                         
                         s3_config = await get_s3_config(request, db)
                         
-                        delete_s3_object(
+                        await run_blocking_s3(
+                            delete_s3_object,
                             bucket=s3_temp_object["bucket"],
                             object_key=s3_temp_object["object_key"],
                             region=s3_config.region,
@@ -13,6 +13,8 @@ from pydantic import BaseModel
 from .workflows import CustomJSONEncoder
 from .utils import (
     UserIconData,
+    decode_cursor,
+    encode_cursor,
     ensure_run_timeout,
     fetch_user_icon,
     get_user_settings,
@@ -312,8 +314,13 @@ async def get_all_runs(
     rf: Optional[int] = None,  # relative from now
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
+    """
+    Offset pagination by default. Pass the `X-Next-Cursor` response header back
+    as `cursor` for keyset pagination, which costs the same on every page.
+    """
     # Check if workflow exists and user has access
     workflow = await db.execute(
         select(Workflow)
@@ -364,8 +371,14 @@ async def get_all_runs(
         query += " AND r.created_at >= to_timestamp(:rf)"
         params["rf"] = rf
 
+    if cursor:
+        # Keyset: seek straight past the last row of the previous page
+        params["cursor_created_at"], params["cursor_id"] = decode_cursor(cursor)
+        params["offset"] = 0
+        query += " AND (r.created_at, r.id) < (:cursor_created_at, :cursor_id)"
+
     query += """
-    ORDER BY r.created_at DESC
+    ORDER BY r.created_at DESC, r.id DESC
     LIMIT :limit
     OFFSET :offset
     """
@@ -374,16 +387,21 @@ async def get_all_runs(
         text(query),
         params,
     )
+    rows = result.fetchall()
 
     # Convert raw SQL results using our standalone serialization function
-    runs = [serialize_row(dict(row._mapping)) for row in result.fetchall()]
+    runs = [serialize_row(dict(row._mapping)) for row in rows]
 
     if not runs:
         return []
     for run in runs:
         ensure_run_timeout(run)
 
-    return JSONResponse(content=runs)
+    headers = {}
+    if len(rows) == limit:
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return JSONResponse(content=runs, headers=headers)
 
 
 @router.get("/workflow/{workflow_id}/runs/day", response_model=List[WorkflowRunModel])
@@ -445,7 +463,12 @@ async def get_all_runs_v1(
     db: AsyncSession = Depends(get_db),
     with_outputs: bool = True,
     with_inputs: bool = True,
+    cursor: Optional[str] = None,
 ):
+    """
+    Offset pagination by default. Pass the `X-Next-Cursor` response header back
+    as `cursor` for keyset pagination, which costs the same on every page.
+    """
     user_settings = await get_user_settings(request, db)
 
     # Create base query options
@@ -468,9 +491,13 @@ async def get_all_runs_v1(
         .where(WorkflowRun.workflow_id == workflow_id)
         .where(Workflow.deleted == False)
         .apply_org_check(request)
-        .order_by(WorkflowRun.created_at.desc())
-        .paginate(limit, offset)
     )
+    if cursor:
+        query = query.paginate_after(WorkflowRun.created_at, WorkflowRun.id, cursor, limit)
+    else:
+        query = query.order_by(WorkflowRun.created_at.desc(), WorkflowRun.id.desc()).paginate(
+            limit, offset
+        )
 
     # Instead of with_only_columns, use column_descriptions to deferred load specific columns
     if not with_inputs:
@@ -502,7 +529,11 @@ async def get_all_runs_v1(
             run_dict["version"] = None  # Explicitly set to None if no version
         runs_data.append(run_dict)
 
-    return JSONResponse(content=runs_data)
+    headers = {}
+    if len(runs) == limit:
+        headers["X-Next-Cursor"] = encode_cursor(runs[-1].created_at, runs[-1].id)
+
+    return JSONResponse(content=runs_data, headers=headers)
 
 
 @router.get("/workflow/{workflow_id}/run/latest", response_model=List[WorkflowRunModel])
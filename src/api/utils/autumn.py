@@ -1,10 +1,14 @@
+import asyncio
 import os
 import aiohttp
 from datetime import datetime
 import logfire
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Tuple, Union
 import json
 
+AUTUMN_MAX_CONNECTIONS = int(os.getenv("AUTUMN_MAX_CONNECTIONS", "32"))
+AUTUMN_TIMEOUT_SECONDS = 30
+
 
 class AutumnClient:
     """
@@ -20,6 +24,8 @@ class AutumnClient:
         """Initialize the Autumn client with an API key."""
         self.api_key = api_key or os.getenv("AUTUMN_SECRET_KEY")
         self.base_url = "https://api.useautumn.com/v1"
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
         
     def _get_headers(self, extra_headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
         """Get default headers for API requests."""
@@ -36,46 +42,88 @@ class AutumnClient:
             
         return headers
     
-    async def _make_request(
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Shared keep-alive session, recreated if closed or used from another event loop."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=AUTUMN_MAX_CONNECTIONS,
+                    keepalive_timeout=60,
+                ),
+                timeout=aiohttp.ClientTimeout(total=AUTUMN_TIMEOUT_SECONDS),
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    async def request(
         self,
         method: str,
         endpoint: str,
         data: Optional[Dict[str, Any]] = None,
         extra_headers: Optional[Dict[str, str]] = None
-    ) -> Optional[Dict[str, Any]]:
-        """Make a request to the Autumn API."""
+    ) -> Tuple[Optional[int], str]:
+        """
+        Send a request and return (status, response text).
+
+        The status is None when the request never got a response (connection
+        error or timeout), so callers can tell transient failures from errors.
+        """
         url = f"{self.base_url}/{endpoint}"
         headers = self._get_headers(extra_headers)
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.request(
-                    method=method,
-                    url=url,
-                    headers=headers,
-                    json=data if method in ["POST", "PUT", "PATCH", "DELETE"] else None,
-                    params=data if method in ["GET"] else None
-                ) as response:
-                    response_text = await response.text()
-                    
-                    if response.status == 200:
-                        return json.loads(response_text) if response_text else {}
-                    else:
-                        # Try to parse error response
-                        try:
-                            error_data = json.loads(response_text)
-                            if error_data.get("code") == "customer_not_found":
-                                logfire.warning(f"Customer not found in Autumn: {endpoint}")
-                                return None
-                        except json.JSONDecodeError:
-                            pass
-                            
-                        logfire.error(f"Autumn API error ({response.status}): {response_text}")
-                        return None
-                        
+            async with self._get_session().request(
+                method=method,
+                url=url,
+                headers=headers,
+                json=data if method in ["POST", "PUT", "PATCH", "DELETE"] else None,
+                params=data if method in ["GET"] else None
+            ) as response:
+                return response.status, await response.text()
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logfire.error(f"Error making Autumn API request: {str(e)}")
+            return None, str(e) or type(e).__name__
+
+    async def _make_request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict[str, Any]] = None,
+        extra_headers: Optional[Dict[str, str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Make a request to the Autumn API."""
+        status, response_text = await self.request(method, endpoint, data, extra_headers)
+        
+        if status is None:
+            logfire.error(f"Error making Autumn API request: {response_text}")
             return None
+        
+        if status == 200:
+            try:
+                return json.loads(response_text) if response_text else {}
+            except json.JSONDecodeError as e:
+                logfire.error(f"Error making Autumn API request: {str(e)}")
+                return None
+        
+        # Try to parse error response
+        try:
+            error_data = json.loads(response_text)
+            if error_data.get("code") == "customer_not_found":
+                logfire.warning(f"Customer not found in Autumn: {endpoint}")
+                return None
+        except (json.JSONDecodeError, AttributeError):
+            pass
+            
+        logfire.error(f"Autumn API error ({status}): {response_text}")
+        return None
     
     # Customer Management
     async def create_customer(
@@ -141,6 +189,79 @@ class AutumnClient:
         return await self._make_request("DELETE", f"customers/{customer_id}", data=params)
     
     # Usage Tracking
+    @staticmethod
+    def usage_event_payload(
+        customer_id: str,
+        event_name: str,
+        properties: Dict[str, Any],
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Request body for POST /events."""
+        payload = {
+            "customer_id": customer_id,
+            "event_name": event_name,
+            "properties": properties
+        }
+        
+        if idempotency_key:
+            payload["idempotency_key"] = idempotency_key
+            
+        return payload
+    
+    @staticmethod
+    def gpu_usage_event_payload(
+        customer_id: str,
+        gpu_type: str,
+        start_time: datetime,
+        end_time: datetime,
+        environment: Optional[str] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Request body for a GPU usage event, or None if the duration is not positive."""
+        # Calculate duration in seconds
+        duration = (end_time - start_time).total_seconds()
+        
+        # Skip if duration is negative or zero
+        if duration <= 0:
+            logfire.warning(f"Invalid duration {duration} for GPU event")
+            return None
+            
+        properties = {"value": str(duration)}
+        
+        if environment:
+            properties["environment"] = environment
+            
+        return AutumnClient.usage_event_payload(
+            customer_id=customer_id,
+            event_name=gpu_type.lower() if gpu_type else "cpu",
+            properties=properties,
+            idempotency_key=idempotency_key
+        )
+    
+    @staticmethod
+    def track_payload(
+        customer_id: str,
+        feature_id: Optional[str] = None,
+        event_name: Optional[str] = None,
+        value: Optional[Union[int, float]] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Request body for POST /track."""
+        payload = {
+            "customer_id": customer_id,
+            "value": value
+        }
+        
+        if feature_id:
+            payload["feature_id"] = feature_id
+        if event_name:
+            payload["event_name"] = event_name
+        
+        if idempotency_key:
+            payload["idempotency_key"] = idempotency_key
+        
+        return payload
+    
     async def send_usage_event(
         self,
         customer_id: str,
@@ -160,15 +281,7 @@ class AutumnClient:
         Returns:
             True if successful, False otherwise
         """
-        payload = {
-            "customer_id": customer_id,
-            "event_name": event_name,
-            "properties": properties
-        }
-        
-        if idempotency_key:
-            payload["idempotency_key"] = idempotency_key
-            
+        payload = self.usage_event_payload(customer_id, event_name, properties, idempotency_key)
         result = await self._make_request("POST", "events", data=payload)
         return result is not None
     
@@ -195,25 +308,14 @@ class AutumnClient:
         Returns:
             True if the event was sent successfully, False otherwise
         """
-        # Calculate duration in seconds
-        duration = (end_time - start_time).total_seconds()
-        
-        # Skip if duration is negative or zero
-        if duration <= 0:
-            logfire.warning(f"Invalid duration {duration} for GPU event")
+        payload = self.gpu_usage_event_payload(
+            customer_id, gpu_type, start_time, end_time, environment, idempotency_key
+        )
+        if payload is None:
             return False
             
-        properties = {"value": str(duration)}
-        
-        if environment:
-            properties["environment"] = environment
-            
-        return await self.send_usage_event(
-            customer_id=customer_id,
-            event_name=gpu_type.lower() if gpu_type else "cpu",
-            properties=properties,
-            idempotency_key=idempotency_key
-        )
+        result = await self._make_request("POST", "events", data=payload)
+        return result is not None
     
     async def set_feature_usage(
         self,
@@ -261,19 +363,7 @@ class AutumnClient:
         Returns:
             True if successful, False otherwise
         """
-        payload = {
-            "customer_id": customer_id,
-            "value": value
-        }
-        
-        if feature_id:
-            payload["feature_id"] = feature_id
-        if event_name:
-            payload["event_name"] = event_name
-        
-        if idempotency_key:
-            payload["idempotency_key"] = idempotency_key
-        
+        payload = self.track_payload(customer_id, feature_id, event_name, value, idempotency_key)
         result = await self._make_request("POST", "track", data=payload)
         return result is not None
     
@@ -0,0 +1,407 @@
+"""
+Buffered Autumn usage events.
+
+GPU start/end callbacks used to await Autumn's /track and /events calls
+before acknowledging the GPU worker, so every acknowledgement paid a
+third-party round-trip (plus a fresh TLS handshake). Events are now queued
+in memory and the callback returns immediately; they are sent over the
+client's pooled keep-alive session, since Autumn has no bulk ingestion
+endpoint.
+
+Each customer gets its own lane, sent in order by a single worker, with at
+most `AUTUMN_USAGE_CONCURRENCY` requests in flight across all lanes (like the
+per-host lanes in webhook_dispatcher). Order matters for counters such as
+gpu_concurrency_limit: a customer's -1 is never sent before the +1 queued
+ahead of it.
+
+Every event carries an idempotency key (generated if the caller has none),
+so retries and at-least-once redelivery never double count. On a transient
+failure a /track event is retried in place at the head of its lane, so later
+events for that customer wait behind it, for up to
+`AUTUMN_USAGE_MAX_TRACK_ATTEMPTS` attempts. After that the whole lane is
+parked in the durable retry queue (api.utils.retry_queue) as one ordered
+entry and an error is logged; the customer's new events are parked behind
+it, and replayed entries are held until the ones ahead of them come back, so
+a stuck customer no longer holds a worker or memory and a /track is never
+dropped. Lanes are parked the same way when the
+buffer is full and at shutdown. Other events that fail go to the retry queue
+on their own with a bounded number of attempts. Only events Autumn rejects
+outright are dropped.
+
+Durability window: as with webhooks, events not yet handed to the retry
+queue are held only in this process's memory and are lost if it crashes.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple, Union
+
+import logfire
+from upstash_redis.asyncio import Redis
+
+from api.utils.autumn import AutumnClient, autumn_client
+from api.utils.retry_queue import DurableRetryQueue, is_retryable, redis, retry_delay
+
+logger = logging.getLogger(__name__)
+
+AUTUMN_USAGE_RETRY_QUEUE = "autumn:usage:retry"
+AUTUMN_USAGE_CONCURRENCY = int(os.getenv("AUTUMN_USAGE_CONCURRENCY", "32"))
+AUTUMN_USAGE_MAX_BUFFER = int(os.getenv("AUTUMN_USAGE_MAX_BUFFER", "5000"))
+AUTUMN_USAGE_MAX_ATTEMPTS = 10
+# In-lane attempts before a failing /track parks its lane in the retry queue
+AUTUMN_USAGE_MAX_TRACK_ATTEMPTS = 5
+# A parked entry not replayed here this long after it was due was claimed by another worker
+AUTUMN_USAGE_PARK_GRACE = 60.0
+# Spacing between the due times of one customer's parked entries, so they replay in order
+_PARK_STEP = 0.001
+
+_delivery_latency = logfire.metric_histogram(
+    "autumn.usage.delivery.latency", unit="ms", description="Autumn usage event request latency"
+)
+_queue_delay = logfire.metric_histogram(
+    "autumn.usage.queue_delay",
+    unit="ms",
+    description="Time from an Autumn usage event being queued to being accepted",
+)
+_deliveries = logfire.metric_counter(
+    "autumn.usage.deliveries", unit="1", description="Autumn usage event attempts by outcome"
+)
+
+
+@dataclass
+class UsageEvent:
+    endpoint: str  # "track" or "events"
+    payload: Dict[str, Any]
+    attempt: int = 0
+    queued_at: float = field(default_factory=time.time)
+
+    @property
+    def idempotency_key(self) -> str:
+        return self.payload["idempotency_key"]
+
+    @property
+    def customer_id(self) -> str:
+        return self.payload.get("customer_id") or ""
+
+
+def _encode(events: List[UsageEvent]) -> str:
+    # One retry entry per ordered run of events, so a lane is replayed in order
+    return json.dumps([asdict(event) for event in events])
+
+
+def _decode(raw: str) -> List[UsageEvent]:
+    data = json.loads(raw)
+    if isinstance(data, dict):
+        # Entries queued before lanes held a single event
+        data = [data]
+    return [UsageEvent(**item) for item in data]
+
+
+@dataclass
+class _ParkedEntry:
+    due: float
+    member: str
+    expires_at: float
+    # Set once replayed, while it waits for the entries parked ahead of it
+    events: Optional[List[UsageEvent]] = None
+
+
+class _CustomerLane:
+    def __init__(self):
+        self.pending: Deque[UsageEvent] = deque()
+        self.worker: Optional[asyncio.Task] = None
+        # Set when the buffer is full; the worker parks the lane once its head is settled
+        self.spill = False
+
+
+class AutumnUsagePipeline:
+    def __init__(
+        self,
+        client: AutumnClient,
+        retry_store: Optional[Redis] = None,
+        concurrency: int = AUTUMN_USAGE_CONCURRENCY,
+        max_buffer: int = AUTUMN_USAGE_MAX_BUFFER,
+        max_attempts: int = AUTUMN_USAGE_MAX_ATTEMPTS,
+        max_track_attempts: int = AUTUMN_USAGE_MAX_TRACK_ATTEMPTS,
+        poll_interval: float = 1.0,
+    ):
+        self.client = client
+        self.retries = DurableRetryQueue(
+            AUTUMN_USAGE_RETRY_QUEUE, self._on_retry_due, store=retry_store, poll_interval=poll_interval
+        )
+        self.concurrency = concurrency
+        self.max_buffer = max_buffer
+        self.max_attempts = max_attempts
+        self.max_track_attempts = max_track_attempts
+        self._lanes: Dict[str, _CustomerLane] = {}
+        self._pending = 0
+        # Per customer, the entries parked in the retry queue, in the order they must be replayed
+        self._parked: Dict[str, Deque[_ParkedEntry]] = {}
+        self._parking: Set[asyncio.Task] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.enqueued = 0
+        self.delivered = 0
+        self.failed = 0
+        self.retried = 0
+        self.spilled = 0
+        self.parked = 0
+
+    def track_feature_usage(
+        self,
+        customer_id: str,
+        feature_id: str,
+        value: Union[int, float],
+        idempotency_key: Optional[str] = None,
+    ) -> None:
+        """Queue a POST /track; see AutumnClient.track_feature_usage."""
+        self.enqueue(
+            "track",
+            AutumnClient.track_payload(
+                customer_id, feature_id=feature_id, value=value, idempotency_key=idempotency_key
+            ),
+        )
+
+    def send_gpu_usage_event(
+        self,
+        customer_id: str,
+        gpu_type: str,
+        start_time: datetime,
+        end_time: datetime,
+        environment: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> bool:
+        """Queue a GPU usage event; False if the duration is invalid and nothing was queued."""
+        payload = AutumnClient.gpu_usage_event_payload(
+            customer_id, gpu_type, start_time, end_time, environment, idempotency_key
+        )
+        if payload is None:
+            return False
+        self.enqueue("events", payload)
+        return True
+
+    def enqueue(self, endpoint: str, payload: Dict[str, Any]) -> None:
+        if not payload.get("idempotency_key"):
+            # Retries must be deduplicated by Autumn, so every event needs a key
+            payload = {**payload, "idempotency_key": uuid.uuid4().hex}
+        self.enqueued += 1
+        self._buffer(UsageEvent(endpoint=endpoint, payload=payload))
+
+    async def start(self) -> None:
+        await self.retries.start()
+
+    async def stop(self) -> None:
+        """Stop sending and hand everything not yet accepted to the retry queue."""
+        await self.retries.stop()
+        lanes, self._lanes = list(self._lanes.items()), {}
+        workers = [lane.worker for _, lane in lanes if lane.worker is not None]
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        # A lane's head may have been in flight; it is sent again after the restart (idempotent)
+        remaining = [(customer_id, list(lane.pending)) for customer_id, lane in lanes if lane.pending]
+        self._pending = 0
+        # Replayed entries still waiting for an earlier one go back under their original due time
+        held = [entry for entries in self._parked.values() for entry in entries if entry.events is not None]
+        if self.retries.store is None:
+            # Nowhere durable to put them; make one last attempt, in order per customer
+            await asyncio.gather(*(self._send_final(events) for _, events in remaining))
+            await self._send_final([event for entry in held for event in entry.events])
+        else:
+            for customer_id, events in remaining:
+                self._park(customer_id, events, delay=0, ahead=True)
+            for entry in held:
+                await self._schedule(entry.member, entry.due)
+        await asyncio.gather(*list(self._parking), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "customers": len(self._lanes),
+            "pending": self._pending,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retried": self.retried,
+            "spilled": self.spilled,
+            "parked": self.parked,
+            "parked_customers": len(self._parked),
+        }
+
+    def _buffer(self, event: UsageEvent) -> None:
+        if self._is_parked(event.customer_id):
+            # Earlier events for this customer are parked; keep this one behind them
+            self._park(event.customer_id, [event], delay=0, ahead=False)
+            return
+        self._append(event)
+
+    def _append(self, event: UsageEvent) -> None:
+        customer_id = event.customer_id
+        lane = self._lanes.get(customer_id)
+        if lane is None:
+            lane = _CustomerLane()
+            self._lanes[customer_id] = lane
+        lane.pending.append(event)
+        self._pending += 1
+        if self._pending > self.max_buffer and self.retries.store is not None:
+            # Autumn is not keeping up; park the lane, in order, instead of growing memory
+            lane.spill = True
+        if lane.worker is None:
+            lane.worker = asyncio.create_task(self._work(customer_id, lane))
+
+    async def _work(self, customer_id: str, lane: _CustomerLane) -> None:
+        try:
+            while lane.pending:
+                if lane.spill:
+                    self.spilled += 1
+                    self._park_lane(customer_id, lane, delay=retry_delay(1))
+                    break
+                event = lane.pending[0]
+                outcome, detail = await self._deliver(event)
+                if outcome == "retry":
+                    self.retried += 1
+                    event.attempt += 1
+                if outcome == "retry" and event.endpoint == "track":
+                    if event.attempt >= self.max_track_attempts:
+                        # Stop holding the lane; it is retried from the queue, still in order
+                        self.parked += 1
+                        logfire.error(
+                            f"Parking Autumn usage for customer {customer_id} ({len(lane.pending)} events): "
+                            f"track {event.idempotency_key} failed {event.attempt} times: {detail}"
+                        )
+                        self._park_lane(customer_id, lane, delay=retry_delay(event.attempt))
+                        break
+                    # Keep it at the head: later events for this customer must not overtake it
+                    await asyncio.sleep(retry_delay(event.attempt))
+                    continue
+                if outcome == "retry":
+                    # Queued before leaving the lane, so a shutdown mid-way duplicates rather than loses it
+                    await self._schedule(_encode([event]), time.time() + retry_delay(event.attempt))
+                lane.pending.popleft()
+                self._pending -= 1
+        finally:
+            lane.worker = None
+            if not lane.pending and self._lanes.get(customer_id) is lane:
+                del self._lanes[customer_id]
+
+    def _park_lane(self, customer_id: str, lane: _CustomerLane, delay: float) -> None:
+        events = list(lane.pending)
+        lane.pending.clear()
+        self._pending -= len(events)
+        if self._lanes.get(customer_id) is lane:
+            del self._lanes[customer_id]
+        self._park(customer_id, events, delay, ahead=True)
+
+    def _park(self, customer_id: str, events: List[UsageEvent], delay: float, ahead: bool) -> None:
+        """
+        Queue `events` as one retry entry, ordered against the customer's other parked entries:
+        a lane (`ahead`) precedes them, since they were all queued after it; a new event follows them.
+        """
+        now = time.time()
+        due = now + delay
+        entries = self._parked.setdefault(customer_id, deque())
+        if ahead and entries:
+            due = min(due, entries[0].due - _PARK_STEP)
+        elif entries:
+            due = max(due, entries[-1].due + _PARK_STEP)
+        expires_at = max(due, now) + AUTUMN_USAGE_PARK_GRACE
+        entry = _ParkedEntry(due=due, member=_encode(events), expires_at=expires_at)
+        if ahead:
+            entries.appendleft(entry)
+        else:
+            entries.append(entry)
+        task = asyncio.create_task(self._park_entry(customer_id, entry))
+        self._parking.add(task)
+        task.add_done_callback(self._parking.discard)
+
+    async def _park_entry(self, customer_id: str, entry: _ParkedEntry) -> None:
+        if not await self._schedule(entry.member, entry.due):
+            entries = self._parked.get(customer_id)
+            if entries and entry in entries:
+                entries.remove(entry)
+            self._release(customer_id)
+
+    def _is_parked(self, customer_id: str) -> bool:
+        self._release(customer_id)
+        return customer_id in self._parked
+
+    def _release(self, customer_id: str) -> None:
+        """Move replayed entries into the lane, oldest first, stopping at one not yet replayed."""
+        entries = self._parked.get(customer_id)
+        now = time.time()
+        while entries and (entries[0].events is not None or now > entries[0].expires_at):
+            # An entry overdue past the grace period was replayed by another worker
+            entry = entries.popleft()
+            for event in entry.events or []:
+                self._append(event)
+        if not entries:
+            self._parked.pop(customer_id, None)
+
+    async def _send_final(self, events: List[UsageEvent]) -> None:
+        for event in events:
+            await self._deliver(event, final=True)
+
+    async def _deliver(self, event: UsageEvent, final: bool = False) -> Tuple[str, str]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        async with self._slots:
+            start = time.perf_counter()
+            try:
+                status, body = await self.client.request("POST", event.endpoint, data=event.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                status, body = None, str(e) or type(e).__name__
+            latency_ms = (time.perf_counter() - start) * 1000
+
+        # 409: the idempotency key was already used, so the event is recorded
+        if status is not None and (200 <= status < 300 or status == 409):
+            outcome = "success"
+        elif final or not is_retryable(status):
+            outcome = "failed"
+        elif event.endpoint == "track" or event.attempt + 1 < self.max_attempts:
+            # Tracks are never dropped: losing a +1 whose -1 is sent corrupts the counter
+            outcome = "retry"
+        else:
+            outcome = "failed"
+        _delivery_latency.record(latency_ms, {"outcome": outcome, "endpoint": event.endpoint})
+        _deliveries.add(1, {"outcome": outcome, "endpoint": event.endpoint})
+
+        if outcome == "success":
+            self.delivered += 1
+            _queue_delay.record((time.time() - event.queued_at) * 1000, {"endpoint": event.endpoint})
+        elif outcome == "failed":
+            self.failed += 1
+            logfire.error(
+                f"Dropping Autumn usage event {event.idempotency_key} ({event.endpoint}) "
+                f"after {event.attempt + 1} attempts: {status} {body}"
+            )
+        return outcome, f"{status} {body}"
+
+    async def _schedule(self, member: str, due: float) -> bool:
+        if await self.retries.schedule_at(member, due):
+            return True
+        keys = ", ".join(event.idempotency_key for event in _decode(member))
+        logger.error(f"Lost Autumn usage events: {keys}")
+        return False
+
+    def _on_retry_due(self, member: str) -> None:
+        events = _decode(member)
+        customer_id = events[0].customer_id if events else ""
+        for entry in self._parked.get(customer_id, ()):
+            if entry.member == member:
+                # Timers and polls can hand entries back out of order; the lane takes them in order
+                entry.events = events
+                self._release(customer_id)
+                return
+        # Not parked by this worker (a single retried event, or another worker's lane)
+        for event in events:
+            self._append(event)
+
+
+autumn_usage = AutumnUsagePipeline(autumn_client, retry_store=redis)
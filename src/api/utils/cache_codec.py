@@ -0,0 +1,109 @@
+"""
+Serialization for values stored in the Redis (L2) cache tier.
+
+Entries are written as plain JSON when small, and as a tagged, compressed
+binary payload once they cross a size threshold. Tagged payloads look like
+"@<tag>:<base64>" so they survive the Upstash REST API, which only carries
+text. Untagged values are treated as legacy JSON, so entries written before
+the codec existed stay readable during rollout.
+"""
+import base64
+import json
+import os
+import zlib
+from typing import Any, Dict
+
+TAG_PREFIX = "@"
+
+
+class CacheCodec:
+    """Base codec: turns a cache value into bytes and back."""
+
+    tag: str = ""
+
+    def dumps(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class JsonCodec(CacheCodec):
+    tag = "j1"
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class ZlibCodec(CacheCodec):
+    """Wraps another codec and deflates its output."""
+
+    def __init__(self, inner: CacheCodec, level: int = 1):
+        self.inner = inner
+        self.level = level
+        self.tag = f"z{inner.tag}"
+
+    def dumps(self, value: Any) -> bytes:
+        return self.compress(self.inner.dumps(value))
+
+    def compress(self, raw: bytes) -> bytes:
+        return zlib.compress(raw, self.level)
+
+    def loads(self, data: bytes) -> Any:
+        return self.inner.loads(zlib.decompress(data))
+
+
+_codecs: Dict[str, CacheCodec] = {}
+
+
+def register_codec(codec: CacheCodec) -> CacheCodec:
+    """Make a codec available for decoding by its tag."""
+    _codecs[codec.tag] = codec
+    return codec
+
+
+register_codec(JsonCodec())
+register_codec(ZlibCodec(JsonCodec()))
+
+
+class CacheSerializer:
+    """
+    Encodes cache values for Redis.
+
+    Values are serialized to JSON exactly once. Payloads shorter than
+    `compress_threshold` are stored as that JSON, which is the cheapest thing
+    to decode; larger ones store the same JSON deflated, so both paths
+    round-trip values identically.
+    """
+
+    def __init__(self, compress_threshold: int = 4096):
+        self.compress_threshold = compress_threshold
+        self.binary_codec = register_codec(ZlibCodec(JsonCodec()))
+
+    def encode(self, value: Any) -> str:
+        text = json.dumps(value)
+        if len(text) < self.compress_threshold:
+            return text
+        data = self.binary_codec.compress(text.encode("utf-8"))
+        return f"{TAG_PREFIX}{self.binary_codec.tag}:{base64.b64encode(data).decode('ascii')}"
+
+    def decode(self, payload: Any) -> Any:
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf-8")
+        if not payload.startswith(TAG_PREFIX):
+            # Legacy / small entries are plain JSON
+            return json.loads(payload)
+
+        tag, _, body = payload[len(TAG_PREFIX):].partition(":")
+        codec = _codecs.get(tag)
+        if codec is None:
+            raise ValueError(f"Unknown cache codec tag: {tag}")
+        return codec.loads(base64.b64decode(body))
+
+
+cache_serializer = CacheSerializer(
+    compress_threshold=int(os.getenv("CACHE_COMPRESS_THRESHOLD_BYTES", "4096"))
+)
@@ -0,0 +1,129 @@
+"""
+Counters and latency histograms for the in-process caches.
+
+Every event is mirrored to logfire metrics and kept in process-local counters
+so /admin/cache/stats can report the current worker's view.
+"""
+import bisect
+from collections import defaultdict
+from typing import Any, Callable, Dict, List
+
+import logfire
+from opentelemetry.metrics import CallbackOptions, Observation
+
+# Upper bounds in milliseconds; the last bucket catches everything above
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+_cache_events = logfire.metric_counter(
+    "cache.events", unit="1", description="Cache lookups by prefix and outcome"
+)
+_cache_refreshes = logfire.metric_counter(
+    "cache.refreshes", unit="1", description="Background cache refresh tasks started"
+)
+_l2_latency = logfire.metric_histogram(
+    "cache.l2.latency", unit="ms", description="Redis (L2) round-trip latency"
+)
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram with approximate percentiles."""
+
+    def __init__(self, buckets_ms: List[float] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets_ms[i] if i < len(self.buckets_ms) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max_ms,
+            "buckets_ms": dict(
+                zip([str(b) for b in self.buckets_ms] + ["+inf"], self.counts)
+            ),
+        }
+
+
+class CacheMetrics:
+    def __init__(self):
+        self.prefixes: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"l1_hits": 0, "l2_hits": 0, "misses": 0, "refreshes": 0}
+        )
+        self.l2_latency: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self._size_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def record(self, prefix: str, outcome: str) -> None:
+        """outcome is one of l1_hits, l2_hits, misses."""
+        self.prefixes[prefix][outcome] += 1
+        _cache_events.add(1, {"prefix": prefix, "outcome": outcome})
+
+    def record_refresh(self, prefix: str, kind: str) -> None:
+        self.prefixes[prefix]["refreshes"] += 1
+        _cache_refreshes.add(1, {"prefix": prefix, "kind": kind})
+
+    def observe_l2(self, operation: str, ms: float, keys: int = 1) -> None:
+        self.l2_latency[operation].observe(ms)
+        _l2_latency.record(ms, {"operation": operation, "keys": keys})
+
+    def register_size_source(self, name: str, source: Callable[[], Dict[str, Any]]) -> None:
+        """Register a callable reporting the current size of a cache."""
+        self._size_sources[name] = source
+
+    def snapshot(self) -> Dict[str, Any]:
+        prefixes = {}
+        for prefix, counts in self.prefixes.items():
+            lookups = counts["l1_hits"] + counts["l2_hits"] + counts["misses"]
+            hits = counts["l1_hits"] + counts["l2_hits"]
+            prefixes[prefix] = {
+                **counts,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "l1_share_of_hits": counts["l1_hits"] / hits if hits else 0.0,
+            }
+        return {
+            "prefixes": prefixes,
+            "l2_latency": {op: hist.snapshot() for op, hist in self.l2_latency.items()},
+            "sizes": {name: source() for name, source in self._size_sources.items()},
+        }
+
+
+cache_metrics = CacheMetrics()
+
+
+def _cache_size_callback(options: CallbackOptions):
+    # Called by the metrics exporter from a background thread
+    for name, source in list(cache_metrics._size_sources.items()):
+        size = source()
+        yield Observation(size.get("entries", 0), {"cache": name, "measure": "entries"})
+        if size.get("bytes") is not None:
+            yield Observation(size["bytes"], {"cache": name, "measure": "bytes"})
+
+
+logfire.metric_gauge_callback(
+    "cache.size",
+    callbacks=[_cache_size_callback],
+    unit="1",
+    description="Current cache size in entries and bytes",
+)
@@ -0,0 +1,247 @@
+"""
+In-memory set of revoked API key digests.
+
+Non-expiring API keys used to be checked against Postgres through a cache
+that only held results for a few seconds, so every long-lived key cost a
+query per worker every few seconds. Each worker now loads the digests of all
+revoked keys at startup and keeps them current:
+
+- `revoke()` adds the digest locally and publishes it on Redis pub/sub; other
+  workers apply it as soon as the message arrives (propagation delay is
+  measured from the publish timestamp).
+- Every `REVOCATION_RESYNC_SECONDS` an incremental resync fetches keys
+  revoked since the previous one (`api_keys.revoked_at`, stamped by a
+  trigger), which catches anything pub/sub missed and bounds staleness by
+  the resync interval even without a subscriber. The full set is only
+  loaded at startup.
+- If the set has not been loaded, or has not resynced for
+  `REVOCATION_MAX_STALENESS` seconds (about one interval), `is_revoked()`
+  returns None and callers fall back to the database lookup.
+
+Revocation is permanent, so the set only ever grows between restarts.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from hashlib import sha256
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set
+
+import logfire
+import redis.asyncio as redis_asyncio
+from sqlalchemy import func, select
+
+from api.database import get_db_context
+from api.models import APIKey
+from api.utils.cache_metrics import cache_metrics
+from api.utils.multi_level_cache import redis_realtime
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_CHANNEL = "api_key:revoked"
+REVOCATION_RESYNC_SECONDS = float(os.getenv("API_KEY_REVOCATION_RESYNC_SECONDS", "5"))
+# One interval plus room for a slow resync query
+REVOCATION_MAX_STALENESS = REVOCATION_RESYNC_SECONDS + 2
+# revoked_at is stamped before the revoking transaction commits; re-read this far
+# back so a revocation committed just after the previous resync is not skipped
+REVOCATION_RESYNC_OVERLAP = timedelta(seconds=60)
+
+_propagation_delay = logfire.metric_histogram(
+    "api_key_revocation.propagation",
+    unit="ms",
+    description="Delay between a key revocation being published and this worker applying it",
+)
+
+
+def key_digest(key: str) -> str:
+    # Same digest as hash_api_key, so the set never holds raw keys
+    return sha256(key.encode()).hexdigest()
+
+
+class KeyRevocationSet:
+    def __init__(
+        self,
+        publisher: Optional[Any] = None,
+        subscriber_url: Optional[str] = None,
+        channel: str = REVOCATION_CHANNEL,
+        resync_interval: float = REVOCATION_RESYNC_SECONDS,
+        max_staleness: float = REVOCATION_MAX_STALENESS,
+    ):
+        self.publisher = publisher
+        self.subscriber_url = subscriber_url
+        self.channel = channel
+        self.resync_interval = resync_interval
+        self.max_staleness = max_staleness
+        self.origin = uuid.uuid4().hex
+        self._digests: Set[str] = set()
+        self._last_sync: Optional[float] = None
+        # Database time the last resync started; incremental resyncs read from here
+        self._cursor: Optional[datetime] = None
+        self._resync_task: Optional[asyncio.Task] = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self.lookups = 0
+        self.fallbacks = 0
+        self.resyncs = 0
+        self.full_loads = 0
+        self.resync_errors = 0
+        self.published = 0
+        self.applied = 0
+        self.max_propagation_ms = 0.0
+
+    def is_revoked(self, digest: str) -> Optional[bool]:
+        """Local membership test; None when the set is missing or too stale to trust."""
+        staleness = self.staleness()
+        if staleness is None or staleness > self.max_staleness:
+            self.fallbacks += 1
+            return None
+        self.lookups += 1
+        return digest in self._digests
+
+    async def revoke(self, digest: str) -> None:
+        """Record a revocation locally and broadcast it to the other workers."""
+        self._digests.add(digest)
+        if self.publisher is None:
+            return
+        payload = json.dumps({"o": self.origin, "d": digest, "t": time.time()})
+        try:
+            await self.publisher.execute(["PUBLISH", self.channel, payload])
+            self.published += 1
+        except Exception as e:
+            # The other workers pick it up on their next resync
+            logfire.error(f"API key revocation publish error: {str(e)}")
+
+    def staleness(self) -> Optional[float]:
+        """Seconds since the last successful resync, None if never loaded."""
+        if self._last_sync is None:
+            return None
+        return time.time() - self._last_sync
+
+    async def resync(self) -> None:
+        """Fetch keys revoked since the last resync; the full set if never loaded."""
+        started = time.time()
+        async with get_db_context() as db:
+            cursor = await db.scalar(select(func.now()))
+            query = select(APIKey.key).where(APIKey.revoked == True)
+            if self._cursor is not None:
+                query = query.where(APIKey.revoked_at >= self._cursor - REVOCATION_RESYNC_OVERLAP)
+            result = await db.execute(query)
+            digests = {key_digest(key) for key in result.scalars().all()}
+        # Union rather than replace: a revocation applied while the query ran
+        # may not be in its snapshot, and revocations are never undone
+        self._digests |= digests
+        if self._cursor is None:
+            self.full_loads += 1
+        self._cursor = cursor
+        self._last_sync = started
+        self.resyncs += 1
+
+    async def start(self) -> None:
+        if self._resync_task is not None:
+            return
+        try:
+            await self.resync()
+        except Exception as e:
+            self.resync_errors += 1
+            logger.error(f"Initial API key revocation load failed: {e}")
+        self._resync_task = asyncio.create_task(self._resync_loop())
+        if self.subscriber_url:
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        for task in (self._resync_task, self._listener_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._resync_task = None
+        self._listener_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        staleness = self.staleness()
+        return {
+            "entries": len(self._digests),
+            "lookups": self.lookups,
+            "fallbacks": self.fallbacks,
+            "resyncs": self.resyncs,
+            "full_loads": self.full_loads,
+            "resync_errors": self.resync_errors,
+            "published": self.published,
+            "applied": self.applied,
+            "staleness_seconds": round(staleness, 3) if staleness is not None else None,
+            "max_propagation_ms": round(self.max_propagation_ms, 3),
+            "subscribed": self._listener_task is not None and not self._listener_task.done(),
+        }
+
+    async def _resync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.resync_interval)
+            try:
+                await self.resync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.resync_errors += 1
+                logger.warning(f"API key revocation resync failed: {e}")
+
+    async def _listen(self) -> None:
+        backoff = 1
+        while True:
+            client = None
+            pubsub = None
+            try:
+                client = redis_asyncio.from_url(self.subscriber_url)
+                pubsub = client.pubsub()
+                await pubsub.subscribe(self.channel)
+                backoff = 1
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    self._apply(message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logfire.warning(f"API key revocation subscriber error, reconnecting: {str(e)}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+                if client is not None:
+                    try:
+                        await client.close()
+                    except Exception:
+                        pass
+
+    def _apply(self, data: Any) -> None:
+        try:
+            if isinstance(data, bytes):
+                data = data.decode("utf-8")
+            message = json.loads(data)
+        except (ValueError, TypeError):
+            return
+        if message.get("o") == self.origin or not message.get("d"):
+            # Already applied locally when published
+            return
+
+        self._digests.add(message["d"])
+        self.applied += 1
+        if message.get("t"):
+            delay_ms = max(0.0, (time.time() - float(message["t"])) * 1000)
+            self.max_propagation_ms = max(self.max_propagation_ms, delay_ms)
+            _propagation_delay.record(delay_ms)
+
+
+key_revocations = KeyRevocationSet(
+    publisher=redis_realtime,
+    subscriber_url=os.getenv("REDIS_URL_REALTIME"),
+)
+cache_metrics.register_size_source("api_key_revocations", key_revocations.stats)
@@ -0,0 +1,104 @@
+"""
+Event loop lag monitor.
+
+A heartbeat task measures how late the loop wakes it up. A watchdog thread
+watches the heartbeat: when the loop stays blocked longer than the
+threshold, it captures the loop thread's stack so the log shows which
+callback was hogging the loop, not just that something did.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, Optional
+
+import logfire
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+
+_loop_lag = logfire.metric_histogram(
+    "event_loop.lag", unit="ms", description="Delay between a scheduled wakeup and the loop running it"
+)
+_loop_blocked = logfire.metric_counter(
+    "event_loop.blocked", unit="1", description="Times the event loop was blocked longer than the threshold"
+)
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.5, threshold_ms: float = LOOP_LAG_THRESHOLD_MS):
+        self.interval = interval
+        self.threshold = threshold_ms / 1000
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self.samples = 0
+        self.max_lag_ms = 0.0
+        self.blocked_count = 0
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "max_lag_ms": self.max_lag_ms,
+            "blocked_count": self.blocked_count,
+            "threshold_ms": self.threshold * 1000,
+        }
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag_ms = max(0.0, now - expected) * 1000
+            self.samples += 1
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            _loop_lag.record(lag_ms)
+            if lag_ms > self.threshold * 1000:
+                self.blocked_count += 1
+                _loop_blocked.add(1)
+                logger.warning(f"Event loop lag {lag_ms:.0f}ms (threshold {self.threshold * 1000:.0f}ms)")
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._stopped.wait(self.threshold / 2):
+            last_beat = self._last_beat
+            blocked_for = time.monotonic() - last_beat - self.interval
+            if blocked_for <= self.threshold or reported_beat == last_beat:
+                continue
+            # Report each stall once, with the stack that is blocking the loop
+            reported_beat = last_beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>"
+            logger.warning(
+                f"Event loop blocked for over {blocked_for * 1000:.0f}ms, loop thread stack:\n{stack}"
+            )
+
+
+loop_lag_monitor = LoopLagMonitor()
@@ -1,11 +1,18 @@
 from functools import wraps
 from datetime import datetime, timedelta
+from collections import OrderedDict
 import asyncio
 import json
+import sys
+import time
 from typing import Any, Callable, TypeVar, Optional, Dict, Tuple
 import os
+import uuid
 import logfire
 from upstash_redis.asyncio import Redis
+import redis.asyncio as redis_asyncio
+from api.utils.cache_codec import cache_serializer
+from api.utils.cache_metrics import cache_metrics
 
 T = TypeVar('T')
 
@@ -14,24 +21,525 @@ redis_url = os.getenv("UPSTASH_REDIS_META_REST_URL")
 redis_token = os.getenv("UPSTASH_REDIS_META_REST_TOKEN")
 redis = Redis(url=redis_url, token=redis_token)
 
+# Realtime Redis carries the L1 invalidation bus: publish over REST, subscribe over TCP
+_redis_url_realtime = os.getenv("UPSTASH_REDIS_REST_URL_REALTIME")
+_redis_token_realtime = os.getenv("UPSTASH_REDIS_REST_TOKEN_REALTIME")
+redis_realtime = (
+    Redis(url=_redis_url_realtime, token=_redis_token_realtime)
+    if _redis_url_realtime and _redis_token_realtime
+    else None
+)
+_redis_tcp_url_realtime = os.getenv("REDIS_URL_REALTIME")
+
+CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+
+
+def _estimate_size(value: Any, _depth: int = 0) -> int:
+    """Rough deep size of a cached value in bytes (bounded recursion)."""
+    size = sys.getsizeof(value)
+    if _depth >= 8:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += _estimate_size(k, _depth + 1) + _estimate_size(v, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += _estimate_size(item, _depth + 1)
+    return size
+
+
+class _MemoryEntry:
+    __slots__ = ("value", "timestamp", "expires_at", "size")
+
+    def __init__(self, value: Any, timestamp: datetime, expires_at: Optional[float], size: int):
+        self.value = value
+        self.timestamp = timestamp
+        self.expires_at = expires_at
+        self.size = size
+
+
+class LRUMemoryCache:
+    """
+    Bounded in-memory LRU with per-entry TTLs, used as the L1 tier.
+
+    Backed by an OrderedDict so get/put/evict are all O(1). Entries are bounded
+    both by count (maxsize) and by estimated size in bytes (max_bytes).
+    Items are exposed as (value, timestamp) tuples so existing callers that
+    index the cache like a dict keep working.
+    """
+
+    def __init__(self, maxsize: int = 1000, max_bytes: Optional[int] = None, default_ttl: Optional[float] = None):
+        self._data: "OrderedDict[str, _MemoryEntry]" = OrderedDict()
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, datetime]]:
+        """Return (value, timestamp) for a live key and mark it most recently used."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry.value, entry.timestamp
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None, timestamp: Optional[datetime] = None) -> None:
+        """Insert or replace a key, evicting least recently used entries if over budget."""
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        size = _estimate_size(value)
+
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = _MemoryEntry(value, timestamp or datetime.now(), expires_at, size)
+        self.current_bytes += size
+
+        while self._data and (
+            len(self._data) > self.maxsize
+            or (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+        ):
+            oldest_key = next(iter(self._data))
+            if oldest_key == key and len(self._data) == 1:
+                # A single oversized value is kept rather than thrashing
+                break
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        entry = self._remove(key)
+        if entry is None:
+            return default
+        return entry.value, entry.timestamp
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        """Drop every key starting with prefix. O(n), meant for rare bulk invalidations."""
+        keys = [key for key in self._data if key.startswith(prefix)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.current_bytes,
+            "maxsize": self.maxsize,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, key: str) -> Optional[_MemoryEntry]:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry.size
+        return entry
+
+    # Dict-style access, kept for callers that treat memory_cache as a dict
+    def __contains__(self, key: str) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and (entry.expires_at is None or entry.expires_at > time.monotonic())
+
+    def __getitem__(self, key: str) -> Tuple[Any, datetime]:
+        entry = self.get_entry(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __setitem__(self, key: str, item: Tuple[Any, datetime]) -> None:
+        value, timestamp = item
+        self.put(key, value, timestamp=timestamp)
+
+    def __delitem__(self, key: str) -> None:
+        if self._remove(key) is None:
+            raise KeyError(key)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one in-flight task.
+
+    The first caller for a key starts the work; later callers await the same
+    task until it finishes. The work runs in its own task so a cancelled
+    caller does not cancel it for everyone else.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def start(self, key: str, fn: Callable, *args, **kwargs) -> asyncio.Task:
+        """Return the in-flight task for key, starting fn(*args, **kwargs) if there is none."""
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self.coalesced += 1
+            return task
+
+        self.calls += 1
+        task = asyncio.create_task(fn(*args, **kwargs))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._finish(key, t))
+        return task
+
+    async def run(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        """Await the shared result for key."""
+        return await asyncio.shield(self.start(key, fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved; callers that awaited it already saw it
+        if not task.cancelled() and task.exception() is not None:
+            logfire.error(f"Single-flight call failed for {key}: {str(task.exception())}")
+
+
+class RedisBatcher:
+    """
+    Micro-batches L2 reads and writes issued close together on the event loop.
+
+    Reads queued within `window_seconds` are sent as one MGET and writes as one
+    pipeline, cutting REST round-trips to Upstash on fan-out paths. Each caller
+    still awaits its own result.
+    """
+
+    def __init__(self, redis_client: Redis, window_seconds: float = 0.002, max_batch: int = 100):
+        self.redis = redis_client
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self._pending_reads: Dict[str, list] = {}
+        self._pending_writes: Dict[str, Tuple[str, Optional[int], list]] = {}
+        self._read_task: Optional[asyncio.Task] = None
+        self._write_task: Optional[asyncio.Task] = None
+        self.read_batches = 0
+        self.read_keys = 0
+        self.write_batches = 0
+        self.write_keys = 0
+
+    def get(self, key: str) -> "asyncio.Future":
+        """Queue a GET; the returned future resolves to the raw Redis value."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending_reads.setdefault(key, []).append(future)
+        if len(self._pending_reads) >= self.max_batch:
+            asyncio.create_task(self._flush_reads())
+        elif self._read_task is None or self._read_task.done():
+            self._read_task = asyncio.create_task(self._flush_reads_later())
+        return future
+
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> "asyncio.Future":
+        """Queue a SET; later writes to the same key in a batch replace earlier ones."""
+        future = asyncio.get_running_loop().create_future()
+        waiters = self._pending_writes[key][2] if key in self._pending_writes else []
+        waiters.append(future)
+        self._pending_writes[key] = (value, ex, waiters)
+        if len(self._pending_writes) >= self.max_batch:
+            asyncio.create_task(self._flush_writes())
+        elif self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._flush_writes_later())
+        return future
+
+    async def mget(self, keys: list) -> list:
+        """Read many keys in one round-trip, bypassing the batching window."""
+        if not keys:
+            return []
+        self.read_batches += 1
+        self.read_keys += len(keys)
+        start = time.perf_counter()
+        try:
+            return await self.redis.mget(*keys)
+        finally:
+            cache_metrics.observe_l2("mget", (time.perf_counter() - start) * 1000, len(keys))
+
+    async def mset(self, items: Dict[str, str], ex: Optional[int] = None) -> None:
+        """Write many keys in one pipeline, bypassing the batching window."""
+        if not items:
+            return
+        pipeline = self.redis.pipeline()
+        for key, value in items.items():
+            pipeline.set(key, value, ex=ex)
+        self.write_batches += 1
+        self.write_keys += len(items)
+        start = time.perf_counter()
+        try:
+            await pipeline.exec()
+        finally:
+            cache_metrics.observe_l2("set", (time.perf_counter() - start) * 1000, len(items))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "read_batches": self.read_batches,
+            "read_keys": self.read_keys,
+            "write_batches": self.write_batches,
+            "write_keys": self.write_keys,
+        }
+
+    async def _flush_reads_later(self) -> None:
+        await asyncio.sleep(self.window_seconds)
+        await self._flush_reads()
+
+    async def _flush_writes_later(self) -> None:
+        await asyncio.sleep(self.window_seconds)
+        await self._flush_writes()
+
+    async def _flush_reads(self) -> None:
+        if not self._pending_reads:
+            return
+        pending, self._pending_reads = self._pending_reads, {}
+        keys = list(pending)
+        try:
+            if len(keys) == 1:
+                self.read_batches += 1
+                self.read_keys += 1
+                start = time.perf_counter()
+                try:
+                    values = [await self.redis.get(keys[0])]
+                finally:
+                    cache_metrics.observe_l2("get", (time.perf_counter() - start) * 1000)
+            else:
+                values = await self.mget(keys)
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for key, value in zip(keys, values):
+            for future in pending[key]:
+                if not future.done():
+                    future.set_result(value)
+
+    async def _flush_writes(self) -> None:
+        if not self._pending_writes:
+            return
+        pending, self._pending_writes = self._pending_writes, {}
+        try:
+            pipeline = self.redis.pipeline()
+            for key, (value, ex, _) in pending.items():
+                pipeline.set(key, value, ex=ex)
+            self.write_batches += 1
+            self.write_keys += len(pending)
+            start = time.perf_counter()
+            try:
+                await pipeline.exec()
+            finally:
+                cache_metrics.observe_l2("set", (time.perf_counter() - start) * 1000, len(pending))
+        except Exception as e:
+            for _, _, futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for _, _, futures in pending.values():
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+
+
+class CacheInvalidationBus:
+    """
+    Broadcasts L1 invalidations to every worker over Redis pub/sub.
+
+    Invalidations are buffered for a short window and published as a single
+    message, so a burst of writes costs one PUBLISH. Each worker subscribes on
+    one TCP connection and drops the keys/prefixes from its own memory tier,
+    ignoring messages it published itself.
+    """
+
+    def __init__(
+        self,
+        cache: "MultiLevelCache",
+        publisher: Optional[Redis] = None,
+        subscriber_url: Optional[str] = None,
+        channel: str = CACHE_INVALIDATION_CHANNEL,
+        debounce_seconds: float = 0.05,
+        max_batch: int = 500,
+    ):
+        self.cache = cache
+        self.publisher = publisher
+        self.subscriber_url = subscriber_url
+        self.channel = channel
+        self.debounce_seconds = debounce_seconds
+        self.max_batch = max_batch
+        self.origin = uuid.uuid4().hex
+        self._pending_keys: set = set()
+        self._pending_prefixes: set = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self.published_messages = 0
+        self.published_items = 0
+        self.received_messages = 0
+        self.applied_items = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.publisher is not None
+
+    def publish(self, keys=(), prefixes=()) -> None:
+        """Queue key/prefix invalidations for the next batched broadcast."""
+        if not self.enabled:
+            return
+        self._pending_keys.update(keys)
+        self._pending_prefixes.update(prefixes)
+
+        if len(self._pending_keys) + len(self._pending_prefixes) >= self.max_batch:
+            asyncio.create_task(self.flush())
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        """Publish everything queued so far as one message."""
+        if not self._pending_keys and not self._pending_prefixes:
+            return
+        keys, self._pending_keys = self._pending_keys, set()
+        prefixes, self._pending_prefixes = self._pending_prefixes, set()
+
+        payload = json.dumps({"o": self.origin, "k": list(keys), "p": list(prefixes)})
+        try:
+            await self.publisher.execute(["PUBLISH", self.channel, payload])
+            self.published_messages += 1
+            self.published_items += len(keys) + len(prefixes)
+        except Exception as e:
+            logfire.error(f"Cache invalidation publish error: {str(e)}")
+
+    async def start(self) -> None:
+        """Start the subscriber loop for this worker, if a TCP Redis URL is configured."""
+        if not self.subscriber_url or self._listener_task is not None:
+            return
+        self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        if self.enabled:
+            await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "published_messages": self.published_messages,
+            "published_items": self.published_items,
+            "received_messages": self.received_messages,
+            "applied_items": self.applied_items,
+            "pending": len(self._pending_keys) + len(self._pending_prefixes),
+            "subscribed": self._listener_task is not None and not self._listener_task.done(),
+        }
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.debounce_seconds)
+        await self.flush()
+
+    async def _listen(self) -> None:
+        backoff = 1
+        while True:
+            client = None
+            pubsub = None
+            try:
+                client = redis_asyncio.from_url(self.subscriber_url)
+                pubsub = client.pubsub()
+                await pubsub.subscribe(self.channel)
+                backoff = 1
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    self._apply(message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logfire.warning(f"Cache invalidation subscriber error, reconnecting: {str(e)}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+                if client is not None:
+                    try:
+                        await client.close()
+                    except Exception:
+                        pass
+
+    def _apply(self, data: Any) -> None:
+        try:
+            if isinstance(data, bytes):
+                data = data.decode("utf-8")
+            message = json.loads(data)
+        except (ValueError, TypeError):
+            return
+        if message.get("o") == self.origin:
+            # Already applied locally when published
+            return
+
+        self.received_messages += 1
+        for key in message.get("k", []):
+            self.cache.memory_cache.pop(key)
+        for prefix in message.get("p", []):
+            self.cache.memory_cache.invalidate_prefix(prefix)
+        self.applied_items += len(message.get("k", [])) + len(message.get("p", []))
+
+
 class MultiLevelCache:
     """
     A two-level cache with in-memory as L1 and Redis as L2.
     Implements SWR (stale-while-revalidate) pattern.
     """
-    def __init__(self, maxsize=1000, ttl_seconds=3600, redis_ttl_seconds=86400):
-        self.memory_cache: Dict[str, Tuple[Any, datetime]] = {}
+    def __init__(self, maxsize=1000, ttl_seconds=3600, redis_ttl_seconds=86400, max_bytes=64 * 1024 * 1024):
+        # Entries are served stale (SWR) for up to one more memory TTL before they expire
+        self.memory_cache = LRUMemoryCache(
+            maxsize=maxsize, max_bytes=max_bytes, default_ttl=ttl_seconds * 2
+        )
         self.maxsize = maxsize
         self.memory_ttl = timedelta(seconds=ttl_seconds)
         self.redis_ttl = redis_ttl_seconds
         self.redis = redis
+        self.l2 = RedisBatcher(redis)  # Batched GET/SET against Redis
         self.refresh_tasks = {}  # Track background refresh tasks
+        self.single_flight = SingleFlight()  # Coalesce concurrent misses/refreshes per key
+        self.invalidation_bus = CacheInvalidationBus(
+            self, publisher=redis_realtime, subscriber_url=_redis_tcp_url_realtime
+        )
 
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache, trying memory first, then Redis."""
         # Try memory cache first (L1)
-        if key in self.memory_cache:
-            value, timestamp = self.memory_cache[key]
+        entry = self.memory_cache.get_entry(key)
+        if entry is not None:
+            value, timestamp = entry
             age = datetime.now() - timestamp
 
             # If data is fresh enough, return immediately
@@ -43,18 +551,17 @@ class MultiLevelCache:
                 # Only start a refresh if one isn't already running
                 if key not in self.refresh_tasks or self.refresh_tasks[key].done():
                     # We'll implement refresh_key later
-                    self.refresh_tasks[key] = asyncio.create_task(self._refresh_key(key))
+                    self.track_refresh(key, asyncio.create_task(self._refresh_key(key)))
                 return value
 
         # If not in memory or too stale, try Redis (L2)
         try:
-            redis_value = await self.redis.get(key)
+            redis_value = await self.l2.get(key)
             if redis_value:
-                # Parse the JSON value
-                parsed_value = json.loads(redis_value)
+                # Decode the stored payload
+                parsed_value = cache_serializer.decode(redis_value)
                 # Update memory cache
-                self.memory_cache[key] = (parsed_value, datetime.now())
-                self._cleanup_if_needed()
+                self.memory_cache.put(key, parsed_value)
                 return parsed_value
         except Exception as e:
             logfire.error(f"Redis cache error: {str(e)}")
@@ -65,38 +572,97 @@ class MultiLevelCache:
     async def set(self, key: str, value: Any) -> None:
         """Set value in both memory and Redis caches."""
         # Update memory cache
-        self.memory_cache[key] = (value, datetime.now())
-        self._cleanup_if_needed()
+        self.memory_cache.put(key, value)
 
         # Update Redis cache
         try:
-            # Convert to JSON for Redis storage
-            json_value = json.dumps(value)
-            await self.redis.set(key, json_value, ex=self.redis_ttl)
+            # Encode for Redis storage
+            encoded_value = cache_serializer.encode(value)
+            await self.l2.set(key, encoded_value, ex=self.redis_ttl)
         except Exception as e:
             logfire.error(f"Redis cache set error: {str(e)}")
 
+    async def get_many(self, keys: list) -> Dict[str, Any]:
+        """
+        Get several keys at once: memory first, then one MGET for the misses.
+        Keys missing from both tiers are left out of the result.
+        """
+        results: Dict[str, Any] = {}
+        missing = []
+        for key in keys:
+            entry = self.memory_cache.get_entry(key)
+            if entry is not None:
+                results[key] = entry[0]
+            else:
+                missing.append(key)
+
+        if missing:
+            try:
+                redis_values = await self.l2.mget(missing)
+                for key, redis_value in zip(missing, redis_values):
+                    if redis_value:
+                        parsed_value = cache_serializer.decode(redis_value)
+                        self.memory_cache.put(key, parsed_value)
+                        results[key] = parsed_value
+            except Exception as e:
+                logfire.error(f"Redis cache mget error: {str(e)}")
+
+        return results
+
+    async def set_many(self, items: Dict[str, Any]) -> None:
+        """Set several keys in both tiers with a single Redis pipeline."""
+        for key, value in items.items():
+            self.memory_cache.put(key, value)
+        try:
+            await self.l2.mset(
+                {key: cache_serializer.encode(value) for key, value in items.items()}, ex=self.redis_ttl
+            )
+        except Exception as e:
+            logfire.error(f"Redis cache mset error: {str(e)}")
+
     async def invalidate(self, key: str) -> None:
-        """Remove a key from both caches."""
-        if key in self.memory_cache:
-            del self.memory_cache[key]
+        """Remove a key from both caches and from every other worker's memory tier."""
+        self.memory_cache.pop(key)
+        self.invalidation_bus.publish(keys=[key])
         try:
             await self.redis.delete(key)
         except Exception as e:
             logfire.error(f"Redis cache delete error: {str(e)}")
 
-    def _cleanup_if_needed(self) -> None:
-        """Remove oldest items if cache exceeds maxsize."""
-        if len(self.memory_cache) > self.maxsize:
-            # Sort by timestamp and remove oldest entries
-            sorted_items = sorted(
-                self.memory_cache.items(),
-                key=lambda x: x[1][1]  # Sort by timestamp
-            )
-            # Remove oldest items to get back to 90% capacity
-            items_to_remove = len(self.memory_cache) - int(self.maxsize * 0.9)
-            for i in range(items_to_remove):
-                del self.memory_cache[sorted_items[i][0]]
+    async def invalidate_prefix(self, prefix: str) -> None:
+        """Remove all keys starting with prefix from both caches, on every worker."""
+        self.memory_cache.invalidate_prefix(prefix)
+        self.invalidation_bus.publish(prefixes=[prefix])
+        try:
+            cursor = 0
+            while True:
+                cursor, keys = await self.redis.scan(cursor, match=f"{prefix}*", count=500)
+                if keys:
+                    await self.redis.delete(*keys)
+                if int(cursor) == 0:
+                    break
+        except Exception as e:
+            logfire.error(f"Redis cache prefix delete error: {str(e)}")
+
+    def track_refresh(self, key: str, task: asyncio.Task) -> None:
+        """Remember a background refresh so it isn't started twice; forget it once done."""
+        self.refresh_tasks[key] = task
+
+        def _forget(t: asyncio.Task) -> None:
+            if self.refresh_tasks.get(key) is t:
+                del self.refresh_tasks[key]
+
+        task.add_done_callback(_forget)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and size of the in-memory tier and the single-flight layer."""
+        return {
+            "refresh_tasks_running": len(self.refresh_tasks),
+            **self.memory_cache.stats(),
+            "single_flight": self.single_flight.stats(),
+            "invalidation_bus": self.invalidation_bus.stats(),
+            "l2_batching": self.l2.stats(),
+        }
 
     async def _refresh_key(self, key: str) -> None:
         """Background task to refresh a key using the original function."""
@@ -105,13 +671,16 @@ class MultiLevelCache:
 
 # Create a global cache instance
 multi_cache = MultiLevelCache(maxsize=1000, ttl_seconds=3600, redis_ttl_seconds=86400)
+cache_metrics.register_size_source("multi_level_l1", lambda: {
+    "entries": len(multi_cache.memory_cache),
+    "bytes": multi_cache.memory_cache.current_bytes,
+})
 
-async def update_redis_cache(cache_key, *args, **kwargs):
-    redis_value = await multi_cache.redis.get(cache_key)
+async def update_redis_cache(cache_key, *args, memory_ttl_seconds: Optional[float] = None, **kwargs):
+    redis_value = await multi_cache.l2.get(cache_key)
     if redis_value:
-        parsed_value = json.loads(redis_value)
-        multi_cache.memory_cache[cache_key] = (parsed_value, datetime.now())
-        multi_cache._cleanup_if_needed()
+        parsed_value = cache_serializer.decode(redis_value)
+        multi_cache.memory_cache.put(cache_key, parsed_value, ttl=memory_ttl_seconds)
 
 def multi_level_cached(
     key_prefix: str = "",
@@ -139,6 +708,9 @@ def multi_level_cached(
             redis_ttl_seconds if redis_ttl_seconds is not None else multi_cache.redis_ttl
         )
         func_redis_ttl = timedelta(seconds=func_redis_ttl_seconds)
+        # Hard expiry for L1 entries: long enough to cover the whole SWR window
+        func_l1_ttl_seconds = func_memory_ttl.total_seconds() + func_redis_ttl_seconds
+        metric_prefix = key_prefix or func.__name__
 
         @wraps(func)
         async def wrapper(*args, **kwargs):
@@ -152,8 +724,9 @@ def multi_level_cached(
                 cache_key = f"{key_prefix}:{func.__name__}:{arg_str}:{kwarg_str}"
 
             # Try to get from memory cache first (L1)
-            if cache_key in multi_cache.memory_cache:
-                value, timestamp = multi_cache.memory_cache[cache_key]
+            entry = multi_cache.memory_cache.get_entry(cache_key)
+            if entry is not None:
+                value, timestamp = entry
 
                 # Check version before using cached data
                 cached_version = value.get("version")
@@ -171,46 +744,61 @@ def multi_level_cached(
                     elif last_updated_age > func_redis_ttl:
                         if cache_key not in multi_cache.refresh_tasks or multi_cache.refresh_tasks[cache_key].done():
                             # logfire.warning(f"Invalidating redis cache: {cache_key}")
-                            multi_cache.refresh_tasks[cache_key] = asyncio.create_task(
-                                refresh_func(cache_key, *args, **kwargs)
-                            )
+                            cache_metrics.record_refresh(metric_prefix, "source")
+                            multi_cache.track_refresh(cache_key, multi_cache.single_flight.start(
+                                cache_key, refresh_func, cache_key, *args, **kwargs
+                            ))
                     elif age < func_redis_ttl: #60
                         redis_refresh_cache_key = f"{cache_key}:redis_refresh"
 
                         if redis_refresh_cache_key not in multi_cache.refresh_tasks or multi_cache.refresh_tasks[redis_refresh_cache_key].done():
                             # logfire.info(f"Invalidating memory cache: {cache_key}")
-                            multi_cache.refresh_tasks[redis_refresh_cache_key] = asyncio.create_task(
-                                update_redis_cache(cache_key, *args, **kwargs)
-                            )
-
-                    # logfire.info(f"Returning cached memory value: {cache_key}")
+                            cache_metrics.record_refresh(metric_prefix, "redis")
+                            multi_cache.track_refresh(redis_refresh_cache_key, multi_cache.single_flight.start(
+                                redis_refresh_cache_key,
+                                update_redis_cache,
+                                cache_key,
+                                memory_ttl_seconds=func_l1_ttl_seconds,
+                            ))
+
+                    cache_metrics.record(metric_prefix, "l1_hits")
                     return value.get("data")
 
             # logfire.warning(f"Cache miss memory: {cache_key}")
-            # If not in memory or too stale, try Redis (L2)
+            # Concurrent misses for the same key share one Redis read / source call
+            return await multi_cache.single_flight.run(cache_key, load_func, cache_key, *args, **kwargs)
+
+        # Function to fill a cache entry on a miss, trying Redis (L2) before the source
+        async def load_func(key: str, *args, **kwargs):
             try:
                 # with logfire.span("Getting cache from redis"):
-                redis_value = await multi_cache.redis.get(cache_key)
+                redis_value = await multi_cache.l2.get(key)
                 if redis_value:
-                    # Parse the JSON value
-                    parsed_value = json.loads(redis_value)
+                    # Decode the stored payload (JSON or tagged binary)
+                    parsed_value = cache_serializer.decode(redis_value)
 
                     # Check version in Redis cache
                     redis_version = parsed_value.get("version")
                     if redis_version != version:
-                        # logfire.warning(f"Version mismatch in Redis cache for {cache_key}. Cached: {redis_version}, Current: {version}")
-                        await multi_cache.invalidate(cache_key)
+                        # logfire.warning(f"Version mismatch in Redis cache for {key}. Cached: {redis_version}, Current: {version}")
+                        await multi_cache.invalidate(key)
                     else:
-                        # logfire.info(f"Cache hit redis: {cache_key}")
+                        # logfire.info(f"Cache hit redis: {key}")
                         # Update memory cache
-                        multi_cache.memory_cache[cache_key] = (parsed_value, datetime.now())
-                        multi_cache._cleanup_if_needed()
+                        multi_cache.memory_cache.put(key, parsed_value, ttl=func_l1_ttl_seconds)
+                        cache_metrics.record(metric_prefix, "l2_hits")
                         return parsed_value.get("data")
             except Exception as e:
                 logfire.error(f"Redis cache error: {str(e)}")
 
             # Cache miss - call the original function
-            # logfire.warning(f"Cache miss redis: {cache_key}, refreshing")
+            # logfire.warning(f"Cache miss redis: {key}, refreshing")
+            cache_metrics.record(metric_prefix, "misses")
+            return await refresh_func(key, *args, **kwargs)
+
+        # Function to refresh a cache entry from the source. Errors propagate to the
+        # callers sharing this flight; background refreshes are logged by SingleFlight.
+        async def refresh_func(key: str, *args, **kwargs):
             result = await func(*args, **kwargs)
 
             # When storing new results, include version
@@ -220,43 +808,17 @@ def multi_level_cached(
                 "version": version  # Add version to cache data
             }
 
-            # Store in both caches
-            multi_cache.memory_cache[cache_key] = (cache_data, datetime.now())
-            multi_cache._cleanup_if_needed()
+            # Update both caches
+            multi_cache.memory_cache.put(key, cache_data, ttl=func_l1_ttl_seconds)
 
             try:
-                json_value = json.dumps(cache_data)
-                # Apply Redis TTL on initial write
-                await multi_cache.redis.set(cache_key, json_value, ex=func_redis_ttl_seconds)
+                encoded_value = cache_serializer.encode(cache_data)
+                # Apply Redis TTL on every write
+                await multi_cache.l2.set(key, encoded_value, ex=func_redis_ttl_seconds)
             except Exception as e:
                 logfire.error(f"Redis cache set error: {str(e)}")
 
             return result
 
-        # Function to refresh a cache entry
-        async def refresh_func(key: str, *args, **kwargs):
-            try:
-                result = await func(*args, **kwargs)
-
-                cache_data = {
-                    "data": result,
-                    "timestamp": int(datetime.now().timestamp()),
-                    "version": version  # Add version to refresh data
-                }
-
-                # Update both caches
-                multi_cache.memory_cache[key] = (cache_data, datetime.now())
-
-                try:
-                    json_value = json.dumps(cache_data)
-                    # Apply Redis TTL on refresh writes
-                    await multi_cache.redis.set(key, json_value, ex=func_redis_ttl_seconds)
-                except Exception as e:
-                    logfire.error(f"Redis cache refresh error: {str(e)}")
-
-                return result
-            except Exception as e:
-                logfire.error(f"Error refreshing cache key {key}: {str(e)}")
-
         return wrapper
     return decorator
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+Per-worker Redis pub/sub multiplexer.
+
+Holds a single pub/sub connection for the whole process, reference-counts
+channel subscriptions, parses every message once and dispatches the parsed
+result to local subscribers whose filter accepts it.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Queued to a subscription that was dropped; ends its iteration
+_CLOSED = object()
+
+
+class MultiplexedSubscription:
+    """A local subscriber: iterate to receive parsed messages that pass its filter."""
+
+    def __init__(self, channel: str, filter_fn: Optional[Callable[[Any], bool]], max_queue: int):
+        self.channel = channel
+        self.filter_fn = filter_fn
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def offer(self, message: Any) -> None:
+        if self.filter_fn is not None and not self.filter_fn(message):
+            return
+        if self.queue.full():
+            # Slow consumer: keep the newest updates
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(message)
+
+    def close(self) -> None:
+        """End the subscriber's iteration once it has drained what is queued."""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(_CLOSED)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Any:
+        message = await self.queue.get()
+        if message is _CLOSED:
+            raise StopAsyncIteration
+        return message
+
+
+class PubSubMultiplexer:
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        parser: Callable[[Any], Any],
+        max_queue: int = 1000,
+    ):
+        self.client_factory = client_factory
+        self.parser = parser
+        self.max_queue = max_queue
+        self._subscriptions: Dict[str, Set[MultiplexedSubscription]] = {}
+        self._client = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._has_channels = asyncio.Event()
+        self.messages_received = 0
+        self.messages_parsed = 0
+        self.messages_dispatched = 0
+        self.subscriber_errors = 0
+
+    def subscribe(
+        self, channel: str, filter_fn: Optional[Callable[[Any], bool]] = None
+    ) -> "_MultiplexedContext":
+        """Use as `async with mux.subscribe(channel, filter_fn) as sub: async for msg in sub: ...`."""
+        return _MultiplexedContext(self, channel, filter_fn)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "channels": len(self._subscriptions),
+            "subscribers": sum(len(s) for s in self._subscriptions.values()),
+            "messages_received": self.messages_received,
+            "messages_parsed": self.messages_parsed,
+            "messages_dispatched": self.messages_dispatched,
+            "subscriber_errors": self.subscriber_errors,
+        }
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        await self._close_connection()
+
+    async def _attach(self, channel: str, filter_fn) -> MultiplexedSubscription:
+        subscription = MultiplexedSubscription(channel, filter_fn, self.max_queue)
+        async with self._lock:
+            await self._ensure_connection()
+            subscribers = self._subscriptions.get(channel)
+            if subscribers is None:
+                subscribers = set()
+                self._subscriptions[channel] = subscribers
+                await self._pubsub.subscribe(channel)
+            subscribers.add(subscription)
+            self._has_channels.set()
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+        return subscription
+
+    async def _detach(self, subscription: MultiplexedSubscription) -> None:
+        async with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if subscribers:
+                return
+            del self._subscriptions[subscription.channel]
+            if not self._subscriptions:
+                self._has_channels.clear()
+            try:
+                await self._pubsub.unsubscribe(subscription.channel)
+            except Exception as e:
+                logger.warning(f"Error unsubscribing from {subscription.channel}: {e}")
+
+    async def _ensure_connection(self) -> None:
+        if self._pubsub is None:
+            self._client = self.client_factory()
+            self._pubsub = self._client.pubsub()
+
+    async def _close_connection(self) -> None:
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.close()
+            except Exception as e:
+                logger.warning(f"Error closing pub/sub connection: {e}")
+        if self._client is not None:
+            try:
+                await self._client.close()
+            except Exception as e:
+                logger.warning(f"Error closing Redis client: {e}")
+        self._pubsub = None
+        self._client = None
+
+    async def _reconnect(self) -> None:
+        async with self._lock:
+            await self._close_connection()
+            await self._ensure_connection()
+            if self._subscriptions:
+                await self._pubsub.subscribe(*self._subscriptions.keys())
+
+    async def _read(self) -> None:
+        while True:
+            await self._has_channels.wait()
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Pub/sub read error, reconnecting: {e}")
+                await asyncio.sleep(1)
+                try:
+                    await self._reconnect()
+                except Exception as reconnect_error:
+                    logger.warning(f"Pub/sub reconnect failed: {reconnect_error}")
+                continue
+
+            if message is None or message.get("type") != "message":
+                continue
+
+            self.messages_received += 1
+            channel = message.get("channel")
+            if isinstance(channel, bytes):
+                channel = channel.decode("utf-8")
+            subscribers = self._subscriptions.get(channel)
+            if not subscribers:
+                continue
+
+            # Parse once for every local subscriber
+            try:
+                parsed = self.parser(message.get("data"))
+            except Exception as e:
+                logger.error(f"Error parsing pub/sub message on {channel}: {e}")
+                continue
+            if parsed is None:
+                continue
+            self.messages_parsed += 1
+
+            for subscription in list(subscribers):
+                try:
+                    subscription.offer(parsed)
+                except Exception as e:
+                    # A broken filter must not stop the reader every other subscriber shares
+                    self.subscriber_errors += 1
+                    logger.error(f"Dropping pub/sub subscriber on {channel} after filter error: {e}")
+                    subscribers.discard(subscription)
+                    subscription.close()
+                    continue
+                self.messages_dispatched += 1
+
+
+class _MultiplexedContext:
+    def __init__(self, mux: PubSubMultiplexer, channel: str, filter_fn):
+        self.mux = mux
+        self.channel = channel
+        self.filter_fn = filter_fn
+        self.subscription: Optional[MultiplexedSubscription] = None
+
+    async def __aenter__(self) -> MultiplexedSubscription:
+        self.subscription = await self.mux._attach(self.channel, self.filter_fn)
+        return self.subscription
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.mux._detach(self.subscription)
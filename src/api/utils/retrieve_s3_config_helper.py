@@ -159,6 +159,8 @@ class S3Config(BaseModel):
     secret_key: str
     is_custom: bool
     session_token: Optional[str] = None
+    # Unix timestamp when temporary (assumed role) credentials expire
+    expiration: Optional[float] = None
 
 
 async def retrieve_s3_config(user_settings: UserSettings) -> S3Config:
@@ -169,6 +171,7 @@ async def retrieve_s3_config(user_settings: UserSettings) -> S3Config:
     secret_key = global_secret_key
     is_custom = False
     session_token = None
+    expiration = None
     
     if user_settings is not None:
         if user_settings.output_visibility == "private":
@@ -187,7 +190,7 @@ async def retrieve_s3_config(user_settings: UserSettings) -> S3Config:
                 access_key = credentials['access_key']
                 secret_key = credentials['secret_key']
                 session_token = credentials['session_token']
-                # expiration = credentials['expiration']
+                expiration = credentials['expiration']
 
     return S3Config(
         public=public,
@@ -197,4 +200,5 @@ async def retrieve_s3_config(user_settings: UserSettings) -> S3Config:
         secret_key=secret_key,
         is_custom=is_custom,
         session_token=session_token,
+        expiration=expiration,
     )
@@ -0,0 +1,110 @@
+"""
+Durable retry queue shared by the background delivery pipelines.
+
+Entries are opaque strings (JSON) in a Redis sorted set on the Upstash meta
+instance, scored by next attempt time. Every worker polls the set and claims
+due entries with ZREM, so each entry is handed to exactly one worker and
+pending retries survive restarts. Without a store (local development),
+entries are retried in-process with `call_later` and do not survive restarts.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Callable, Optional
+
+from upstash_redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+_redis_url = os.getenv("UPSTASH_REDIS_META_REST_URL")
+_redis_token = os.getenv("UPSTASH_REDIS_META_REST_TOKEN")
+redis = Redis(url=_redis_url, token=_redis_token) if _redis_url and _redis_token else None
+
+
+def is_retryable(status: Optional[int]) -> bool:
+    """Transport errors (no status), 408, 429 and 5xx are worth another attempt."""
+    return status is None or status in (408, 429) or status >= 500
+
+
+def retry_delay(attempt: int, max_delay: float = 300) -> float:
+    # 2s doubling up to max_delay, with up to 10% jitter
+    base_delay = min(2 ** attempt, max_delay)
+    return base_delay + random.uniform(0, 0.1 * base_delay)
+
+
+class DurableRetryQueue:
+    def __init__(
+        self,
+        key: str,
+        on_due: Callable[[str], None],
+        store: Optional[Redis] = None,
+        poll_interval: float = 1.0,
+        batch_size: int = 100,
+    ):
+        self.key = key
+        self.on_due = on_due
+        self.store = store
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._poller: Optional[asyncio.Task] = None
+
+    async def schedule(self, member: str, delay: float) -> bool:
+        """Hand `member` back to `on_due` after `delay` seconds; False if it could not be queued."""
+        return await self.schedule_at(member, time.time() + delay)
+
+    async def schedule_at(self, member: str, due: float) -> bool:
+        """Like `schedule`, at epoch time `due`; entries are handed back in `due` order."""
+        if self.store is None:
+            # A due time already past keeps its place: timers run in order of when they were due
+            asyncio.get_running_loop().call_later(due - time.time(), self._claimed, member)
+            return True
+        try:
+            await self.store.zadd(self.key, {member: due})
+            return True
+        except Exception as e:
+            logger.error(f"Error queueing retry on {self.key}: {e}")
+            return False
+
+    async def start(self) -> None:
+        if self.store is not None and self._poller is None:
+            self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._poller is None:
+            return
+        self._poller.cancel()
+        try:
+            await self._poller
+        except asyncio.CancelledError:
+            pass
+        self._poller = None
+
+    def _claimed(self, member: str) -> None:
+        try:
+            self.on_due(member)
+        except Exception as e:
+            logger.error(f"Dropping unreadable retry entry on {self.key}: {e}")
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                due = await self.store.zrangebyscore(
+                    self.key, "-inf", time.time(), offset=0, count=self.batch_size
+                )
+                if not due:
+                    continue
+                # ZREM is the claim: only the worker that removes an entry handles it
+                pipeline = self.store.pipeline()
+                for member in due:
+                    pipeline.zrem(self.key, member)
+                claimed = await pipeline.exec()
+                for member, removed in zip(due, claimed):
+                    if removed:
+                        self._claimed(member)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Retry poll on {self.key} failed: {e}")
@@ -0,0 +1,128 @@
+"""
+Batched backfill of the hourly run rollups.
+
+The rollup migrations only create the tables and triggers, so they hold the
+workflow_runs table lock for a moment instead of for a full scan. Runs
+created before the migration are then counted here, a batch of ids at a
+time, by each rollup's `<name>_backfill_step` SQL function (see 0204 and
+0205). Every step is its own short transaction, and the triggers and steps
+coordinate on the `rollup_backfills` row so every run is counted exactly
+once.
+
+Every worker runs the loop; concurrent steps skip rather than wait for each
+other. Until a rollup's backfill is marked complete, `is_complete()` is False
+and readers count workflow_runs directly.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Sequence, Set
+
+from sqlalchemy import select, text
+
+from api.database import get_db_context
+from api.models import RollupBackfill
+from api.utils.cache_metrics import cache_metrics
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_BACKFILLS = ("workflow_run_rollups_hourly", "workflow_run_durations_hourly")
+ROLLUP_BACKFILL_BATCH_SIZE = int(os.getenv("ROLLUP_BACKFILL_BATCH_SIZE", "5000"))
+ROLLUP_BACKFILL_PAUSE = float(os.getenv("ROLLUP_BACKFILL_PAUSE", "0.1"))
+# How often readers re-check a backfill another worker may have finished
+ROLLUP_BACKFILL_RECHECK_SECONDS = 30.0
+
+
+class RollupBackfillRunner:
+    def __init__(
+        self,
+        names: Sequence[str] = ROLLUP_BACKFILLS,
+        batch_size: int = ROLLUP_BACKFILL_BATCH_SIZE,
+        pause: float = ROLLUP_BACKFILL_PAUSE,
+        recheck_interval: float = ROLLUP_BACKFILL_RECHECK_SECONDS,
+    ):
+        self.names = tuple(names)
+        self.batch_size = batch_size
+        self.pause = pause
+        self.recheck_interval = recheck_interval
+        self._completed: Set[str] = set()
+        self._checked_at: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.steps = 0
+        self.errors = 0
+
+    async def is_complete(self, name: str) -> bool:
+        """Whether the rollup covers every run; False (count exactly) when unsure."""
+        if name in self._completed:
+            return True
+        now = time.monotonic()
+        if now - self._checked_at.get(name, float("-inf")) < self.recheck_interval:
+            return False
+        self._checked_at[name] = now
+        try:
+            async with get_db_context() as db:
+                completed_at = await db.scalar(
+                    select(RollupBackfill.completed_at).where(RollupBackfill.name == name)
+                )
+        except Exception as e:
+            logger.warning(f"Rollup backfill state lookup failed for {name}: {e}")
+            return False
+        if completed_at is not None:
+            self._completed.add(name)
+        return completed_at is not None
+
+    async def step(self, name: str) -> bool:
+        """Backfill one batch; False once the backfill is complete."""
+        if name not in self.names:
+            raise ValueError(f"Unknown rollup backfill: {name}")
+        async with get_db_context() as db:
+            more = await db.scalar(
+                text(f'SELECT "comfyui_deploy"."{name}_backfill_step"(:batch_size)'),
+                {"batch_size": self.batch_size},
+            )
+        self.steps += 1
+        if not more:
+            self._completed.add(name)
+        return bool(more)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "completed": sorted(self._completed),
+            "steps": self.steps,
+            "errors": self.errors,
+        }
+
+    async def _run(self) -> None:
+        for name in self.names:
+            while name not in self._completed:
+                try:
+                    await self.step(name)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"Rollup backfill step failed for {name}: {e}")
+                    await asyncio.sleep(self.recheck_interval)
+                    continue
+                # Leave room for the request traffic sharing the pool
+                await asyncio.sleep(self.pause)
+            logger.info(f"Rollup backfill complete: {name}")
+
+
+rollup_backfill = RollupBackfillRunner()
+cache_metrics.register_size_source("rollup_backfill", rollup_backfill.stats)
@@ -0,0 +1,183 @@
+"""
+Write-behind buffer for run progress updates.
+
+ComfyUI reports `live_status`/`progress` once per node step, so every active
+run would otherwise cost one UPDATE + commit per step. Updates are buffered
+per run (only the latest one survives) and written every flush interval with
+a single multi-row UPDATE. Status transitions are not buffered: callers write
+them directly and `discard()` whatever progress is still pending for the run.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import logfire
+from sqlalchemy import and_, case, update
+
+from api.database import get_db_context
+from api.models import WorkflowRun
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_WRITE_BEHIND = os.getenv("PROGRESS_WRITE_BEHIND", "true").lower() != "false"
+PROGRESS_FLUSH_INTERVAL = int(os.getenv("PROGRESS_FLUSH_INTERVAL_MS", "250")) / 1000
+# Cap rows per UPDATE so the CASE expressions stay reasonably sized
+PROGRESS_FLUSH_MAX_ROWS = 500
+TERMINAL_STATUSES = ["success", "failed", "timeout", "cancelled"]
+
+_flush_latency = logfire.metric_histogram(
+    "run_progress.flush.latency", unit="ms", description="Write-behind progress flush latency"
+)
+_updates_received = logfire.metric_counter(
+    "run_progress.updates", unit="1", description="Progress updates received by the write-behind buffer"
+)
+_rows_written = logfire.metric_counter(
+    "run_progress.rows_written", unit="1", description="Rows written by write-behind progress flushes"
+)
+
+
+@dataclass
+class PendingProgress:
+    live_status: str
+    progress: float
+    updated_at: datetime
+    gpu_event_id: Optional[str]
+
+
+class RunProgressWriter:
+    def __init__(self, flush_interval: float = PROGRESS_FLUSH_INTERVAL, max_rows: int = PROGRESS_FLUSH_MAX_ROWS):
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self._pending: Dict[str, PendingProgress] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.updates_received = 0
+        self.updates_discarded = 0
+        self.rows_written = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+
+    def enqueue(
+        self,
+        run_id: str,
+        live_status: str,
+        progress: float,
+        updated_at: datetime,
+        gpu_event_id: Optional[str] = None,
+    ) -> None:
+        """Buffer a progress update; replaces any update still pending for the run."""
+        self._pending[str(run_id)] = PendingProgress(live_status, progress, updated_at, gpu_event_id)
+        self.updates_received += 1
+        _updates_received.add(1)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def discard(self, run_id: str) -> None:
+        """Drop pending progress for a run, e.g. before writing a terminal status."""
+        if self._pending.pop(str(run_id), None) is not None:
+            self.updates_discarded += 1
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            items = list(pending.items())
+            for i in range(0, len(items), self.max_rows):
+                await self._write(dict(items[i : i + self.max_rows]))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "updates_received": self.updates_received,
+            "updates_discarded": self.updates_discarded,
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "last_flush_ms": self.last_flush_ms,
+            # Updates received per row actually written
+            "coalescing_ratio": self.updates_received / self.rows_written if self.rows_written else 0.0,
+        }
+
+    async def _run(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Progress flush loop error: {e}")
+
+    async def _write(self, batch: Dict[str, PendingProgress]) -> None:
+        if not batch:
+            return
+        start = time.perf_counter()
+        run_ids = list(batch.keys())
+        update_stmt = (
+            update(WorkflowRun)
+            .where(
+                and_(
+                    WorkflowRun.id.in_(run_ids),
+                    # A status write may have landed while this batch was pending
+                    ~WorkflowRun.status.in_(TERMINAL_STATUSES),
+                )
+            )
+            .values(
+                live_status=case(
+                    {run_id: p.live_status for run_id, p in batch.items()},
+                    value=WorkflowRun.id,
+                    else_=WorkflowRun.live_status,
+                ),
+                progress=case(
+                    {run_id: p.progress for run_id, p in batch.items()},
+                    value=WorkflowRun.id,
+                    else_=WorkflowRun.progress,
+                ),
+                updated_at=case(
+                    {run_id: p.updated_at for run_id, p in batch.items()},
+                    value=WorkflowRun.id,
+                    else_=WorkflowRun.updated_at,
+                ),
+                gpu_event_id=case(
+                    {run_id: p.gpu_event_id for run_id, p in batch.items()},
+                    value=WorkflowRun.id,
+                    else_=WorkflowRun.gpu_event_id,
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            async with get_db_context() as db:
+                await db.execute(update_stmt)
+        except Exception as e:
+            self.flush_errors += 1
+            logger.error(f"Error flushing progress for {len(batch)} runs: {e}")
+            # Retry on the next tick unless a newer update superseded it; runs that
+            # finished in the meantime are skipped by the terminal-status guard
+            for run_id, pending in batch.items():
+                self._pending.setdefault(run_id, pending)
+            return
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.flushes += 1
+        self.rows_written += len(batch)
+        self.last_flush_ms = elapsed_ms
+        _rows_written.add(len(batch))
+        _flush_latency.record(elapsed_ms)
+
+
+run_progress_writer = RunProgressWriter()
@@ -1,37 +1,233 @@
-from typing import Dict, Optional
+import asyncio
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
 import aioboto3
+import boto3
 from botocore.config import Config
-import asyncio
+import logfire
+
+from api.utils.cache_metrics import cache_metrics
 from api.utils.retrieve_s3_config_helper import S3Config
 
+# (region, credentials fingerprint, endpoint)
+ClientKey = Tuple[Optional[str], str, Optional[str]]
+
+_s3_config = Config(signature_version="s3v4", max_pool_connections=50)
+
+# Bounded pool for the remaining synchronous boto3 calls, so they never run on the event loop
+_s3_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("S3_EXECUTOR_WORKERS", "16")), thread_name_prefix="s3"
+)
+
+
+async def run_blocking_s3(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking boto3 call on the S3 thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_s3_executor, functools.partial(fn, *args, **kwargs))
+
+
+@dataclass
+class _ClientEntry:
+    client: Any
+    expires_at: float
+    # Only set for aioboto3 clients, which are async context managers
+    context: Any = None
+
+
+def _fingerprint(access_key: Optional[str], secret_key: Optional[str], session_token: Optional[str]) -> str:
+    material = f"{access_key}\0{secret_key}\0{session_token or ''}".encode("utf-8")
+    return hashlib.sha256(material).hexdigest()[:32]
+
+
 class S3ClientManager:
-    _instance = None
-    _clients: Dict[str, aioboto3.Session] = {}
+    """
+    Registry of reusable S3 clients.
+
+    Building a boto3/aioboto3 client costs milliseconds and a few MB, so
+    clients are kept per (region, credentials fingerprint, endpoint). The
+    registry is a bounded LRU; entries also expire with their credentials
+    (minus a refresh buffer) or after `CLIENT_MAX_AGE` for static keys.
+    Evicted aioboto3 clients are closed after a grace period so in-flight
+    calls on them can finish.
+
+    The sync registry is also used from `_s3_executor` threads, so it (and
+    the shared boto3 session, which is not thread-safe) is only touched
+    under `_sync_lock`. The async registry lives on the event loop.
+    """
+
+    MAX_CLIENTS = 64
+    CLIENT_MAX_AGE = 3600
+    EXPIRY_BUFFER = 300
+    CLOSE_GRACE_SECONDS = 60
+
+    _session = boto3.session.Session()
+    _async_session = aioboto3.Session()
+    _sync_clients: "OrderedDict[ClientKey, _ClientEntry]" = OrderedDict()
+    _async_clients: "OrderedDict[ClientKey, _ClientEntry]" = OrderedDict()
     _lock = asyncio.Lock()
+    _sync_lock = threading.Lock()
+    hits = 0
+    misses = 0
+    evictions = 0
+
+    @classmethod
+    def get_sync_client(
+        cls,
+        region: Optional[str],
+        access_key: Optional[str],
+        secret_key: Optional[str],
+        session_token: Optional[str] = None,
+        endpoint_url: Optional[str] = None,
+        expiration: Optional[float] = None,
+    ):
+        """A shared boto3 S3 client; safe to use from several threads."""
+        key = (region, _fingerprint(access_key, secret_key, session_token), endpoint_url)
+        with cls._sync_lock:
+            entry = cls._lookup(cls._sync_clients, key)
+            if entry is not None:
+                return entry.client
+
+            client = cls._session.client(
+                "s3",
+                region_name=region,
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                aws_session_token=session_token,
+                endpoint_url=endpoint_url,
+                config=_s3_config,
+            )
+            cls._store(cls._sync_clients, key, _ClientEntry(client, cls._expires_at(expiration)))
+            return client
 
     @classmethod
-    async def get_client(cls, s3_config: S3Config) -> aioboto3.Session:
-        """Get or create an S3 client for the given configuration"""
-        # Create a unique key for this configuration
-        config_key = f"{s3_config.region}:{s3_config.access_key}"
-        
-        if config_key not in cls._clients:
-            async with cls._lock:
-                if config_key not in cls._clients:
-                    session = aioboto3.Session()
-                    cls._clients[config_key] = session
-        
-        return cls._clients[config_key]
-
-    @classmethod
-    async def get_s3_client(cls, s3_config: S3Config) -> aioboto3.Session.client:
-        """Get an S3 client with the given configuration"""
-        session = await cls.get_client(s3_config)
-        return session.client(
-            's3',
-            region_name=s3_config.region,
-            aws_access_key_id=s3_config.access_key,
-            aws_secret_access_key=s3_config.secret_key,
-            aws_session_token=s3_config.session_token,
-            config=Config(signature_version="s3v4")
-        ) 
\ No newline at end of file
+    async def get_async_client(
+        cls,
+        region: Optional[str],
+        access_key: Optional[str],
+        secret_key: Optional[str],
+        session_token: Optional[str] = None,
+        endpoint_url: Optional[str] = None,
+        expiration: Optional[float] = None,
+    ):
+        """A shared, already-opened aioboto3 S3 client. Do not close it or use it as a context manager."""
+        key = (region, _fingerprint(access_key, secret_key, session_token), endpoint_url)
+        entry = cls._lookup(cls._async_clients, key)
+        if entry is not None:
+            return entry.client
+
+        async with cls._lock:
+            # Another coroutine may have opened it while we waited
+            entry = cls._async_clients.get(key)
+            if entry is not None:
+                return entry.client
+
+            context = cls._async_session.client(
+                "s3",
+                region_name=region,
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                aws_session_token=session_token,
+                endpoint_url=endpoint_url,
+                config=_s3_config,
+            )
+            client = await context.__aenter__()
+            cls._store(
+                cls._async_clients, key, _ClientEntry(client, cls._expires_at(expiration), context)
+            )
+            return client
+
+    @classmethod
+    def sync_client_for(cls, s3_config: S3Config):
+        return cls.get_sync_client(
+            s3_config.region,
+            s3_config.access_key,
+            s3_config.secret_key,
+            s3_config.session_token,
+            expiration=s3_config.expiration,
+        )
+
+    @classmethod
+    async def get_s3_client(cls, s3_config: S3Config):
+        """Get a shared aioboto3 S3 client for the given configuration"""
+        return await cls.get_async_client(
+            s3_config.region,
+            s3_config.access_key,
+            s3_config.secret_key,
+            s3_config.session_token,
+            expiration=s3_config.expiration,
+        )
+
+    @classmethod
+    async def close_all(cls) -> None:
+        for key in list(cls._async_clients):
+            await cls._close(cls._async_clients.pop(key), delay=0)
+        with cls._sync_lock:
+            cls._sync_clients.clear()
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        return {
+            "entries": len(cls._sync_clients) + len(cls._async_clients),
+            "sync_clients": len(cls._sync_clients),
+            "async_clients": len(cls._async_clients),
+            "hits": cls.hits,
+            "misses": cls.misses,
+            "evictions": cls.evictions,
+        }
+
+    @classmethod
+    def _expires_at(cls, expiration: Optional[float]) -> float:
+        expires_at = time.time() + cls.CLIENT_MAX_AGE
+        if expiration is not None:
+            expires_at = min(expires_at, expiration - cls.EXPIRY_BUFFER)
+        return expires_at
+
+    @classmethod
+    def _lookup(cls, clients: "OrderedDict[ClientKey, _ClientEntry]", key: ClientKey) -> Optional[_ClientEntry]:
+        entry = clients.get(key)
+        if entry is None:
+            cls.misses += 1
+            return None
+        if entry.expires_at <= time.time():
+            cls._evict(clients, key)
+            cls.misses += 1
+            return None
+        clients.move_to_end(key)
+        cls.hits += 1
+        return entry
+
+    @classmethod
+    def _store(cls, clients: "OrderedDict[ClientKey, _ClientEntry]", key: ClientKey, entry: _ClientEntry) -> None:
+        clients[key] = entry
+        now = time.time()
+        for stale_key in [k for k, e in clients.items() if e.expires_at <= now and k != key]:
+            cls._evict(clients, stale_key)
+        while len(clients) > cls.MAX_CLIENTS:
+            cls._evict(clients, next(iter(clients)))
+
+    @classmethod
+    def _evict(cls, clients: "OrderedDict[ClientKey, _ClientEntry]", key: ClientKey) -> None:
+        entry = clients.pop(key)
+        cls.evictions += 1
+        if entry.context is not None:
+            asyncio.create_task(cls._close(entry, delay=cls.CLOSE_GRACE_SECONDS))
+
+    @staticmethod
+    async def _close(entry: _ClientEntry, delay: float) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            await entry.context.__aexit__(None, None, None)
+        except Exception as e:
+            logfire.warning("Error closing S3 client", error=str(e))
+
+
+cache_metrics.register_size_source("s3_clients", S3ClientManager.stats)
@@ -0,0 +1,125 @@
+"""
+Local SigV4 presigning for S3 GET URLs.
+
+botocore presigns one URL at a time and re-derives the signing key for each
+one. For output galleries with hundreds of private objects the key is
+derived once per (credentials, region, date) and reused for every object in
+the batch. Signing times are aligned to a window so URLs for the same object
+are identical within it, which makes them cacheable.
+"""
+import hashlib
+import hmac
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from api.utils.multi_level_cache import LRUMemoryCache
+from api.utils.cache_metrics import cache_metrics
+
+# Signatures are issued at the start of each window, so a URL is valid for
+# at least `expiration - PRESIGN_WINDOW_SECONDS`
+PRESIGN_WINDOW_SECONDS = 300
+
+presigned_url_cache = LRUMemoryCache(maxsize=50000, default_ttl=PRESIGN_WINDOW_SECONDS)
+cache_metrics.register_size_source("presigned_urls", presigned_url_cache.stats)
+
+_signing_keys = LRUMemoryCache(maxsize=256, default_ttl=24 * 3600)
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _signing_key(secret_key: str, date_stamp: str, region: str) -> bytes:
+    cache_key = f"{hashlib.sha256(secret_key.encode('utf-8')).hexdigest()}:{date_stamp}:{region}"
+    entry = _signing_keys.get_entry(cache_key)
+    if entry is not None:
+        return entry[0]
+    key = _hmac(_hmac(_hmac(_hmac(f"AWS4{secret_key}".encode("utf-8"), date_stamp), region), "s3"), "aws4_request")
+    _signing_keys.put(cache_key, key)
+    return key
+
+
+def _virtual_host(bucket: str, region: str) -> str:
+    # Same hosts botocore produces for virtual-hosted-style URLs
+    if region == "us-east-1":
+        return f"{bucket}.s3.amazonaws.com"
+    return f"{bucket}.s3.{region}.amazonaws.com"
+
+
+def can_presign_locally(bucket: str, region: Optional[str]) -> bool:
+    # Dotted bucket names need path-style URLs, which botocore handles
+    return bool(region) and "." not in bucket
+
+
+def presign_get_urls(
+    objects: Sequence[Tuple[str, str]],
+    region: str,
+    access_key: str,
+    secret_key: str,
+    session_token: Optional[str] = None,
+    expiration: int = 3600,
+) -> List[str]:
+    """Presign GET URLs for many (bucket, key) pairs with one derived signing key."""
+    window_start = int(time.time()) // PRESIGN_WINDOW_SECONDS * PRESIGN_WINDOW_SECONDS
+    signed_at = datetime.fromtimestamp(window_start, tz=timezone.utc)
+    amz_date = signed_at.strftime("%Y%m%dT%H%M%SZ")
+    date_stamp = signed_at.strftime("%Y%m%d")
+    scope = f"{date_stamp}/{region}/s3/aws4_request"
+    credentials_id = hashlib.sha256(f"{access_key}:{session_token or ''}".encode("utf-8")).hexdigest()[:16]
+
+    signing_key = None
+    canonical_query = ""
+    urls = []
+    for bucket, object_key in objects:
+        cache_key = f"{credentials_id}:{bucket}/{object_key}:{expiration}:{window_start}"
+        entry = presigned_url_cache.get_entry(cache_key)
+        if entry is not None:
+            cache_metrics.record("presigned_urls", "l1_hits")
+            urls.append(entry[0])
+            continue
+        cache_metrics.record("presigned_urls", "misses")
+
+        if signing_key is None:
+            signing_key = _signing_key(secret_key, date_stamp, region)
+            base_params = {
+                "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+                "X-Amz-Credential": f"{access_key}/{scope}",
+                "X-Amz-Date": amz_date,
+                "X-Amz-Expires": str(expiration),
+                "X-Amz-SignedHeaders": "host",
+            }
+            if session_token:
+                base_params["X-Amz-Security-Token"] = session_token
+            canonical_query = "&".join(
+                f"{quote(k, safe='~')}={quote(v, safe='~')}" for k, v in sorted(base_params.items())
+            )
+
+        host = _virtual_host(bucket, region)
+        path = "/" + quote(object_key, safe="/~")
+        canonical_request = f"GET\n{path}\n{canonical_query}\nhost:{host}\n\nhost\nUNSIGNED-PAYLOAD"
+        string_to_sign = (
+            f"AWS4-HMAC-SHA256\n{amz_date}\n{scope}\n"
+            f"{hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()}"
+        )
+        signature = hmac.new(signing_key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+        url = f"https://{host}{path}?{canonical_query}&X-Amz-Signature={signature}"
+
+        presigned_url_cache.put(cache_key, url)
+        urls.append(url)
+    return urls
+
+
+def presign_get_url(
+    bucket: str,
+    object_key: str,
+    region: str,
+    access_key: str,
+    secret_key: str,
+    session_token: Optional[str] = None,
+    expiration: int = 3600,
+) -> str:
+    return presign_get_urls(
+        [(bucket, object_key)], region, access_key, secret_key, session_token, expiration
+    )[0]
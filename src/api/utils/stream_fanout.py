@@ -0,0 +1,168 @@
+"""
+In-process fan-out of Redis streams to many local subscribers.
+
+One reader task per stream per worker tails Redis with blocking XREAD and
+pushes each batch of raw values into bounded per-subscriber queues. A small
+ring buffer lets late joiners replay recent entries. The reader stops when
+the last subscriber leaves.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+END_OF_STREAM = "__END__"
+
+
+class StreamSubscription:
+    """A subscriber's view of a shared stream: iterate to receive batches of raw values."""
+
+    def __init__(self, channel: "_StreamChannel", max_queue_batches: int):
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_batches)
+        self.dropped = 0
+
+    def push(self, batch: List[str]) -> None:
+        """Enqueue without blocking the reader; a slow subscriber loses its oldest batch."""
+        if self.queue.full():
+            try:
+                dropped_batch = self.queue.get_nowait()
+                self.dropped += len(dropped_batch)
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(batch)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> List[str]:
+        batch = await self.queue.get()
+        # Coalesce whatever else is already queued into one batch
+        while not self.queue.empty():
+            batch = batch + self.queue.get_nowait()
+        return batch
+
+
+class _StreamChannel:
+    def __init__(self, stream_name: str, replay_size: int):
+        self.stream_name = stream_name
+        self.replay: deque = deque(maxlen=replay_size)
+        self.subscribers: Set[StreamSubscription] = set()
+        self.reader: Optional[asyncio.Task] = None
+        self.finished = False
+
+
+class StreamFanoutHub:
+    def __init__(
+        self,
+        redis_client,
+        batch_size: int = 200,
+        replay_size: int = 1000,
+        max_queue_batches: int = 256,
+    ):
+        self.redis = redis_client
+        self.batch_size = batch_size
+        self.replay_size = replay_size
+        self.max_queue_batches = max_queue_batches
+        self._channels: Dict[str, _StreamChannel] = {}
+        self.xread_calls = 0
+        self.entries_read = 0
+
+    def subscribe(self, stream_name: str) -> "_SubscriptionContext":
+        """Use as `async with hub.subscribe(run_id) as sub: async for batch in sub: ...`."""
+        return _SubscriptionContext(self, stream_name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "streams": len(self._channels),
+            "subscribers": sum(len(c.subscribers) for c in self._channels.values()),
+            "xread_calls": self.xread_calls,
+            "entries_read": self.entries_read,
+        }
+
+    def _attach(self, stream_name: str) -> StreamSubscription:
+        channel = self._channels.get(stream_name)
+        if channel is None:
+            channel = _StreamChannel(stream_name, self.replay_size)
+            self._channels[stream_name] = channel
+
+        subscription = StreamSubscription(channel, self.max_queue_batches)
+        if channel.replay:
+            subscription.push(list(channel.replay))
+        channel.subscribers.add(subscription)
+
+        if channel.reader is None and not channel.finished:
+            channel.reader = asyncio.create_task(self._read(channel))
+        return subscription
+
+    def _detach(self, subscription: StreamSubscription) -> None:
+        channel = subscription.channel
+        channel.subscribers.discard(subscription)
+        if channel.subscribers:
+            return
+        # Last subscriber left: stop reading and forget the stream
+        if channel.reader is not None and not channel.reader.done():
+            channel.reader.cancel()
+        if self._channels.get(channel.stream_name) is channel:
+            del self._channels[channel.stream_name]
+
+    async def _read(self, channel: _StreamChannel) -> None:
+        # Start from the beginning of the stream, like a direct tail would
+        last_id = "0"
+        while True:
+            try:
+                self.xread_calls += 1
+                entries = await self.redis.xread(
+                    streams={channel.stream_name: last_id},
+                    count=self.batch_size,
+                    block=0,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"xread error for {channel.stream_name}: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            batch: List[str] = []
+            for _, items in entries or []:
+                for message_id, fields in items:
+                    last_id = message_id
+                    # redis-py returns dict of field->value
+                    if isinstance(fields, dict):
+                        value = fields.get(b"message") or fields.get("message")
+                    else:
+                        value = fields[1] if len(fields) >= 2 else None
+                    if value is None:
+                        continue
+                    if isinstance(value, bytes):
+                        value = value.decode("utf-8")
+                    batch.append(value)
+
+            if not batch:
+                continue
+
+            self.entries_read += len(batch)
+            channel.replay.extend(batch)
+            for subscription in list(channel.subscribers):
+                subscription.push(batch)
+
+            if END_OF_STREAM in batch:
+                channel.finished = True
+                return
+
+
+class _SubscriptionContext:
+    def __init__(self, hub: StreamFanoutHub, stream_name: str):
+        self.hub = hub
+        self.stream_name = stream_name
+        self.subscription: Optional[StreamSubscription] = None
+
+    async def __aenter__(self) -> StreamSubscription:
+        self.subscription = self.hub._attach(self.stream_name)
+        return self.subscription
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.hub._detach(self.subscription)
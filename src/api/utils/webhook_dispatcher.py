@@ -0,0 +1,255 @@
+"""
+Pooled webhook delivery.
+
+All deliveries share one aiohttp session with keep-alive connections. Each
+destination host gets its own lane with a fixed number of workers, so a slow
+customer endpoint only ever ties up its own lane instead of piling up tasks
+in the API process. Failed deliveries, lane overflow and anything still
+pending at shutdown go to a Redis sorted set (scored by next attempt time)
+that every worker polls (api.utils.retry_queue), so retries survive restarts.
+
+Durability window: a delivery's first attempt is held only in this
+process's memory. If the process dies without a graceful shutdown (crash,
+OOM kill) before that attempt completes, the delivery is lost, so first
+attempts are at-most-once. Once a delivery is in the retry set it is
+delivered at least once.
+
+Because retries and shutdown hand-offs can repeat a request the receiver
+already accepted, every attempt carries the delivery's stable id in the
+`X-Webhook-Delivery-Id` header; receivers should dedupe on it.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+from urllib.parse import urlparse
+
+import aiohttp
+import logfire
+from upstash_redis.asyncio import Redis
+
+from api.utils.retry_queue import DurableRetryQueue, is_retryable, redis, retry_delay
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_RETRY_QUEUE = "webhook:retry"
+WEBHOOK_PER_HOST_CONCURRENCY = int(os.getenv("WEBHOOK_PER_HOST_CONCURRENCY", "4"))
+WEBHOOK_MAX_PENDING_PER_HOST = int(os.getenv("WEBHOOK_MAX_PENDING_PER_HOST", "500"))
+WEBHOOK_MAX_ATTEMPTS = 5
+WEBHOOK_TIMEOUT_SECONDS = 20
+WEBHOOK_DELIVERY_ID_HEADER = "X-Webhook-Delivery-Id"
+
+_delivery_latency = logfire.metric_histogram(
+    "webhook.delivery.latency", unit="ms", description="Webhook delivery latency"
+)
+_deliveries = logfire.metric_counter(
+    "webhook.deliveries", unit="1", description="Webhook delivery attempts by outcome"
+)
+
+
+@dataclass
+class WebhookDelivery:
+    url: str
+    payload: Dict[str, Any]
+    run_id: str
+    event_type: str
+    attempt: int = 0
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    @property
+    def host(self) -> str:
+        return urlparse(self.url).netloc
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, raw: str) -> "WebhookDelivery":
+        return cls(**json.loads(raw))
+
+
+# Called after every attempt with (delivery, status or None, latency_ms, error text)
+ResultCallback = Callable[[WebhookDelivery, Optional[int], float, Optional[str]], Awaitable[None]]
+
+
+class _HostLane:
+    def __init__(self):
+        self.pending: Deque[WebhookDelivery] = deque()
+        self.workers = 0
+
+
+class WebhookDispatcher:
+    def __init__(
+        self,
+        retry_store: Optional[Redis] = None,
+        per_host_concurrency: int = WEBHOOK_PER_HOST_CONCURRENCY,
+        max_pending_per_host: int = WEBHOOK_MAX_PENDING_PER_HOST,
+        max_attempts: int = WEBHOOK_MAX_ATTEMPTS,
+        poll_interval: float = 1.0,
+        on_result: Optional[ResultCallback] = None,
+    ):
+        self.retries = DurableRetryQueue(
+            WEBHOOK_RETRY_QUEUE, self._on_retry_due, store=retry_store, poll_interval=poll_interval
+        )
+        self.per_host_concurrency = per_host_concurrency
+        self.max_pending_per_host = max_pending_per_host
+        self.max_attempts = max_attempts
+        self.on_result = on_result
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lanes: Dict[str, _HostLane] = {}
+        self._workers: Set[asyncio.Task] = set()
+        # Overflowed deliveries on their way to the retry queue
+        self._spills: Set[asyncio.Task] = set()
+        self._in_flight: Dict[str, WebhookDelivery] = {}
+        self.enqueued = 0
+        self.delivered = 0
+        self.failed = 0
+        self.retried = 0
+        self.overflowed = 0
+
+    def enqueue(self, delivery: WebhookDelivery) -> None:
+        self.enqueued += 1
+        self._dispatch(delivery)
+
+    async def start(self) -> None:
+        await self.retries.start()
+
+    async def stop(self) -> None:
+        """Stop delivering and hand everything not yet sent to the retry queue."""
+        await self.retries.stop()
+
+        remaining = []
+        for lane in self._lanes.values():
+            remaining.extend(lane.pending)
+            lane.pending.clear()
+        # Interrupted requests are sent again after the restart (at-least-once)
+        remaining.extend(self._in_flight.values())
+
+        workers = list(self._workers)
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        for delivery in remaining:
+            await self._schedule(delivery, delay=0)
+        # Let overflow hand-offs finish their ZADD before the process exits
+        await asyncio.gather(*list(self._spills), return_exceptions=True)
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hosts": len(self._lanes),
+            "workers": len(self._workers),
+            "pending": sum(len(lane.pending) for lane in self._lanes.values()),
+            "in_flight": len(self._in_flight),
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retried": self.retried,
+            "overflowed": self.overflowed,
+        }
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=0,
+                    limit_per_host=self.per_host_concurrency,
+                    keepalive_timeout=60,
+                ),
+                timeout=aiohttp.ClientTimeout(total=WEBHOOK_TIMEOUT_SECONDS),
+            )
+        return self._session
+
+    def _dispatch(self, delivery: WebhookDelivery) -> None:
+        host = delivery.host
+        lane = self._lanes.get(host)
+        if lane is None:
+            lane = _HostLane()
+            self._lanes[host] = lane
+
+        if len(lane.pending) >= self.max_pending_per_host:
+            # The host is not keeping up; park the delivery instead of growing memory
+            self.overflowed += 1
+            task = asyncio.create_task(self._schedule(delivery, delay=retry_delay(1)))
+            self._spills.add(task)
+            task.add_done_callback(self._spills.discard)
+            return
+
+        lane.pending.append(delivery)
+        if lane.workers < self.per_host_concurrency:
+            lane.workers += 1
+            task = asyncio.create_task(self._work(host, lane))
+            self._workers.add(task)
+            task.add_done_callback(self._workers.discard)
+
+    async def _work(self, host: str, lane: _HostLane) -> None:
+        try:
+            while lane.pending:
+                delivery = lane.pending.popleft()
+                self._in_flight[delivery.id] = delivery
+                try:
+                    await self._deliver(delivery)
+                finally:
+                    self._in_flight.pop(delivery.id, None)
+        finally:
+            lane.workers -= 1
+            if lane.workers == 0 and not lane.pending and self._lanes.get(host) is lane:
+                del self._lanes[host]
+
+    async def _deliver(self, delivery: WebhookDelivery) -> None:
+        status: Optional[int] = None
+        error: Optional[str] = None
+        start = time.perf_counter()
+        try:
+            async with self._get_session().post(
+                delivery.url, json=delivery.payload, headers={WEBHOOK_DELIVERY_ID_HEADER: delivery.id}
+            ) as response:
+                status = response.status
+                if not response.ok:
+                    error = await response.text()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        ok = status is not None and 200 <= status < 300
+        outcome = "success" if ok else "retry" if (
+            is_retryable(status) and delivery.attempt + 1 < self.max_attempts
+        ) else "failed"
+        _delivery_latency.record(latency_ms, {"outcome": outcome, "event_type": delivery.event_type})
+        _deliveries.add(1, {"outcome": outcome})
+
+        if self.on_result is not None:
+            try:
+                await self.on_result(delivery, status, latency_ms, error)
+            except Exception as e:
+                logger.warning(f"Webhook result callback failed: {e}")
+
+        if outcome == "success":
+            self.delivered += 1
+        elif outcome == "retry":
+            self.retried += 1
+            delivery.attempt += 1
+            await self._schedule(delivery, delay=retry_delay(delivery.attempt))
+        else:
+            self.failed += 1
+
+    async def _schedule(self, delivery: WebhookDelivery, delay: float) -> None:
+        if not await self.retries.schedule(delivery.to_json(), delay):
+            logger.error(f"Lost webhook delivery {delivery.id} for run {delivery.run_id}")
+
+    def _on_retry_due(self, member: str) -> None:
+        self._dispatch(WebhookDelivery.from_json(member))
+
+
+webhook_dispatcher = WebhookDispatcher(retry_store=redis)
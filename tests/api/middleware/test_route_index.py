@@ -0,0 +1,146 @@
+"""
+RouteIndex / GuardRuleIndex must decide exactly what the walk they replaced did.
+
+`legacy_resolve` is the per-request logic AuthMiddleware and
+AutumnAccessMiddleware ran before the index: the first full match in
+app.routes, then fnmatch against the optional-auth, ignored and guard rule
+globs, where a matching exclude ends the guard rule walk. It is checked
+against the real app routes, the real AuthMiddleware globs and
+AUTUMN_GUARD_RULES.
+"""
+import re
+from fnmatch import fnmatch
+
+import pytest
+from starlette.routing import Match
+
+import api  # noqa: F401  # includes every router into the app
+from api.middleware.authMiddleware import AuthMiddleware
+from api.middleware.route_index import AUTH_NONE, AUTH_OPTIONAL, AUTH_REQUIRED, RouteIndex
+from api.router import app
+from api.utils.feature_gate import AUTUMN_GUARD_RULES
+
+_PARAM = re.compile(r"\{([^}:]+)(?::([^}]+))?\}")
+
+EXTRA_PATHS = [
+    "/",
+    "/docs",
+    "/api",
+    "/api/",
+    "/api/unknown/route",
+    "/api/user/123",
+    "/api/user/123/settings",
+    "/api/share/abc",
+    "/api/share/abc/def",
+    "/api/shared-workflows",
+    "/api/shared-workflows/abc",
+    "/api/optimize/a/b.png",
+    "/api/workflow/abc",
+    "/api/workflow/abc/versions",
+    "/api/machine/custom",
+    "/api/machine/custom/abc",
+    "/api/machine/serverless",
+    "/api/session",
+    "/api/session/abc",
+    "/api/autumn/entitled",
+]
+METHODS = ["GET", "POST", "PATCH", "PUT", "DELETE"]
+
+# A rule whose exclude matches ends the walk: the later machine rules must not apply
+EXCLUDING_RULE = {
+    "pattern": "/api/machine/*",
+    "methods": ["POST", "PATCH"],
+    "exclude": ["/api/machine/custom*"],
+    "checks": [{"feature_id": "machine_limit"}],
+}
+
+
+def _concrete(path: str) -> str:
+    def value(match):
+        return "a/b.png" if match.group(2) == "path" else "7"
+
+    return _PARAM.sub(value, path)
+
+
+def _sample_scopes():
+    paths = set(EXTRA_PATHS)
+    for route in app.routes:
+        path = getattr(route, "path", None)
+        if path is None:
+            continue
+        concrete = _concrete(path) or "/"
+        paths.add(concrete)
+        paths.add(concrete.rstrip("/") + "/")
+    return [
+        {"type": "http", "path": path, "method": method, "root_path": "", "headers": []}
+        for path in sorted(paths)
+        for method in METHODS
+    ]
+
+
+def legacy_resolve(scope, ignored_routes, optional_auth_routes, guard_rules):
+    route_path = function_name = None
+    try:
+        for route in app.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                route_path = route.path
+                # Mounts have no endpoint; the middleware logged the error and kept route_path
+                function_name = route.endpoint.__name__
+                break
+    except AttributeError:
+        pass
+
+    path = scope["path"]
+    if any(fnmatch(path, route) for route in optional_auth_routes):
+        auth_mode = AUTH_OPTIONAL
+    elif any(fnmatch(path, route) for route in ignored_routes) or not path.startswith("/api"):
+        auth_mode = AUTH_NONE
+    else:
+        auth_mode = AUTH_REQUIRED
+
+    method = scope["method"].upper()
+    rules = []
+    for rule in guard_rules:
+        if method not in {m.upper() for m in rule.get("methods", [])}:
+            continue
+        pattern = rule.get("pattern")
+        if not pattern or not fnmatch(path, pattern):
+            continue
+        if any(fnmatch(path, ex) for ex in rule.get("exclude", []) or []):
+            break
+        rules.append(rule)
+    return route_path, function_name, auth_mode, rules
+
+
+def _assert_equivalent(guard_rules):
+    auth = AuthMiddleware()
+    index = RouteIndex(app, auth.ignored_routes, auth.optional_auth_routes, guard_rules)
+    scopes = _sample_scopes()
+    assert len(scopes) > len(METHODS) * len(EXTRA_PATHS)
+
+    for scope in scopes:
+        info = index.resolve(scope)
+        expected = legacy_resolve(scope, auth.ignored_routes, auth.optional_auth_routes, guard_rules)
+        actual = (info.route_path, info.function_name, info.auth_mode, list(info.guard_rules))
+        assert actual == expected, (scope["method"], scope["path"])
+
+
+@pytest.mark.unit
+def test_matches_legacy_walk_with_autumn_guard_rules():
+    _assert_equivalent(AUTUMN_GUARD_RULES)
+
+
+@pytest.mark.unit
+def test_matching_exclude_ends_guard_rule_walk():
+    rules = [EXCLUDING_RULE] + list(AUTUMN_GUARD_RULES)
+    _assert_equivalent(rules)
+
+    index = RouteIndex(app, [], [], rules)
+    scope = {"type": "http", "path": "/api/machine/custom", "method": "POST", "root_path": "", "headers": []}
+    assert index.resolve(scope).guard_rules == ()
+    scope["path"] = "/api/machine/serverless"
+    assert [rule["pattern"] for rule in index.resolve(scope).guard_rules] == [
+        "/api/machine/*",
+        "/api/machine/serverless",
+    ]
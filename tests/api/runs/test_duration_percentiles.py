@@ -0,0 +1,51 @@
+"""
+_histogram_percentiles on hand-built duration histograms.
+
+Bin b covers [1.1^b, 1.1^(b+1)) milliseconds and a percentile is reported as
+the geometric midpoint of the bin holding its rank. Kept out of
+tests/api/routes, whose conftest connects to the test database.
+"""
+import math
+
+import pytest
+
+from api.routes.runs import DURATION_BIN_BASE, _histogram_percentiles
+
+
+def _midpoint(bin_index):
+    return round(DURATION_BIN_BASE ** (bin_index + 0.5) / 1000, 3)
+
+
+@pytest.mark.unit
+def test_empty_histogram_has_no_percentiles():
+    for bins in ({}, {12: 0}):
+        result = _histogram_percentiles(bins)
+        assert (result.count, result.p50, result.p95, result.p99) == (0, None, None, None)
+
+
+@pytest.mark.unit
+def test_single_bin_reports_its_midpoint_for_every_percentile():
+    result = _histogram_percentiles({80: 7})
+    assert result.count == 7
+    assert result.p50 == result.p95 == result.p99 == _midpoint(80)
+
+
+@pytest.mark.unit
+def test_percentile_ranks_on_known_histogram():
+    # 100 runs: the 50th, 95th and 99th land exactly on the last run of a bin
+    result = _histogram_percentiles({0: 50, 10: 45, 20: 4, 30: 1})
+    assert result.count == 100
+    assert (result.p50, result.p95, result.p99) == (_midpoint(0), _midpoint(10), _midpoint(20))
+
+    # Ranks past a bin's last run move to the next non-empty bin; input order does not matter
+    result = _histogram_percentiles({90: 1, 60: 0, 40: 1})
+    assert result.count == 2
+    assert (result.p50, result.p95, result.p99) == (_midpoint(40), _midpoint(90), _midpoint(90))
+
+
+@pytest.mark.unit
+def test_midpoint_is_within_five_percent_of_durations_in_its_bin():
+    for duration_ms in (1.5, 850, 12_345, 3_600_000):
+        bin_index = math.floor(math.log(duration_ms, DURATION_BIN_BASE))
+        estimate = _histogram_percentiles({bin_index: 1}).p50
+        assert abs(estimate - duration_ms / 1000) <= 0.05 * duration_ms / 1000 + 0.0005
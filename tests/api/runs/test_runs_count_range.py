@@ -0,0 +1,54 @@
+"""
+How get_runs_count splits [start_time, end_time] between the hourly rollup
+and exact counts over workflow_runs (_split_count_range). Kept out of
+tests/api/routes, whose conftest connects to the test database.
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+from api.routes.runs import _split_count_range
+
+
+def _at(hour, minute=0, second=0):
+    return datetime(2024, 5, 1, hour, minute, second, tzinfo=timezone.utc)
+
+
+@pytest.mark.unit
+def test_range_inside_one_hour_is_counted_exactly():
+    assert _split_count_range(_at(10, 15), _at(10, 45)) is None
+    assert _split_count_range(_at(10, 15), _at(11)) is None
+    assert _split_count_range(_at(10), _at(10, 59, 59)) is None
+
+
+@pytest.mark.unit
+def test_partial_hours_at_both_edges():
+    split = _split_count_range(_at(9, 30), _at(12, 10))
+    assert (split.rollup_start, split.rollup_end) == (_at(10), _at(12))
+    assert split.head == (_at(9, 30), _at(10))
+    assert split.tail == (_at(12), _at(12, 10))
+
+
+@pytest.mark.unit
+def test_ends_on_exact_hour_boundaries():
+    split = _split_count_range(_at(10), _at(13))
+    assert (split.rollup_start, split.rollup_end) == (_at(10), _at(13))
+    assert split.head is None
+    # end_time is inclusive, so runs created exactly at 13:00 are still counted
+    assert split.tail == (_at(13), _at(13))
+
+    split = _split_count_range(_at(10), _at(11))
+    assert (split.rollup_start, split.rollup_end, split.head) == (_at(10), _at(11), None)
+
+
+@pytest.mark.unit
+def test_open_start_or_end():
+    split = _split_count_range(None, _at(12, 10))
+    assert (split.rollup_start, split.rollup_end) == (None, _at(12))
+    assert (split.head, split.tail) == (None, (_at(12), _at(12, 10)))
+
+    split = _split_count_range(_at(9, 30), None)
+    assert (split.rollup_start, split.rollup_end) == (_at(10), None)
+    assert (split.head, split.tail) == ((_at(9, 30), _at(10)), None)
+
+    assert _split_count_range(None, None) == (None, None, None, None)
@@ -0,0 +1,198 @@
+"""
+AutumnUsagePipeline against a fake AutumnClient.request.
+
+Without a retry store, retries and parked lanes come back in-process through
+`call_later`; the hand-off tests use a fake store that records ZADDs.
+"""
+import asyncio
+import json
+
+import pytest
+
+from api.utils import autumn_usage
+from api.utils.autumn_usage import AutumnUsagePipeline
+
+
+class FakeAutumn:
+    def __init__(self, statuses=None):
+        # idempotency key -> statuses returned by successive attempts, then 200
+        self.statuses = {key: list(values) for key, values in (statuses or {}).items()}
+        self.requests = []
+        self.accepted = []
+        self.gate = None
+
+    async def request(self, method, endpoint, data):
+        self.requests.append((endpoint, dict(data)))
+        if self.gate is not None:
+            await self.gate.wait()
+        await asyncio.sleep(0)
+        pending = self.statuses.get(data["idempotency_key"])
+        status = pending.pop(0) if pending else 200
+        if 200 <= status < 300:
+            self.accepted.append((data["customer_id"], data["idempotency_key"]))
+        return status, "{}"
+
+
+class FakeStore:
+    def __init__(self):
+        self.entries = {}
+
+    async def zadd(self, key, mapping):
+        self.entries.update(mapping)
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(autumn_usage, "retry_delay", lambda attempt, max_delay=300: 0.01)
+
+
+async def _drain(pipeline, timeout=2.0):
+    async def settled():
+        while pipeline.stats()["pending"] or pipeline.stats()["parked_customers"]:
+            await asyncio.sleep(0.005)
+
+    await asyncio.wait_for(settled(), timeout)
+
+
+def _keys(member):
+    return [event["payload"]["idempotency_key"] for event in json.loads(member)]
+
+
+def _accepted_for(client, customer_id):
+    return [key for customer, key in client.accepted if customer == customer_id]
+
+
+@pytest.mark.unit
+async def test_customer_order_survives_transient_failure():
+    client = FakeAutumn({"a+1": [503, 503]})
+    pipeline = AutumnUsagePipeline(client)
+
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", 1, idempotency_key="a+1")
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", -1, idempotency_key="a-1")
+    pipeline.track_feature_usage("b", "gpu_concurrency_limit", 1, idempotency_key="b+1")
+    await _drain(pipeline)
+
+    assert _accepted_for(client, "a") == ["a+1", "a-1"]
+    # Another customer does not wait behind the failing lane
+    assert client.accepted[0] == ("b", "b+1")
+    assert pipeline.stats()["retried"] == 2
+
+
+@pytest.mark.unit
+async def test_idempotency_key_generated_and_kept_across_retries():
+    client = FakeAutumn()
+    pipeline = AutumnUsagePipeline(client)
+
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", 1)
+    track_key = pipeline._lanes["a"].pending[0].idempotency_key
+    client.statuses[track_key] = [503, 429]
+    await _drain(pipeline)
+
+    assert track_key
+    assert [data["idempotency_key"] for _, data in client.requests] == [track_key] * 3
+
+    # Non-track events retry through the retry queue and keep their key too
+    client.requests.clear()
+    pipeline.enqueue("events", {"customer_id": "a", "event_name": "gpu"})
+    event_key = pipeline._lanes["a"].pending[0].idempotency_key
+    client.statuses[event_key] = [502]
+    await _drain(pipeline)
+    await asyncio.sleep(0.05)
+
+    assert [data["idempotency_key"] for _, data in client.requests] == [event_key] * 2
+    assert pipeline.stats()["delivered"] == 2
+
+
+@pytest.mark.unit
+async def test_conflict_counts_as_success():
+    client = FakeAutumn({"a+1": [409]})
+    pipeline = AutumnUsagePipeline(client)
+
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", 1, idempotency_key="a+1")
+    await _drain(pipeline)
+
+    stats = pipeline.stats()
+    assert len(client.requests) == 1
+    assert (stats["delivered"], stats["failed"], stats["retried"]) == (1, 0, 0)
+
+
+@pytest.mark.unit
+async def test_stuck_track_parks_its_lane_in_order():
+    client = FakeAutumn({"a+1": [503] * 4})
+    pipeline = AutumnUsagePipeline(client, max_track_attempts=2)
+
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", 1, idempotency_key="a+1")
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", -1, idempotency_key="a-1")
+    while not pipeline.stats()["parked"]:
+        await asyncio.sleep(0.005)
+    # Queued while the lane is parked, so it must stay behind it
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", 1, idempotency_key="a+2")
+    assert "a" not in pipeline._lanes
+    await _drain(pipeline)
+
+    assert _accepted_for(client, "a") == ["a+1", "a-1", "a+2"]
+    # Once past the cap, each further failure parks the lane again rather than holding it
+    assert pipeline.stats()["parked"] == 3
+
+
+@pytest.mark.unit
+async def test_parked_entries_replayed_out_of_order_are_held():
+    store = FakeStore()
+    client = FakeAutumn({"a+1": [503]})
+    pipeline = AutumnUsagePipeline(client, retry_store=store, max_track_attempts=1)
+
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", 1, idempotency_key="a+1")
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", -1, idempotency_key="a-1")
+    while not pipeline.stats()["parked"]:
+        await asyncio.sleep(0.005)
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", 1, idempotency_key="a+2")
+    await asyncio.gather(*list(pipeline._parking))
+    (lane, later) = sorted(store.entries, key=store.entries.get)
+
+    pipeline._on_retry_due(later)
+    await asyncio.sleep(0.01)
+    assert _accepted_for(client, "a") == []
+    pipeline._on_retry_due(lane)
+    await _drain(pipeline)
+
+    assert _accepted_for(client, "a") == ["a+1", "a-1", "a+2"]
+
+
+@pytest.mark.unit
+async def test_stop_hands_each_lane_off_as_one_ordered_entry():
+    store = FakeStore()
+    client = FakeAutumn({"a+1": [503] * 100, "b+1": [503] * 100})
+    pipeline = AutumnUsagePipeline(client, retry_store=store)
+
+    for key, value in (("a+1", 1), ("a-1", -1), ("a+2", 1)):
+        pipeline.track_feature_usage("a", "gpu_concurrency_limit", value, idempotency_key=key)
+    pipeline.track_feature_usage("b", "gpu_concurrency_limit", 1, idempotency_key="b+1")
+    await asyncio.sleep(0.05)
+    await pipeline.stop()
+
+    assert sorted(_keys(member) for member in store.entries) == [["a+1", "a-1", "a+2"], ["b+1"]]
+    assert pipeline.stats()["pending"] == 0
+
+
+@pytest.mark.unit
+async def test_full_buffer_spills_whole_lanes_in_order():
+    store = FakeStore()
+    client = FakeAutumn()
+    client.gate = asyncio.Event()
+    pipeline = AutumnUsagePipeline(client, retry_store=store, max_buffer=2)
+
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", 1, idempotency_key="a+1")
+    await asyncio.sleep(0.01)
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", -1, idempotency_key="a-1")
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", 1, idempotency_key="a+2")
+    client.gate.set()
+    while not store.entries:
+        await asyncio.sleep(0.005)
+    # The in-flight head is settled first; the rest of the lane is parked as one entry
+    pipeline.track_feature_usage("a", "gpu_concurrency_limit", -1, idempotency_key="a-2")
+    await asyncio.gather(*list(pipeline._parking))
+
+    entries = sorted(store.entries.items(), key=lambda item: item[1])
+    assert [_keys(member) for member, _ in entries] == [["a-1", "a+2"], ["a-2"]]
+    assert _accepted_for(client, "a") == ["a+1"]
+    assert pipeline.stats()["spilled"] == 1